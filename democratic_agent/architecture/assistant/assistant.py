@@ -1,8 +1,9 @@
 import json
 import logging
-from typing import Dict, Tuple
+from typing import Any, Dict, Set, Tuple
 from time import sleep
 from queue import Queue
+import uuid
 
 from democratic_agent.architecture.helpers.tmp_ips import (
     DEF_ASSISTANT_IP,
@@ -23,8 +24,10 @@ from democratic_agent.architecture.helpers.topics import (
 from democratic_agent.architecture.helpers.request import Request, RequestStatus
 from democratic_agent.architecture.user.user_message import UserMessage
 from democratic_agent.chat.chat import Chat
+from democratic_agent.data.request_store import RequestStore
+from democratic_agent.models.model import ResponseDelta
 from democratic_agent.tools.tools_manager import ToolsManager
-from democratic_agent.utils.helpers import colored
+from democratic_agent.utils.helpers import colored, get_partial_json_string
 from democratic_agent.utils.communication_protocols import (
     Proxy,
     Broker,
@@ -39,6 +42,10 @@ from democratic_agent.utils.communication_protocols import (
 
 LOG = logging.getLogger(__name__)
 
+# Requests shown on the prompt: the newest active ones and the recently finished ones.
+DEF_PROMPT_ACTIVE_REQUESTS = 20
+DEF_PROMPT_RECENT_REQUESTS = 5
+
 
 # TODO: Centralize conversation! All users should be able to see the conversation.
 class Assistant:
@@ -46,15 +53,21 @@ class Assistant:
 
     def __init__(self, assistant_ip: str):
         self.assistant_ip = assistant_ip
-        self.requests: Dict[str, Request] = {}  # TODO: Get them from database
+        # Requests are persisted, the goal handles are resent when the users register again.
+        self.request_store = RequestStore("assistant")
         self.active_goal_handles: Dict[str, Tuple[str, GoalHandle]] = {}
         self.chat = Chat(
             module_name="user",
             system_prompt_kwargs={"requests": self.get_requests()},
+            volatile_prompt_kwargs=["requests"],
         )
 
         self.users: Dict[str, str] = {}
         self.user_messages: Queue[UserMessage] = Queue()
+        # Messages being streamed to the users on the current call: key -> id, sequence and text.
+        self.message_streams: Dict[Any, Dict[str, Any]] = {}
+        # Texts already sent as the final message of their stream, not sent again.
+        self.finalized_messages: Set[str] = set()
 
         # Action client for each user system.
         self.system_action_clients: Dict[str, ActionClient] = {}
@@ -111,16 +124,39 @@ class Assistant:
             topic=f"{user_info['user_name']}_system_action_server",
             callback=self.update_request,
             action_class=Request,
+            aborted_callback=self.abort_request,
         )
         self.database_clients[user_info["user_name"]] = Client(
             address=f"tcp://{self.assistant_ip}:{DEF_CLIENT_PORT}",
         )
         print(f"Registered user: {user_info['user_name']}")
+        self.resume_requests(user_info["user_name"])
         return "Registered Successfully"
 
+    def resume_requests(self, user_name: str):
+        """Send again the unfinished requests of the user, e.g. after a restart."""
+
+        for request in self.request_store.get_active(user_name):
+            goal_handle = self.system_action_clients[user_name].send_goal(request)
+            self.active_goal_handles[request.get_id()] = (user_name, goal_handle)
+            print(colored(f"Resumed request: {request.request}", "yellow"))
+
     def get_requests(self):
-        request_str = "\n".join([str(value) for value in self.requests.values()])
-        # self.requests = {}  # Resetting requests TODO: Decide when to reset requests.
+        # Capped, the prompt is rendered every turn and the active requests can accumulate.
+        active = self.request_store.get_active(limit=DEF_PROMPT_ACTIVE_REQUESTS)
+        recent = self.request_store.get_recent(DEF_PROMPT_RECENT_REQUESTS)
+        if not active and not recent:
+            return "No requests."
+        request_str = "Active requests:\n" + (
+            "\n".join([str(request) for request in active]) or "None"
+        )
+        hidden = self.request_store.count_active() - len(active)
+        if hidden > 0:
+            request_str += f"\n... and {hidden} older active requests."
+        if recent:
+            request_str += "\n\nRecently finished requests:\n" + "\n".join(
+                [str(request) for request in recent]
+            )
         return request_str
 
     def broadcast_message(self, message: str):
@@ -156,6 +192,7 @@ class Assistant:
         """
 
         new_request = Request(request=request)
+        self.request_store.put(new_request, user_name=user_name)
         goal_handle = self.system_action_clients[user_name].send_goal(new_request)
         self.active_goal_handles[new_request.get_id()] = (user_name, goal_handle)
         self.update_request(new_request)
@@ -177,10 +214,59 @@ class Assistant:
             str
         """
         print(f'{colored("Assistant:", "blue")} {message}')
+        if message in self.finalized_messages:
+            # Streamed while generated, the users already have the final message.
+            self.finalized_messages.discard(message)
+            return "Message sent."
         assistant_message = UserMessage(user_name="Aware", message=message)
         self.broadcast_message(assistant_message.to_json())
         return "Message sent."
 
+    def stream_to_users(self, delta: ResponseDelta):
+        """Publish the messages to the users as partial chunks while they are generated."""
+
+        if delta.content:
+            self.publish_chunk("content", delta.content)
+        elif (
+            delta.tool_call is not None
+            and delta.tool_call["function"]["name"] == "communicate_with_users"
+        ):
+            text = get_partial_json_string(
+                delta.tool_call["function"]["arguments"], "message"
+            )
+            if text:
+                stream = self.message_streams.get(delta.tool_call_index)
+                published = len(stream["text"]) if stream is not None else 0
+                if len(text) > published:
+                    self.publish_chunk(delta.tool_call_index, text[published:])
+
+    def finish_streams(self):
+        """Send the final message of every stream of the call, also when it failed midway."""
+
+        self.finalized_messages = set()
+        for stream in self.message_streams.values():
+            final_message = UserMessage(
+                user_name="Aware", message=stream["text"], message_id=stream["id"]
+            )
+            self.broadcast_message(final_message.to_json())
+            self.finalized_messages.add(stream["text"])
+        self.message_streams = {}
+
+    def publish_chunk(self, key: Any, chunk: str):
+        stream = self.message_streams.setdefault(
+            key, {"id": str(uuid.uuid4()), "sequence": 0, "text": ""}
+        )
+        stream["text"] += chunk
+        partial_message = UserMessage(
+            user_name="Aware",
+            message=chunk,
+            message_id=stream["id"],
+            sequence=stream["sequence"],
+            partial=True,
+        )
+        stream["sequence"] += 1
+        self.broadcast_message(partial_message.to_json())
+
     def search_user_info(self, user_name: str, query: str):
         """
         Search the query on user's semantic database.
@@ -212,9 +298,12 @@ class Assistant:
             str
         """
         print(f"STORING INFO: {info}")
-        data = self.database_clients[user_name].send(
-            topic=f"{user_name}_{DEF_STORE_DATABASE}", message=info
-        )
+        try:
+            data = self.database_clients[user_name].send(
+                topic=f"{user_name}_{DEF_STORE_DATABASE}", message=info
+            )
+        except Exception as e:
+            return f"Error storing info: {e}"
         # self.database.store_user_info(user_name, info)
         # print(f"Storing {user_name}'s info: {info}")
         if data == "OK":
@@ -232,8 +321,20 @@ class Assistant:
         self.running = False
         return "Waiting for user's input..."
 
+    def abort_request(self, request: Request):
+        """Finish as failed a request whose goal was aborted, e.g. no system available."""
+
+        if request.get_id() not in self.active_goal_handles:
+            return
+        if request.get_status() not in (RequestStatus.SUCCESS, RequestStatus.FAILURE):
+            request.update_status(
+                status=RequestStatus.FAILURE,
+                feedback="The request was aborted, the user's system couldn't run it.",
+            )
+        self.update_request(request)
+
     def update_request(self, request: Request):
-        self.requests[request.get_id()] = request
+        self.request_store.put(request)
         feedback = request.get_feedback()
         print(f"DEBUG-REQUEST:{request.request} with feedback: {feedback}")
         if request.get_status() == RequestStatus.WAITING_USER_FEEDBACK:
@@ -260,6 +361,7 @@ class Assistant:
             request.update_status(
                 status=RequestStatus.IN_PROGRESS, feedback=user_message.message
             )
+            self.request_store.put(request)
 
             # Update request
             user_name, goal_handle = self.active_goal_handles[request.get_id()]
@@ -272,7 +374,6 @@ class Assistant:
                 user_name=f"{user_name}_system",
                 message=message,
             )
-            self.requests.pop(request.get_id())
             self.active_goal_handles.pop(request.get_id())
             self.user_messages.put(user_message)
             print(colored(f"{user_name}_system: ", "green") + message)
@@ -283,7 +384,6 @@ class Assistant:
                 user_name=f"{user_name}_system",
                 message=message,
             )
-            self.requests.pop(request.get_id())
             self.active_goal_handles.pop(request.get_id())
             self.user_messages.put(user_message)
             print(colored(f"{user_name}_system: ", "red") + message)
@@ -305,7 +405,14 @@ class Assistant:
 
             self.running = True
             while self.running:
-                tools_call = self.chat.call(functions=self.assistant_functions)
+                self.message_streams = {}
+                try:
+                    tools_call = self.chat.call(
+                        functions=self.assistant_functions,
+                        on_delta=self.stream_to_users,
+                    )
+                finally:
+                    self.finish_streams()
                 if tools_call is None or not tools_call:
                     self.running = False
                     print("Stopping assistant due to None call.")
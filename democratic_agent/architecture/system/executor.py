@@ -1,8 +1,7 @@
-from typing import Callable, Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from openai.types.chat import ChatCompletionMessageToolCall
 
 from democratic_agent.architecture.helpers import Request
-from democratic_agent.chat.parser.pydantic_parser import PydanticParser
 from democratic_agent.chat.chat import Chat
 from democratic_agent.tools.tools_manager import ToolsManager
 from democratic_agent.utils.helpers import colored
@@ -140,8 +139,7 @@ class Executor:
             callable: The tool that was created.
         """
         potential_tools: Dict[str, str] = {}
-        for description in descriptions:
-            tool = self.chat.database.search_tool(description)
+        for tool in self.chat.database.search_tools(descriptions):
             if tool is not None:
                 if tool["name"] not in potential_tools.keys():
                     potential_tools[tool["name"]] = tool["description"]
@@ -205,12 +203,9 @@ class Executor:
         Returns:
             str: The summary of the task.
         """
-        tool_names = self.tools_manager.get_all_tools()
-        tools: List[Callable] = []
-        for tool_name in tool_names:
-            tools.append(self.tools_manager.get_tool(tool_name))
-        for tool in tools:
-            function_schema = PydanticParser.get_function_schema(tool)["function"]
-            self.chat.database.store_tool(
-                name=function_schema["name"], description=function_schema["description"]
-            )
+        # The tools are only imported when selected, the manifest is parsed from their source.
+        tools_info: List[Tuple[str, str]] = [
+            (tool["name"], tool["description"])
+            for tool in self.tools_manager.get_tools_manifest()
+        ]
+        self.chat.database.store_tools(tools_info)
@@ -1,10 +1,11 @@
 import argparse
-from collections import OrderedDict
 import json
-from time import sleep
+from time import perf_counter, sleep
 
 from democratic_agent.architecture.helpers import Request, RequestStatus
 from democratic_agent.architecture.system.executor import Executor
+from democratic_agent.data.request_store import FINISHED_STATUSES, RequestStore
+from democratic_agent.tools.tools_manager import ToolsManager
 
 # from democratic_agent.architecture.system.tool_creator import ToolCreator
 from democratic_agent.utils.helpers import colored, get_local_ip
@@ -36,13 +37,16 @@ class System:
 
         # self.tool_creator = ToolCreator()  # TODO: Next version.
         self.user_name = user_name
-        self.requests: OrderedDict[str, Request] = OrderedDict()
+        self.request_store = RequestStore(f"{user_name}_system")
 
         self.executor = Executor(
             get_user_feedback=self.get_user_feedback,
             user_name=user_name,
         )
+        start = perf_counter()
         self.executor.register_tools()
+        print(f"Registered tools in {perf_counter() - start:.3f}s")
+        print(self.executor.tools_manager.get_import_report())
         # Communication - TODO: Centralize comms at assistant - connect to ActionServer Broker.
         self.system_action_server = ActionServer(
             broker_address=f"tcp://{assistant_ip}:{DEF_ACTION_SERVER_PORT}",
@@ -55,13 +59,25 @@ class System:
 
     def add_request(self, request: Request):
         # In case request already exists just update it.
-        self.requests[request.get_id()] = request
+        self.request_store.put(request)
 
     def execute_request(self, server_goal_handle: ServerGoalHandle):
         self.current_goal_handle = server_goal_handle
         request: Request = server_goal_handle.action
         print(colored("\n--- Request ---\n", "yellow"))
         print(request)
+        stored_request = self.request_store.get(request.get_id())
+        if (
+            stored_request is not None
+            and stored_request.get_status() in FINISHED_STATUSES
+        ):
+            # Resent after a restart of the assistant, reply with the previous result.
+            self.update_request(
+                request,
+                status=stored_request.get_status(),
+                feedback=stored_request.get_feedback(),
+            )
+            return
         self.update_request(
             request,
             status=RequestStatus.IN_PROGRESS,
@@ -79,7 +95,7 @@ class System:
     def get_user_feedback(self, request: Request):
         # Update request status
         request.update_status(status=RequestStatus.WAITING_USER_FEEDBACK)
-        self.requests[request.get_id()] = request
+        self.request_store.put(request)
 
         # Send feedback to user
         self.current_goal_handle.action = request
@@ -87,17 +103,17 @@ class System:
 
         # Wait for feedback
         while (
-            self.requests[request.get_id()].get_status()
+            self.request_store.get(request.get_id()).get_status()
             == RequestStatus.WAITING_USER_FEEDBACK
         ):
             sleep(0.1)
         # Update request
-        request = self.requests[request.get_id()]
+        request = self.request_store.get(request.get_id())
         return request.get_feedback()
 
     def update_request(self, request: Request, status: RequestStatus, feedback: str):
         request.update_status(status=status, feedback=feedback)
-        self.requests[request.get_id()] = request
+        self.request_store.put(request)
         self.current_goal_handle.action = request
 
         if status == RequestStatus.SUCCESS:
@@ -108,7 +124,7 @@ class System:
 
     def update_request_callback(self, goal_handle: ServerGoalHandle):
         request = goal_handle.action
-        self.requests[request.get_id()] = request
+        self.request_store.put(request)
         self.current_goal_handle.action = request
 
     # TODO: receive ack.
@@ -143,8 +159,19 @@ def main():
     parser.add_argument(
         "-s", "--system_port", type=int, default=DEF_SYSTEM_PORT, help="System port"
     )
+    parser.add_argument(
+        "--profile_imports",
+        action="store_true",
+        help="Import all the tools and report the import time of each one",
+    )
     args = parser.parse_args()
 
+    if args.profile_imports:
+        tools_manager = ToolsManager()
+        tools_manager.import_all_tools()
+        print(tools_manager.get_import_report())
+        return
+
     # When user starts initialize his system.
     system = System(
         user_name=args.name,
@@ -1,6 +1,7 @@
 import argparse
 import logging
-from typing import List
+import threading
+from typing import Dict, List
 
 from democratic_agent.architecture.helpers.topics import (
     DEF_ASSISTANT_MESSAGE,
@@ -14,7 +15,6 @@ from democratic_agent.architecture.helpers.tmp_ips import (
 from democratic_agent.architecture.user.user_message import UserMessage
 from democratic_agent.utils.communication_protocols import Publisher, Subscriber
 
-
 LOG = logging.getLogger(__name__)
 
 
@@ -41,9 +41,57 @@ class User:
             callback=self.receive_assistant_message,
         )
         self.incoming_messages: List[UserMessage] = []
+        # Streamed messages: id -> index at incoming_messages, next sequence and out of order chunks.
+        self.streamed_indexes: Dict[str, int] = {}
+        self.next_sequences: Dict[str, int] = {}
+        self.pending_chunks: Dict[str, Dict[int, str]] = {}
+        # Increased on every change so the UI knows when to redraw.
+        self.messages_version = 0
+        self.lock = threading.Lock()
 
     def receive_assistant_message(self, message: str):
-        self.incoming_messages.append(UserMessage.from_json(message))
+        user_message = UserMessage.from_json(message)
+        with self.lock:
+            message_id = user_message.message_id
+            if message_id is None:
+                self.incoming_messages.append(user_message)
+            elif not user_message.partial:
+                # Final message, replaces the partial one if it was streamed.
+                index = self.streamed_indexes.pop(message_id, None)
+                self.next_sequences.pop(message_id, None)
+                self.pending_chunks.pop(message_id, None)
+                if index is None:
+                    self.incoming_messages.append(user_message)
+                else:
+                    self.incoming_messages[index] = user_message
+            else:
+                self.add_chunk(user_message)
+            self.messages_version += 1
+
+    def add_chunk(self, chunk: UserMessage):
+        message_id = chunk.message_id
+        index = self.streamed_indexes.get(message_id)
+        if index is None:
+            index = len(self.incoming_messages)
+            self.streamed_indexes[message_id] = index
+            self.next_sequences[message_id] = 0
+            self.pending_chunks[message_id] = {}
+            self.incoming_messages.append(
+                UserMessage(
+                    user_name=chunk.user_name,
+                    message="",
+                    message_id=message_id,
+                    partial=True,
+                )
+            )
+        pending_chunks = self.pending_chunks[message_id]
+        pending_chunks[chunk.sequence] = chunk.message
+        partial_message = self.incoming_messages[index]
+        while self.next_sequences[message_id] in pending_chunks:
+            partial_message.message += pending_chunks.pop(
+                self.next_sequences[message_id]
+            )
+            self.next_sequences[message_id] += 1
 
     def send_message(self, message: str):
         user_message = UserMessage(user_name=self.user_name, message=message)
@@ -1,17 +1,42 @@
 import json
+from typing import Optional
 
 
 class UserMessage:
-    def __init__(self, user_name: str, message: str):
+    def __init__(
+        self,
+        user_name: str,
+        message: str,
+        message_id: Optional[str] = None,
+        sequence: int = 0,
+        partial: bool = False,
+    ):
         self.user_name = user_name
         self.message = message
+        # Streamed messages: the partial chunks (in sequence order) and the final full message share the id.
+        self.message_id = message_id
+        self.sequence = sequence
+        self.partial = partial
 
     def to_json(self):
-        return json.dumps({"user_name": self.user_name, "message": self.message})
+        json_dict = {"user_name": self.user_name, "message": self.message}
+        if self.message_id is not None:
+            json_dict.update(
+                {
+                    "message_id": self.message_id,
+                    "sequence": self.sequence,
+                    "partial": self.partial,
+                }
+            )
+        return json.dumps(json_dict)
 
     @staticmethod
     def from_json(json_str):
         json_dict = json.loads(json_str)
         return UserMessage(
-            user_name=json_dict["user_name"], message=json_dict["message"]
+            user_name=json_dict["user_name"],
+            message=json_dict["message"],
+            message_id=json_dict.get("message_id"),
+            sequence=json_dict.get("sequence", 0),
+            partial=json_dict.get("partial", False),
         )
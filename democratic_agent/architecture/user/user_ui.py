@@ -30,7 +30,7 @@ class UserUI:
         prefix = "Enter message: "
         cursor_x, cursor_y = len(prefix), 0
         input_win_height = 10  # Height of input window
-        last_displayed_msg_index = 0  # Index of the last displayed message
+        last_displayed_version = 0  # Version of the messages already displayed
 
         while True:
             height, width = stdscr.getmaxyx()
@@ -38,18 +38,15 @@ class UserUI:
             input_win.mvwin(height - input_win_height, 0)
 
             # Update messages, window resizing, etc.
-            # Only update if there are new messages
-            if last_displayed_msg_index < len(self.user.incoming_messages):
-                new_messages = self.user.incoming_messages[last_displayed_msg_index:]
-                for msg in new_messages:
-                    color_pair_number = self.get_user_color(msg.user_name)
-                    # Add the username with color
-                    chat_win.addstr(
-                        f"{msg.user_name}", curses.color_pair(color_pair_number)
-                    )
-                    # Add the rest of the message in the default color
-                    chat_win.addstr(f": {msg.message}\n\n")
-                last_displayed_msg_index = len(self.user.incoming_messages)
+            # Only redraw if there are new messages or the streamed ones changed
+            if last_displayed_version != self.user.messages_version:
+                with self.user.lock:
+                    last_displayed_version = self.user.messages_version
+                    # Each message takes at least two lines, older ones are out of the window
+                    messages = self.user.incoming_messages[-(height // 2 + 1) :]
+                    chat_win.erase()
+                    for msg in messages:
+                        self.display_message(chat_win, msg)
 
             chat_win.refresh()
 
@@ -105,6 +102,14 @@ class UserUI:
                     # Handle curses error (for debugging)
                     print(f"Curses error: {e}")
 
+    def display_message(self, chat_win, msg):
+        color_pair_number = self.get_user_color(msg.user_name)
+        # Add the username with color
+        chat_win.addstr(f"{msg.user_name}", curses.color_pair(color_pair_number))
+        # Add the rest of the message in the default color, partial messages are still being generated
+        cursor = "▌" if msg.partial else ""
+        chat_win.addstr(f": {msg.message}{cursor}\n\n")
+
     def insert_character(self, buffer, char, x, y, max_width, prefix):
         lines = buffer.split("\n")
 
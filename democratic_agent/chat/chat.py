@@ -1,19 +1,31 @@
 from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar, Type
 from logging import getLogger
 from openai.types.chat import (
+    ChatCompletionMessage,
     ChatCompletionMessageToolCall,
 )  # Common interface for the tool calls, we can create our own class if needed.
 
-from democratic_agent.chat.conversation import Conversation
+from democratic_agent.chat.conversation import Conversation, DEF_MAX_TOKENS
+from democratic_agent.config import get_modules
 from democratic_agent.chat.parser.pydantic_parser import PydanticParser
 from democratic_agent.chat.parser.loggable_base_model import LoggableBaseModel
 from democratic_agent.prompts.load import load_prompt
+from democratic_agent.models.model import ResponseDelta
 from democratic_agent.models.models_manager import ModelsManager
+from democratic_agent.models.token_counter import TokenCounter
 from democratic_agent.data.database.manager import DatabaseManager
 from democratic_agent.utils.helpers import get_free_port, get_local_ip
 
 T = TypeVar("T", bound=LoggableBaseModel)
 
+# Prompt layouts: "system" renders the memory on the system message, "stable_prefix" keeps the
+# system message static and sends the volatile info on a context message after the conversation.
+DEF_PROMPT_LAYOUT = "system"
+STABLE_PREFIX_LAYOUT = "stable_prefix"
+DEF_VOLATILE_PLACEHOLDER = (
+    "Shown in the context message at the end of the conversation."
+)
+
 # TODO: Create our own logger.
 LOG = getLogger(__name__)
 
@@ -28,6 +40,7 @@ class Chat(Generic[T]):
         user_name: Optional[str] = None,
         memory_enabled: bool = True,
         register_database: bool = True,
+        volatile_prompt_kwargs: List[str] = [],
     ):
         self.user_name = user_name
         self.model = None
@@ -35,9 +48,18 @@ class Chat(Generic[T]):
         self.memory_enabled = memory_enabled
         self.short_term_memory = "Empty, use update_short_term_memory to save relevant context and avoid loosing information."  # TODO: Get from permanent storage
         self.retrieved_data = "Empty"  # TODO: Get from permanent storage
+        self.conversation: Optional[Conversation] = None
+        module_config = get_modules().get(module_name, {})
+        self.max_conversation_tokens = module_config.get("conversation", {}).get(
+            "max_tokens", DEF_MAX_TOKENS
+        )
+        self.prompt_layout = module_config.get("prompt_layout", DEF_PROMPT_LAYOUT)
+        # System prompt kwargs that change often, moved to the context message on stable_prefix layout.
+        self.volatile_prompt_kwargs = volatile_prompt_kwargs
+        self.volatile_values: Dict[str, Any] = {}
 
-        self.system_instruction_message = self.load_prompt(
-            "system", self.module_name, system_prompt_kwargs
+        self.system_instruction_message = self.load_system_instruction(
+            system_prompt_kwargs
         )
         system_message = self.update_system()
 
@@ -49,9 +71,16 @@ class Chat(Generic[T]):
         # TODO: ASSISTANT IP AND PORT IP
         self.database = DatabaseManager(
             name=user,
+            module_name=module_name,
             register=register_database,
         )
-        self.conversation = Conversation(module_name, system_message)
+        self.conversation = Conversation(
+            module_name,
+            system_message,
+            max_tokens=self.max_conversation_tokens,
+            model_name=module_config.get("model", {}).get("name"),
+        )
+        self.update_context()
         if memory_enabled:
             self.functions = [
                 self.update_short_term_memory,
@@ -69,20 +98,69 @@ class Chat(Generic[T]):
         functions: List[Callable] = [],
         add_default_functions=True,
         save_assistant_message=True,
+        on_delta: Optional[Callable[[ResponseDelta], None]] = None,
     ):
-        """Call the model to get a response."""
+        """Call the model to get a response, streaming it to on_delta if provided."""
+
+        function_schemas = self._prepare_call(functions, add_default_functions)
+        if on_delta is not None:
+            stream = self.model.stream_response(
+                conversation=self.conversation,
+                functions=function_schemas,
+            )
+            for delta in stream:
+                on_delta(delta)
+            response = stream.get_message()
+        else:
+            response = self.model.get_response(
+                conversation=self.conversation,
+                functions=function_schemas,
+            )
+        return self._process_response(
+            response, function_schemas, save_assistant_message
+        )
+
+    async def call_async(
+        self,
+        functions: List[Callable] = [],
+        add_default_functions=True,
+        save_assistant_message=True,
+    ):
+        """Call the model to get a response without blocking the event loop."""
+
+        function_schemas = self._prepare_call(functions, add_default_functions)
+        response = await self.model.get_response_async(
+            conversation=self.conversation,
+            functions=function_schemas,
+        )
+        return self._process_response(
+            response, function_schemas, save_assistant_message
+        )
 
+    def _prepare_call(
+        self, functions: List[Callable], add_default_functions: bool
+    ) -> List[Dict[str, Any]]:
         if self.model is None:
             self.load_model()
 
-        function_schemas = []
         if add_default_functions:
-            functions.extend(self.functions)
-        for function in functions:
-            function_schemas.append(PydanticParser.get_function_schema(function))
-        response = self.model.get_response(
-            conversation=self.conversation,
-            functions=function_schemas,
+            # Don't extend the caller's list, it would grow on every call.
+            functions = list(functions) + self.functions
+        function_schemas = PydanticParser.get_tools_payload(functions)
+        # Short-term memory could be updated by the previous tool calls.
+        self.update_context()
+        return function_schemas
+
+    def _process_response(
+        self,
+        response: ChatCompletionMessage,
+        function_schemas: List[Dict[str, Any]],
+        save_assistant_message: bool,
+    ):
+        self.record_usage(response)
+        LOG.info(
+            f"{self.module_name} stable prefix: {self.conversation.stable_prefix_messages} messages, "
+            f"{self.conversation.stable_prefix_tokens} tokens"
         )
         if function_schemas:
             tool_calls = response.tool_calls
@@ -97,28 +175,101 @@ class Chat(Generic[T]):
             self.conversation.add_assistant_message(response)
         return response
 
+    def record_usage(self, response):
+        """Record the tokens of the last model call on the module counters."""
+
+        usage = getattr(self.model, "last_usage", None)
+        if usage is None:
+            # The model doesn't report usage, estimate it from the conversation.
+            usage = (
+                self.conversation.total_tokens,
+                TokenCounter().count_message(
+                    self.conversation.model_name,
+                    {
+                        "content": response.content,
+                        "tool_calls": response.tool_calls,
+                    },
+                ),
+            )
+        TokenCounter().record_usage(self.module_name, *usage)
+        LOG.debug(
+            f"{self.module_name} tokens: {TokenCounter().get_stats(self.module_name)}"
+        )
+
+    def get_token_stats(self) -> Dict[str, Any]:
+        return TokenCounter().get_stats(self.module_name)
+
     def edit_system_message(self, system_prompt_kwargs: Dict[str, Any]):
         """Edit the system message."""
-        self.system_instruction_message = self.load_prompt(
-            "system", self.module_name, system_prompt_kwargs
+        self.system_instruction_message = self.load_system_instruction(
+            system_prompt_kwargs
         )
         system = self.update_system()
         self.conversation.edit_system_message(system)
+        self.update_context()
+
+    def is_prefix_stable(self) -> bool:
+        return self.prompt_layout == STABLE_PREFIX_LAYOUT
+
+    def load_system_instruction(self, system_prompt_kwargs: Dict[str, Any]) -> str:
+        if self.is_prefix_stable():
+            self.volatile_values = {
+                name: system_prompt_kwargs[name]
+                for name in self.volatile_prompt_kwargs
+                if name in system_prompt_kwargs
+            }
+            system_prompt_kwargs = {
+                **system_prompt_kwargs,
+                **{name: DEF_VOLATILE_PLACEHOLDER for name in self.volatile_values},
+            }
+        return self.load_prompt("system", self.module_name, system_prompt_kwargs)
+
+    def update_context(self):
+        """Render the volatile info on the trailing context message (only on stable_prefix layout)."""
+
+        if not self.is_prefix_stable() or self.conversation is None:
+            return
+        if not self.memory_enabled and not self.volatile_values:
+            self.conversation.set_context_message(None)
+            return
+        self.conversation.set_context_message(
+            self.load_prompt(
+                "context_meta",
+                args={
+                    "volatile": self.volatile_values,
+                    "memory_enabled": self.memory_enabled,
+                    "short_term_memory": self.get_short_term_memory(),
+                    "retrieved_data": self.retrieved_data,
+                    "conversation_left_tokens": self.get_conversation_left_tokens(),
+                },
+            )
+        )
 
     def update_system(self):
-        if self.memory_enabled:
+        if self.memory_enabled and self.is_prefix_stable():
+            self.system = self.load_prompt(
+                "system_meta_stable",
+                args={"instruction": self.system_instruction_message},
+            )
+        elif self.memory_enabled:
             self.system = self.load_prompt(
                 "system_meta",
                 args={
                     "instruction": self.system_instruction_message,
                     "short_term_memory": self.get_short_term_memory(),
                     "retrieved_data": self.retrieved_data,
+                    "conversation_left_tokens": self.get_conversation_left_tokens(),
                 },
             )
         else:
             self.system = self.system_instruction_message
         return self.system
 
+    def get_conversation_left_tokens(self) -> int:
+        if self.conversation is None:
+            return self.max_conversation_tokens
+        return self.conversation.get_left_tokens()
+
     def get_response(
         self,
         prompt_kwargs: Dict[str, Any],
@@ -134,8 +285,11 @@ class Chat(Generic[T]):
         prompt = self.load_prompt("user", self.module_name, prompt_kwargs)
         # 2. Search the most relevant information at long term memory.
         self.retrieved_data = self.search_on_long_term_memory(prompt)
-        # 3. Update system message with the new information.
-        self.update_system()
+        # 3. Update system message (or context message) with the new information.
+        if self.is_prefix_stable():
+            self.update_context()
+        else:
+            self.conversation.edit_system_message(self.update_system())
 
         self.conversation.add_user_message(prompt, user_name)
         return self.call(functions)
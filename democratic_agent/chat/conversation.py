@@ -1,24 +1,60 @@
 # from transformers import Conversation as HuggingfaceConversation -> Can't use HuggingfaceConversation as it doesn't accept tool_call_id as part of the message. https://github.com/huggingface/transformers/blob/main/src/transformers/pipelines/conversational.py#L83
-from typing import Dict, List, Optional
+import hashlib
+import json
+from typing import Any, Callable, Dict, List, Optional
 from openai.types.chat import ChatCompletionMessageToolCallParam
 
+from democratic_agent.config.config import Config
 from democratic_agent.data.data_saver import DataSaver
+from democratic_agent.models.token_counter import TokenCounter
+
+DEF_MAX_TOKENS = 16000
 
 
 class Conversation:
     """ "Wrapper over huggingface conversation to add some functionalities."""
 
-    def __init__(self, module_name: str, system_message: str):
+    def __init__(
+        self,
+        module_name: str,
+        system_message: str,
+        max_tokens: int = DEF_MAX_TOKENS,
+        model_name: Optional[str] = None,
+        on_trim: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ):
         # Add RAG | Ensure we don't surpass max tokens | Save on RAG | Retrieve from RAG.
         super().__init__()
+        self.max_tokens = max_tokens
+        self.model_name = model_name
+        # Called with the messages removed from the conversation to keep it under max_tokens.
+        self.on_trim = on_trim
+
         self.system_message = system_message
         self.messages = [{"role": "system", "content": system_message}]
+        # Token count of each message, in the same order as self.messages.
+        self.messages_tokens = [self.count_tokens(self.messages[0])]
+        self.total_tokens = self.messages_tokens[0]
+        # Volatile info sent after the conversation to keep the previous messages byte-stable.
+        self.context_message: Optional[Dict[str, Any]] = None
+        self.context_tokens = 0
+        # Hashes of the messages sent on the last call, to measure the stable prefix.
+        self.last_sent_hashes: List[str] = []
+        self.stable_prefix_messages = 0
+        self.stable_prefix_tokens = 0
 
-        # self.data_saver = DataSaver(module_name) -> TODO: Enable when addressing the tools.
-        # self.data_saver.start_new_conversation(system_message)
+        self.data_saver: Optional[DataSaver] = None
+        if Config().traces_enabled:
+            self.data_saver = DataSaver(module_name)
+            self.data_saver.start_new_conversation(system_message)
 
         # In case conversation is too long we should move info to RAG and call restart. (Create intelligent algorithm for this).
 
+    def count_tokens(self, message: Dict[str, Any]) -> int:
+        return TokenCounter().count_message(self.model_name, message)
+
+    def get_left_tokens(self) -> int:
+        return max(self.max_tokens - self.total_tokens, 0)
+
     def add_assistant_message(self, message: str):
         self._add_message({"role": "assistant", "content": message})
 
@@ -49,15 +85,91 @@ class Conversation:
 
     def _add_message(self, message: Dict[str, str]):
         self.messages.append(message)
-        # self.data_saver.add_message(message)
+        tokens = self.count_tokens(message)
+        self.messages_tokens.append(tokens)
+        self.total_tokens += tokens
+        self.trim()
+        if self.data_saver is not None:
+            self.data_saver.add_message(message)
 
     def edit_system_message(self, message: str):
         self.messages[0]["content"] = message
         self.system_message = message
-        # self.data_saver.edit_system_message(message)
+        tokens = self.count_tokens(self.messages[0])
+        self.total_tokens += tokens - self.messages_tokens[0]
+        self.messages_tokens[0] = tokens
+        self.trim()
+        if self.data_saver is not None:
+            self.data_saver.edit_system_message(message)
+
+    def set_context_message(self, message: Optional[str]):
+        """Set the trailing context message, None to remove it."""
+
+        if message is None:
+            self.context_message = None
+            tokens = 0
+        else:
+            self.context_message = {"role": "system", "content": message}
+            tokens = self.count_tokens(self.context_message)
+        self.total_tokens += tokens - self.context_tokens
+        self.context_tokens = tokens
+        self.trim()
+
+    def _hash_message(self, message: Dict[str, Any]) -> str:
+        return hashlib.sha1(
+            json.dumps(message, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+    def get_messages(self) -> List[Dict[str, Any]]:
+        """Get the messages to send to the model, measuring how many match the previous call from the start."""
+
+        messages = list(self.messages)
+        messages_tokens = list(self.messages_tokens)
+        if self.context_message is not None:
+            messages.append(self.context_message)
+            messages_tokens.append(self.context_tokens)
+
+        hashes = [self._hash_message(message) for message in messages]
+        prefix = 0
+        for last_hash, new_hash in zip(self.last_sent_hashes, hashes):
+            if last_hash != new_hash:
+                break
+            prefix += 1
+        self.stable_prefix_messages = prefix
+        self.stable_prefix_tokens = sum(messages_tokens[:prefix])
+        self.last_sent_hashes = hashes
+        return messages
+
+    def _get_oldest_turn_end(self) -> int:
+        """Get the end index of the oldest turn, keeping tool calls together with their results."""
+
+        end = 2
+        if self.messages[1].get("tool_calls"):
+            while end < len(self.messages) and self.messages[end]["role"] == "tool":
+                end += 1
+        return end
+
+    def trim(self):
+        """Remove the oldest turns (never the system message or the latest message) until the conversation fits max_tokens."""
+
+        trimmed_messages = []
+        while self.total_tokens > self.max_tokens and len(self.messages) > 2:
+            end = self._get_oldest_turn_end()
+            if end >= len(self.messages):
+                # The latest message belongs to the oldest turn, keep it.
+                break
+            trimmed_messages.extend(self.messages[1:end])
+            self.total_tokens -= sum(self.messages_tokens[1:end])
+            del self.messages[1:end]
+            del self.messages_tokens[1:end]
+        if trimmed_messages and self.on_trim is not None:
+            self.on_trim(trimmed_messages)
 
     def restart(self):
         # Move to RAG and clear all messages unless system.
         # Find system message
-        self.messages = [self.system_message]
-        # self.data_saver.start_new_conversation(self.system_message)
+        self.messages = [{"role": "system", "content": self.system_message}]
+        self.messages_tokens = [self.count_tokens(self.messages[0])]
+        self.total_tokens = self.messages_tokens[0] + self.context_tokens
+        if self.data_saver is not None:
+            self.data_saver.start_new_conversation(self.system_message)
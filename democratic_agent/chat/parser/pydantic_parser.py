@@ -1,5 +1,18 @@
+from collections import OrderedDict
 import json
-from typing import Any, Callable, cast, Dict, Generic, List, Optional, TypeVar, Type
+import threading
+from typing import (
+    Any,
+    Callable,
+    cast,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Type,
+)
 from pydantic import create_model, BaseModel, ValidationError
 import inspect
 from logging import getLogger
@@ -14,6 +27,9 @@ from democratic_agent.models.model import Model
 
 T = TypeVar("T", bound=LoggableBaseModel)
 
+# Function sets whose tools payload is kept.
+DEF_MAX_TOOLS_PAYLOADS = 128
+
 # TODO: Create our own logger.
 LOG = getLogger(__name__)
 
@@ -29,6 +45,14 @@ class ParseResult(Generic[T]):
 
 
 class PydanticParser(Generic[T]):
+    # Function -> schema/arguments model and function set -> tools payload, shared by all the chats.
+    _function_schemas: Dict[Callable, Dict[str, Any]] = {}
+    _function_models: Dict[Callable, Type[BaseModel]] = {}
+    _tools_payloads: OrderedDict[Tuple[Callable, ...], List[Dict[str, Any]]] = (
+        OrderedDict()
+    )
+    _cache_lock = threading.RLock()
+
     def __init__(self, model: Model):
         self.model = model
 
@@ -182,22 +206,64 @@ class PydanticParser(Generic[T]):
         # json_schema = json.dumps(schema)
         return schema
 
+    @classmethod
+    def _get_function_key(cls, fn: Callable) -> Callable:
+        # Bound methods are created on each attribute access, use the underlying function.
+        return getattr(fn, "__func__", fn)
+
     @classmethod
     def get_function_schema(cls, fn: Callable) -> Dict[str, Any]:
-        """Turn a function signature into a JSON schema.
+        """Turn a function signature into a JSON schema, memoized per function.
 
         Every JSON object valid to the output JSON Schema can be passed
         to `fn` using the ** unpacking syntax.
 
         """
 
-        params = {
-            name: (param.annotation, ...)
-            for name, param in inspect.signature(fn).parameters.items()
-            if name != "self"  # Skip the 'self' parameter
-        }
+        key = cls._get_function_key(fn)
+        function_info = cls._function_schemas.get(key)
+        if function_info is None:
+            function_info = cls._create_function_schema(fn)
+            with cls._cache_lock:
+                cls._function_schemas[key] = function_info
+        return function_info
+
+    @classmethod
+    def get_function_model(cls, fn: Callable) -> Type[BaseModel]:
+        """Get the pydantic model of the function arguments, memoized per function."""
 
-        model = create_model(f"{fn.__name__}Model", **params)
+        key = cls._get_function_key(fn)
+        model = cls._function_models.get(key)
+        if model is None:
+            model = cls._create_function_model(fn)
+            with cls._cache_lock:
+                cls._function_models[key] = model
+        return model
+
+    @classmethod
+    def _create_function_model(cls, fn: Callable) -> Type[BaseModel]:
+        params = {}
+        for name, param in inspect.signature(fn).parameters.items():
+            # Skip the 'self' parameter and *args, **kwargs
+            if name == "self" or param.kind in (
+                inspect.Parameter.VAR_POSITIONAL,
+                inspect.Parameter.VAR_KEYWORD,
+            ):
+                continue
+            annotation = (
+                param.annotation
+                if param.annotation is not inspect.Parameter.empty
+                else Any
+            )
+            default = (
+                param.default if param.default is not inspect.Parameter.empty else ...
+            )
+            params[name] = (annotation, default)
+        return create_model(f"{fn.__name__}Model", **params)
+
+    @classmethod
+    def _create_function_schema(cls, fn: Callable) -> Dict[str, Any]:
+        model = cls.get_function_model(fn)
         schema = cls._get_json_schema(model)
 
         docstring = inspect.getdoc(fn) or "No docstring provided"
@@ -210,3 +276,33 @@ class PydanticParser(Generic[T]):
             },
         }
         return function_info
+
+    @classmethod
+    def get_tools_payload(cls, functions: List[Callable]) -> List[Dict[str, Any]]:
+        """Get the schemas of a set of functions, the same list object is returned for the same functions."""
+
+        key = tuple(cls._get_function_key(fn) for fn in functions)
+        with cls._cache_lock:
+            payload = cls._tools_payloads.get(key)
+            if payload is not None:
+                cls._tools_payloads.move_to_end(key)
+                return payload
+        payload = [cls.get_function_schema(fn) for fn in functions]
+        with cls._cache_lock:
+            cls._tools_payloads[key] = payload
+            while len(cls._tools_payloads) > DEF_MAX_TOOLS_PAYLOADS:
+                cls._tools_payloads.popitem(last=False)
+        return payload
+
+    @classmethod
+    def invalidate_module(cls, module_name: str):
+        """Remove the cached schemas of the functions defined at module_name, used when it is reloaded."""
+
+        with cls._cache_lock:
+            for cache in (cls._function_schemas, cls._function_models):
+                for key in list(cache):
+                    if getattr(key, "__module__", None) == module_name:
+                        del cache[key]
+            for key in list(cls._tools_payloads):
+                if any(getattr(fn, "__module__", None) == module_name for fn in key):
+                    del cls._tools_payloads[key]
@@ -6,3 +6,9 @@ def get_modules():
     modules_path = Path(__file__).parent / "modules.yaml"
     with open(modules_path, "r", encoding="UTF-8") as file:
         return yaml.safe_load(file)
+
+
+def get_tools_config():
+    tools_path = Path(__file__).parent / "tools.yaml"
+    with open(tools_path, "r", encoding="UTF-8") as file:
+        return yaml.safe_load(file)
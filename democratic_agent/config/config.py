@@ -35,5 +35,37 @@ class Config(metaclass=Singleton):
         )  # TODO: Remove after moving to cloud
         self.weaviate_port = os.getenv("WEAVIATE_PORT", "9090")
         self.weaviate_key = os.getenv("WEAVIATE_KEY")
+        # Vector store: "weaviate" or "local"
+        self.vector_store = os.getenv("VECTOR_STORE", "weaviate")
+        self.local_vector_store_path = os.getenv("LOCAL_VECTOR_STORE_PATH")
+        # Partitions bigger than the threshold use approximate (IVF) search.
+        self.local_vector_store_ann_threshold = int(
+            os.getenv("LOCAL_VECTOR_STORE_ANN_THRESHOLD", "50000")
+        )
+        self.local_vector_store_num_probes = int(
+            os.getenv("LOCAL_VECTOR_STORE_NUM_PROBES", "8")
+        )
+        # Embeddings cache
+        self.embedding_cache_size = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+        self.embedding_cache_disk = (
+            os.getenv("EMBEDDING_CACHE_DISK", "true").lower() == "true"
+        )
+        # Prompts: reload the templates when the files change (development only).
+        self.prompts_auto_reload = (
+            os.getenv("PROMPTS_AUTO_RELOAD", "false").lower() == "true"
+        )
+        # Directory to cache the compiled templates between runs, disabled if not set.
+        self.prompts_bytecode_cache_path = os.getenv("PROMPTS_BYTECODE_CACHE_PATH")
+        # Requests: directory of the SQLite request stores, democratic_agent/data/requests if not set.
+        self.requests_store_path = os.getenv("REQUESTS_STORE_PATH")
+        # Traces: save the conversations of the modules, on democratic_agent/data/traces if no path is set.
+        self.traces_enabled = os.getenv("TRACES_ENABLED", "true").lower() == "true"
+        self.traces_path = os.getenv("TRACES_PATH")
+        # Communication: workers running the callbacks of all the sockets of the process.
+        self.communication_max_workers = int(
+            os.getenv("COMMUNICATION_MAX_WORKERS", "8")
+        )
+        # Database servers: workers answering the search/store requests concurrently.
+        self.database_server_workers = int(os.getenv("DATABASE_SERVER_WORKERS", "4"))
 
         # TODO: Add here IPs and ports.
@@ -1,71 +1,399 @@
+import atexit
+import fcntl
 import json
 from pathlib import Path
 import os
+import threading
+from time import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import uuid
 
+from democratic_agent.config.config import Config
 
-DEF_FILE_NAME_PREFIX = "conversation"
+DEF_TRACES_PATH = Path(__file__).parent / "traces"
+DEF_FILE_NAME_PREFIX = "segment"
+DEF_SEGMENT_SUFFIX = ".jsonl"
+# Index of each segment, one "<conversation_id> <offset>" line per record.
+DEF_INDEX_SUFFIX = ".idx"
+DEF_MAX_SEGMENT_BYTES = 64 * 1024 * 1024
+# Buffered records are written (and synced) together every interval or when the buffer is full.
+DEF_FLUSH_INTERVAL = 1.0
+DEF_MAX_BUFFERED_RECORDS = 256
+
+# Record types: a conversation is "start", then "message" and "system" (edit) records, then "end".
+START_RECORD = "start"
+MESSAGE_RECORD = "message"
+SYSTEM_RECORD = "system"
+END_RECORD = "end"
+
+
+def serialize_value(value: Any) -> Any:
+    # Tool calls are openai (pydantic) objects.
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return str(value)
+
+
+def get_segment_index(segment: Path) -> int:
+    return int(segment.stem.split(f"{DEF_FILE_NAME_PREFIX}_")[-1])
+
+
+def get_segments(traces_path: Path) -> List[Path]:
+    return sorted(
+        traces_path.glob(f"{DEF_FILE_NAME_PREFIX}_*{DEF_SEGMENT_SUFFIX}"),
+        key=get_segment_index,
+    )
+
+
+def is_segment_locked(segment: Path) -> bool:
+    """True while a writer (of any process) is appending to the segment."""
+
+    with open(segment, "rb") as file:
+        try:
+            fcntl.flock(file, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(file, fcntl.LOCK_UN)
+    return False
+
+
+def get_traces_path(module_name: str, path: Optional[Path] = None) -> Path:
+    if path is None:
+        path = Config().traces_path or DEF_TRACES_PATH
+    return Path(path) / module_name
+
+
+class SegmentWriter:
+    """Append-only writer of the trace segments of a module, shared by all its conversations.
+
+    Each writer holds an exclusive lock on its segment, the writers of other processes (e.g. the
+    systems of other users) skip the locked segments and append to their own ones.
+    """
+
+    def __init__(
+        self,
+        traces_path: Path,
+        max_segment_bytes: int = DEF_MAX_SEGMENT_BYTES,
+        flush_interval: float = DEF_FLUSH_INTERVAL,
+    ):
+        self.traces_path = traces_path
+        self.traces_path.mkdir(parents=True, exist_ok=True)
+        self.max_segment_bytes = max_segment_bytes
+        self.flush_interval = flush_interval
+
+        # (conversation_id, encoded record)
+        self.buffer: List[Tuple[str, bytes]] = []
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.segment_file = None
+        self.index_file = None
+        self._open_last_segment()
+
+        self.flush_event = threading.Event()
+        self.stop_event = threading.Event()
+        self.flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self.flush_thread.start()
+
+    def _open_last_segment(self):
+        segments = get_segments(self.traces_path)
+        self.segment_index = get_segment_index(segments[-1]) if segments else 0
+        self._open_segment()
+
+    def _segment_paths(self, index: int) -> Tuple[Path, Path]:
+        name = f"{DEF_FILE_NAME_PREFIX}_{index:06d}"
+        return (
+            self.traces_path / f"{name}{DEF_SEGMENT_SUFFIX}",
+            self.traces_path / f"{name}{DEF_INDEX_SUFFIX}",
+        )
+
+    def _open_segment(self):
+        while True:
+            segment_path, index_path = self._segment_paths(self.segment_index)
+            segment_file = open(segment_path, "ab")
+            try:
+                fcntl.flock(segment_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                # Another process is writing it.
+                segment_file.close()
+                self.segment_index += 1
+        self.segment_file = segment_file
+        if os.fstat(segment_file.fileno()).st_size > 0:
+            # Left by a process that stopped, it can't be writing it anymore.
+            self._recover(segment_path)
+        self.index_file = open(index_path, "ab")
+        self.segment_size = os.fstat(segment_file.fileno()).st_size
+
+    def _recover(self, segment_path: Path):
+        """Drop a partially written last record and index the records missing on the index.
+
+        The segment is truncated at the first record that can't be parsed.
+        """
+
+        with open(segment_path, "rb+") as file:
+            data_end = file.seek(0, os.SEEK_END)
+            while data_end > 0:
+                file.seek(max(data_end - 4096, 0))
+                chunk = file.read(data_end - max(data_end - 4096, 0))
+                newline = chunk.rfind(b"\n")
+                if newline != -1:
+                    data_end = max(data_end - 4096, 0) + newline + 1
+                    break
+                data_end = max(data_end - 4096, 0)
+            file.truncate(data_end)
+
+        index_path = segment_path.with_suffix(DEF_INDEX_SUFFIX)
+        entries = list(read_index(index_path))
+        entries = [entry for entry in entries if entry[1] < data_end]
+        next_offset = 0
+        if entries:
+            with open(segment_path, "rb") as file:
+                file.seek(entries[-1][1])
+                next_offset = entries[-1][1] + len(file.readline())
+        with open(segment_path, "rb+") as file:
+            file.seek(next_offset)
+            offset = next_offset
+            for line in file:
+                try:
+                    entries.append((json.loads(line)["conversation"], offset))
+                except (ValueError, KeyError, TypeError) as e:
+                    # Corrupted, e.g. by a crash or a disk error: keep the records before it.
+                    print(
+                        f"Dropping the traces of {segment_path} from offset {offset}, invalid record: {e}"
+                    )
+                    file.truncate(offset)
+                    break
+                offset += len(line)
+        with open(index_path, "wb") as file:
+            file.write(
+                "".join(f"{id} {offset}\n" for id, offset in entries).encode("utf-8")
+            )
+
+    def append(self, conversation_id: str, record: Dict[str, Any]):
+        line = (
+            json.dumps(record, default=serialize_value, ensure_ascii=False) + "\n"
+        ).encode("utf-8")
+        with self.lock:
+            self.buffer.append((conversation_id, line))
+            buffer_full = len(self.buffer) >= DEF_MAX_BUFFERED_RECORDS
+        if buffer_full:
+            self.flush_event.set()
+
+    def flush(self):
+        """Group commit: write the buffered records and their index entries on one write each."""
+
+        with self.write_lock:
+            with self.lock:
+                records, self.buffer = self.buffer, []
+            if not records or self.segment_file is None:
+                return
+            try:
+                segment_data, index_data = [], []
+                for conversation_id, line in records:
+                    if (
+                        self.segment_size > 0
+                        and self.segment_size + len(line) > self.max_segment_bytes
+                    ):
+                        self._write(segment_data, index_data)
+                        segment_data, index_data = [], []
+                        self._rotate()
+                    index_data.append(f"{conversation_id} {self.segment_size}\n")
+                    segment_data.append(line)
+                    self.segment_size += len(line)
+                self._write(segment_data, index_data)
+            except OSError as e:
+                print(f"Error saving {len(records)} traces on {self.traces_path}: {e}")
+
+    def _write(self, segment_data: List[bytes], index_data: List[str]):
+        if not segment_data:
+            return
+        # The segment goes first, the index is recovered from it if the process dies in between.
+        self.segment_file.write(b"".join(segment_data))
+        self.segment_file.flush()
+        os.fsync(self.segment_file.fileno())
+        self.index_file.write("".join(index_data).encode("utf-8"))
+        self.index_file.flush()
+
+    def _rotate(self):
+        self.segment_file.close()
+        self.index_file.close()
+        self.segment_index += 1
+        self._open_segment()
+
+    def _flush_loop(self):
+        while not self.stop_event.is_set():
+            self.flush_event.wait(self.flush_interval)
+            self.flush_event.clear()
+            self.flush()
+
+    def close(self):
+        if self.stop_event.is_set():
+            return
+        self.stop_event.set()
+        self.flush_event.set()
+        self.flush_thread.join()
+        self.flush()
+        with self.write_lock:
+            self.segment_file.close()
+            self.index_file.close()
+            self.segment_file = None
+
+
+_writers: Dict[Path, SegmentWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(traces_path: Path) -> SegmentWriter:
+    with _writers_lock:
+        writer = _writers.get(traces_path)
+        if writer is None:
+            writer = SegmentWriter(traces_path)
+            _writers[traces_path] = writer
+        return writer
+
+
+@atexit.register
+def close_writers():
+    with _writers_lock:
+        for writer in _writers.values():
+            writer.close()
+        _writers.clear()
 
 
 class DataSaver:
     """Store all the traces from the agents"""
 
-    def __init__(self, module_name: str):
+    def __init__(self, module_name: str, path: Optional[Path] = None):
         self.module_name = module_name
-        self.traces_path = Path(__file__).parent / "traces" / module_name
-        self.current_file = self.get_current_file()
-        self.max_lines = 50000
-
-    def get_current_file(self):
-        if not self.traces_path.exists():
-            self.traces_path.mkdir(parents=True, exist_ok=True)
-
-        files = list(self.traces_path.glob(f"{DEF_FILE_NAME_PREFIX}_*.json"))
-        if files:
-            return sorted(files)[-1]
-        else:
-            new_file = self.traces_path / f"{DEF_FILE_NAME_PREFIX}_0.json"
-            new_file.touch()
-            return new_file
-
-    def start_new_conversation(self, system_message):
-        with open(self.current_file, "r") as file:
-            lines = file.readlines()
-            number_of_lines = len(lines)
-        if number_of_lines > self.max_lines:
-            current_file_index = int(
-                self.current_file.name.split(f"{DEF_FILE_NAME_PREFIX}_")[-1].split(
-                    ".json"
-                )[0]
-            )
-            new_file_index = current_file_index + 1
-            self.current_file = (
-                self.traces_path / f"{DEF_FILE_NAME_PREFIX}_{new_file_index}.json"
-            )
-        new_convo = {"messages": [system_message]}
-        with open(self.current_file, "a") as file:
-            file.write(json.dumps(new_convo) + "\n")
+        self.traces_path = get_traces_path(module_name, path)
+        self.writer = get_writer(self.traces_path)
+        self.conversation_id: Optional[str] = None
+        # Last system message saved, it is only saved again when it changes.
+        self.system_message: Optional[str] = None
 
-    def add_message(self, message):
-        try:
-            with open(self.current_file, "rb+") as file:
-                try:
-                    file.seek(-2, os.SEEK_END)
-                    while file.read(1) != b"\n":
-                        file.seek(-2, os.SEEK_CUR)
-                except OSError:
-                    file.seek(0)
-                last_line_start = file.tell() if file.tell() > 0 else 0
-                file.seek(last_line_start)
-                last_line = file.readline().decode()
-                last_convo = json.loads(last_line)
-
-                # Update and write back
-                last_convo["messages"].append(message)
-                file.seek(last_line_start)
-                file.write(json.dumps(last_convo).encode() + b"\n")
-                file.truncate()
-        except FileNotFoundError:
-            print("No existing conversation file found. Creating a new one.")
-            self.start_new_conversation(message)
-        except Exception as e:
-            print(f"Error updating conversation: {e}")
+    def _append(self, record_type: str, **kwargs):
+        self.writer.append(
+            self.conversation_id,
+            {
+                "conversation": self.conversation_id,
+                "type": record_type,
+                "time": time(),
+                **kwargs,
+            },
+        )
+
+    def start_new_conversation(self, system_message: str):
+        self.end_conversation()
+        self.conversation_id = uuid.uuid4().hex
+        self.system_message = system_message
+        self._append(
+            START_RECORD, message={"role": "system", "content": system_message}
+        )
+
+    def add_message(self, message: Dict[str, Any]):
+        if self.conversation_id is None:
+            print("No conversation started, message not saved.")
+            return
+        self._append(MESSAGE_RECORD, message=message)
+
+    def edit_system_message(self, system_message: str):
+        # Chat rewrites the system message every turn, usually with the same content.
+        if self.conversation_id is None or system_message == self.system_message:
+            return
+        self.system_message = system_message
+        self._append(
+            SYSTEM_RECORD, message={"role": "system", "content": system_message}
+        )
+
+    def end_conversation(self, outcome: Optional[str] = None):
+        """End the current conversation, optionally with its outcome (e.g. "success" or "failure")."""
+
+        if self.conversation_id is not None:
+            if outcome is not None:
+                self._append(END_RECORD, outcome=outcome)
+            else:
+                self._append(END_RECORD)
+            self.conversation_id = None
+
+    def flush(self):
+        self.writer.flush()
+
+
+def read_index(index_path: Path) -> Iterator[Tuple[str, int]]:
+    if not index_path.exists():
+        return
+    with open(index_path, "r", encoding="utf-8") as file:
+        for line in file:
+            parts = line.split()
+            # Skip a partially written last entry.
+            if len(parts) == 2 and line.endswith("\n"):
+                yield parts[0], int(parts[1])
+
+
+class Conversations:
+    """Rebuilds the conversations of a module by streaming its trace segments."""
+
+    def __init__(self, module_name: str, path: Optional[Path] = None):
+        self.traces_path = get_traces_path(module_name, path)
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        for segment in get_segments(self.traces_path):
+            with open(segment, "rb") as file:
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        # Record being written.
+                        break
+                    yield json.loads(line)
+
+    def __iter__(self) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """Yield (conversation_id, messages) as each conversation ends, the unfinished ones at the end."""
+
+        open_conversations: Dict[str, List[Dict[str, Any]]] = {}
+        for record in self.iter_records():
+            id = record["conversation"]
+            if record["type"] == END_RECORD:
+                if id in open_conversations:
+                    yield id, open_conversations.pop(id)
+            else:
+                apply_record(open_conversations, record)
+        yield from open_conversations.items()
+
+    def get_records(self, conversation_id: str) -> Iterator[Dict[str, Any]]:
+        """Read only the records of a conversation, seeking them through the segment indexes."""
+
+        for segment in get_segments(self.traces_path):
+            offsets = [
+                offset
+                for id, offset in read_index(segment.with_suffix(DEF_INDEX_SUFFIX))
+                if id == conversation_id
+            ]
+            if not offsets:
+                continue
+            with open(segment, "rb") as file:
+                for offset in offsets:
+                    file.seek(offset)
+                    record = json.loads(file.readline())
+                    yield record
+                    if record["type"] == END_RECORD:
+                        return
+
+    def get(self, conversation_id: str) -> Optional[List[Dict[str, Any]]]:
+        conversations: Dict[str, List[Dict[str, Any]]] = {}
+        for record in self.get_records(conversation_id):
+            apply_record(conversations, record)
+        return conversations.get(conversation_id)
+
+
+def apply_record(
+    conversations: Dict[str, List[Dict[str, Any]]], record: Dict[str, Any]
+):
+    id = record["conversation"]
+    if record["type"] == START_RECORD:
+        conversations[id] = [record["message"]]
+    elif id not in conversations:
+        # Started on a deleted segment.
+        return
+    elif record["type"] == MESSAGE_RECORD:
+        conversations[id].append(record["message"])
+    elif record["type"] == SYSTEM_RECORD:
+        conversations[id][0] = record["message"]
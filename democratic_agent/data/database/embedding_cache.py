@@ -0,0 +1,155 @@
+from collections import OrderedDict
+import fcntl
+import hashlib
+import json
+from logging import getLogger
+import os
+from pathlib import Path
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+DEF_CACHE_PATH = Path(__file__).parent / "embeddings"
+
+LOG = getLogger(__name__)
+
+
+class DiskEmbeddingCache:
+    """Append-only on-disk embedding store, read through a memory-mapped float32 matrix.
+
+    The files are shared by the processes using the same model (assistant and systems), the
+    appends hold an exclusive lock on the vectors file.
+    """
+
+    def __init__(self, path: Path, model: str):
+        self.path = Path(path) / model.replace("/", "_")
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.vectors_file = self.path / "vectors.f32"
+        self.index_file = self.path / "index.jsonl"
+        self.dimension: Optional[int] = None
+        self.index: Dict[str, int] = {}
+        self.vectors: Optional[np.memmap] = None
+        self._load_index()
+
+    def _load_index(self):
+        if not self.index_file.exists():
+            return
+        with open(self.index_file, "r") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Partial line from an interrupted write, ignore it.
+                    continue
+                self.index[entry["key"]] = entry["row"]
+                self.dimension = entry["dim"]
+        # Drop rows whose vector was not fully written.
+        if self.dimension and self.vectors_file.exists():
+            num_rows = self.vectors_file.stat().st_size // (self.dimension * 4)
+            self.index = {key: row for key, row in self.index.items() if row < num_rows}
+
+    def _map_vectors(self):
+        num_rows = self.vectors_file.stat().st_size // (self.dimension * 4)
+        self.vectors = np.memmap(
+            self.vectors_file,
+            dtype=np.float32,
+            mode="r",
+            shape=(num_rows, self.dimension),
+        )
+
+    def get(self, key: str) -> Optional[List[float]]:
+        row = self.index.get(key)
+        if row is None:
+            return None
+        if self.vectors is None or row >= self.vectors.shape[0]:
+            self._map_vectors()
+        return self.vectors[row].tolist()
+
+    def put(self, key: str, embedding: List[float]):
+        vector = np.asarray(embedding, dtype=np.float32)
+        if self.dimension is None:
+            self.dimension = vector.shape[0]
+        elif vector.shape[0] != self.dimension:
+            LOG.warning(
+                f"Skipping embedding with dimension {vector.shape[0]}, cache expects {self.dimension}"
+            )
+            return
+        with open(self.vectors_file, "ab") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                # The size under the lock, other processes append to the same file.
+                row = os.fstat(file.fileno()).st_size // (self.dimension * 4)
+                file.write(vector.tobytes())
+                file.flush()
+                with open(self.index_file, "a") as index_file:
+                    index_file.write(
+                        json.dumps({"key": key, "row": row, "dim": self.dimension})
+                        + "\n"
+                    )
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+        self.index[key] = row
+
+
+class EmbeddingCache:
+    """Content-hash keyed embedding cache with a bounded LRU tier and an optional disk tier."""
+
+    def __init__(
+        self,
+        model: str,
+        max_size: int = 4096,
+        disk_path: Optional[Path] = None,
+    ):
+        self.model = model
+        self.max_size = max_size
+        self.memory: OrderedDict[str, List[float]] = OrderedDict()
+        self.disk = DiskEmbeddingCache(disk_path, model) if disk_path else None
+        self.lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get_key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}:{text}".encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> Optional[List[float]]:
+        key = self.get_key(text)
+        with self.lock:
+            embedding = self.memory.get(key)
+            if embedding is not None:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return embedding
+            if self.disk is not None:
+                embedding = self.disk.get(key)
+                if embedding is not None:
+                    self._add_to_memory(key, embedding)
+                    self.disk_hits += 1
+                    return embedding
+            self.misses += 1
+            return None
+
+    def put(self, text: str, embedding: List[float]):
+        key = self.get_key(text)
+        with self.lock:
+            self._add_to_memory(key, embedding)
+            if self.disk is not None and key not in self.disk.index:
+                self.disk.put(key, embedding)
+
+    def _add_to_memory(self, key: str, embedding: List[float]):
+        self.memory[key] = embedding
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_size:
+            self.memory.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_size": len(self.memory),
+                "disk_size": len(self.disk.index) if self.disk is not None else 0,
+            }
@@ -0,0 +1,389 @@
+import fcntl
+import json
+import os
+from pathlib import Path
+import re
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+import uuid
+
+import numpy as np
+
+from democratic_agent.config.config import Config
+from democratic_agent.data.database.vector_store import VectorStore
+from democratic_agent.models.embedding_model import EmbeddingModel
+
+DEF_LOCAL_STORE_PATH = Path(__file__).parent / "local_store"
+DEF_INITIAL_CAPACITY = 1024
+DEF_KMEANS_ITERATIONS = 10
+DEF_KMEANS_SAMPLES = 20000
+
+
+class IVFIndex:
+    """Inverted file index: vectors are clustered by k-means and only the closest clusters are scanned."""
+
+    def __init__(self, vectors: np.ndarray, num_probes: int):
+        self.num_rows = vectors.shape[0]
+        self.num_probes = num_probes
+        num_lists = max(1, int(np.sqrt(self.num_rows)))
+        self.centroids = self._train(vectors, num_lists)
+        assignments = self._assign(vectors)
+        self.lists = [np.flatnonzero(assignments == i) for i in range(num_lists)]
+
+    def _train(self, vectors: np.ndarray, num_lists: int) -> np.ndarray:
+        rng = np.random.default_rng(0)
+        num_samples = min(self.num_rows, DEF_KMEANS_SAMPLES)
+        samples = np.asarray(vectors[rng.choice(self.num_rows, num_samples, False)])
+        centroids = samples[rng.choice(num_samples, num_lists, False)].copy()
+        for _ in range(DEF_KMEANS_ITERATIONS):
+            assignments = np.argmax(samples @ centroids.T, axis=1)
+            for i in range(num_lists):
+                members = samples[assignments == i]
+                if len(members) > 0:
+                    centroid = members.sum(axis=0)
+                    centroids[i] = centroid / (np.linalg.norm(centroid) or 1.0)
+        return centroids
+
+    def _assign(self, vectors: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        assignments = np.empty(self.num_rows, dtype=np.int64)
+        for start in range(0, self.num_rows, chunk_size):
+            chunk = vectors[start : start + chunk_size]
+            assignments[start : start + chunk_size] = np.argmax(
+                chunk @ self.centroids.T, axis=1
+            )
+        return assignments
+
+    def get_candidates(self, query: np.ndarray) -> np.ndarray:
+        num_probes = min(self.num_probes, len(self.lists))
+        probes = np.argpartition(-(self.centroids @ query), num_probes - 1)
+        return np.concatenate([self.lists[i] for i in probes[:num_probes]])
+
+
+class VectorPartition:
+    """Normalized float32 vectors memory-mapped from disk, together with their properties.
+
+    One instance per path is shared by the process (get_partition). Other processes (e.g. the
+    systems of each user writing the tools) append to the same files: the writes hold an exclusive
+    lock on the records file and every access reads first the records appended by the others.
+    """
+
+    def __init__(self, path: Path, ann_threshold: int, num_probes: int):
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.vectors_file = self.path / "vectors.f32"
+        self.records_file = self.path / "records.jsonl"
+        self.ann_threshold = ann_threshold
+        self.num_probes = num_probes
+
+        self.records: List[Dict] = []
+        self.key_to_row: Dict[str, int] = {}
+        self.dimension: Optional[int] = None
+        self.capacity = 0
+        self.vectors: Optional[np.memmap] = None
+        # Bytes of the records file already read.
+        self.records_offset = 0
+        self.lock = threading.Lock()
+
+        self.index: Optional[IVFIndex] = None
+        # Rows updated after building the index, they are always scanned.
+        self.dirty_rows: Set[int] = set()
+        self.refresh()
+
+    def refresh(self):
+        """Read the records appended since the last read, including the ones of other processes."""
+
+        if not self.records_file.exists():
+            return
+        size = self.records_file.stat().st_size
+        if size > self.records_offset:
+            with open(self.records_file, "rb") as file:
+                file.seek(self.records_offset)
+                data = file.read(size - self.records_offset)
+            # Only the complete lines, the last one could be being written.
+            end = data.rfind(b"\n") + 1
+            self.records_offset += end
+            for line in data[:end].splitlines():
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                self._apply(record)
+        if self.dimension is not None and self.vectors_file.exists():
+            capacity = self.vectors_file.stat().st_size // (self.dimension * 4)
+            # Ignore the records whose vector was not written.
+            self.records = self.records[:capacity]
+            if capacity != self.capacity:
+                self.capacity = capacity
+                if self.capacity > 0:
+                    self._map_vectors()
+
+    def _apply(self, record: Dict):
+        row = record.pop("_row")
+        self.dimension = record.pop("_dim")
+        if row < len(self.records):
+            self.records[row] = record
+            self.dirty_rows.add(row)
+        else:
+            self.records.append(record)
+        if "_key" in record:
+            self.key_to_row[record["_key"]] = row
+
+    def _map_vectors(self):
+        self.vectors = np.memmap(
+            self.vectors_file,
+            dtype=np.float32,
+            mode="r+",
+            shape=(self.capacity, self.dimension),
+        )
+
+    def _ensure_capacity(self, num_rows: int):
+        if num_rows <= self.capacity:
+            return
+        new_capacity = max(DEF_INITIAL_CAPACITY, self.capacity)
+        while new_capacity < num_rows:
+            new_capacity *= 2
+        if self.vectors is not None:
+            self.vectors.flush()
+            self.vectors = None
+        with open(self.vectors_file, "ab") as file:
+            file.truncate(new_capacity * self.dimension * 4)
+        self.capacity = new_capacity
+        self._map_vectors()
+
+    def __len__(self):
+        return len(self.records)
+
+    def get_row(self, key: str) -> Optional[int]:
+        return self.key_to_row.get(key)
+
+    def upsert(
+        self, records: List[Dict], vectors: np.ndarray, rows: List[Optional[int]]
+    ):
+        """Write the records at the given rows, appending the ones whose row is None."""
+
+        with open(self.records_file, "a") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                self.refresh()
+                self._upsert(records, vectors, rows, file)
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def _upsert(
+        self, records: List[Dict], vectors: np.ndarray, rows: List[Optional[int]], file
+    ):
+        if self.dimension is None:
+            self.dimension = vectors.shape[1]
+        elif vectors.shape[1] != self.dimension:
+            raise ValueError(
+                f"Vector dimension {vectors.shape[1]} doesn't match the stored dimension {self.dimension}"
+            )
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1.0, norms)
+
+        # Keyed records appended meanwhile by another process are updated in place.
+        rows = [
+            row if row is not None else self.key_to_row.get(record.get("_key"), -1)
+            for record, row in zip(records, rows)
+        ]
+        num_new = rows.count(-1)
+        self._ensure_capacity(len(self.records) + num_new)
+        lines = []
+        for record, vector, row in zip(records, vectors, rows):
+            if row == -1:
+                row = len(self.records)
+                self.records.append(record)
+            else:
+                self.records[row] = record
+                self.dirty_rows.add(row)
+            if "_key" in record:
+                self.key_to_row[record["_key"]] = row
+            self.vectors[row] = vector
+            lines.append(json.dumps({**record, "_row": row, "_dim": self.dimension}))
+        # The vectors go first, the records are only read once complete.
+        self.vectors.flush()
+        file.write("\n".join(lines) + "\n")
+        file.flush()
+        self.records_offset = os.fstat(file.fileno()).st_size
+
+    def search(self, queries: np.ndarray, num_relevant: int) -> List[List[Tuple]]:
+        """Cosine top-k for each query, returns (record, similarity) pairs."""
+
+        self.refresh()
+        num_rows = len(self.records)
+        if num_rows == 0:
+            return [[] for _ in queries]
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1.0, norms)
+        vectors = self.vectors[:num_rows]
+
+        self._update_index(vectors)
+        if self.index is None:
+            all_scores = queries @ vectors.T
+            return [self._top_k(scores, None, num_relevant) for scores in all_scores]
+
+        results = []
+        tail = np.arange(self.index.num_rows, num_rows)
+        dirty = np.fromiter(self.dirty_rows, dtype=np.int64)
+        for query in queries:
+            candidates = np.unique(
+                np.concatenate([self.index.get_candidates(query), tail, dirty])
+            )
+            scores = vectors[candidates] @ query
+            results.append(self._top_k(scores, candidates, num_relevant))
+        return results
+
+    def _update_index(self, vectors: np.ndarray):
+        num_rows = vectors.shape[0]
+        if num_rows < self.ann_threshold:
+            self.index = None
+            return
+        # Rebuild when the rows outside the index double the indexed ones.
+        if self.index is None or num_rows >= 2 * self.index.num_rows:
+            self.index = IVFIndex(vectors, self.num_probes)
+            self.dirty_rows = set()
+
+    def _top_k(
+        self, scores: np.ndarray, rows: Optional[np.ndarray], num_relevant: int
+    ) -> List[Tuple]:
+        num_relevant = min(num_relevant, scores.shape[0])
+        if num_relevant == 0:
+            return []
+        best = np.argpartition(-scores, num_relevant - 1)[:num_relevant]
+        best = best[np.argsort(-scores[best])]
+        return [
+            (self.records[rows[i] if rows is not None else i], float(scores[i]))
+            for i in best
+        ]
+
+
+_partitions: Dict[Path, VectorPartition] = {}
+_partitions_lock = threading.Lock()
+
+
+def get_partition(path: Path, ann_threshold: int, num_probes: int) -> VectorPartition:
+    """Partition of the path shared by all the stores of the process."""
+
+    with _partitions_lock:
+        partition = _partitions.get(path)
+        if partition is None:
+            partition = VectorPartition(path, ann_threshold, num_probes)
+            _partitions[path] = partition
+        return partition
+
+
+class LocalVectorDB(VectorStore):
+    """In-process vector store with one memory-mapped partition per user and one for the tools."""
+
+    def __init__(self, embedding_model: EmbeddingModel, path: Optional[Path] = None):
+        super().__init__(embedding_model)
+        self.path = Path(
+            path or Config().local_vector_store_path or DEF_LOCAL_STORE_PATH
+        )
+        self.ann_threshold = Config().local_vector_store_ann_threshold
+        self.num_probes = Config().local_vector_store_num_probes
+
+    def _get_partition(self, class_name: str, user_name: Optional[str] = None):
+        name = class_name
+        if user_name is not None:
+            name += "/" + re.sub(r"[^A-Za-z0-9_.-]", "_", user_name)
+        return get_partition(
+            (self.path / name).resolve(), self.ann_threshold, self.num_probes
+        )
+
+    def _format_results(self, matches: List[Tuple], fields: List[str]):
+        if not matches:
+            return None
+        return [
+            {
+                **{field: record.get(field) for field in fields},
+                "_additional": {
+                    # Same definition as Weaviate's certainty for cosine distance.
+                    "certainty": (1 + similarity) / 2,
+                    "id": record["_id"],
+                },
+            }
+            for record, similarity in matches
+        ]
+
+    def search(self, user_name: str, query: str, num_relevant=2, certainty=0.7):
+        query_vector = np.asarray([self.get_embedding(query)], dtype=np.float32)
+        partition = self._get_partition("UserInfo", user_name)
+        with partition.lock:
+            matches = partition.search(query_vector, num_relevant)[0]
+        return self._format_results(matches, ["user_name", "info"])
+
+    def search_tool(self, query: str, num_relevant=2, certainty=0.7):
+        return self.search_tools([query], num_relevant=num_relevant)[0]
+
+    def search_tools(self, queries: List[str], num_relevant=2):
+        if not queries:
+            return []
+        query_vectors = np.asarray(self.get_embeddings(queries), dtype=np.float32)
+        partition = self._get_partition("Tool")
+        with partition.lock:
+            all_matches = partition.search(query_vectors, num_relevant)
+        return [
+            self._format_results(matches, ["name", "description"])
+            for matches in all_matches
+        ]
+
+    def store(self, user_name: str, info: str):
+        return self.store_many(user_name, [info])[0]
+
+    def store_many(self, user_name: str, infos: List[str]) -> List[str]:
+        if not infos:
+            return []
+        vectors = np.asarray(self.get_embeddings(infos), dtype=np.float32)
+        records = [
+            {"_id": str(uuid.uuid4()), "user_name": user_name, "info": info}
+            for info in infos
+        ]
+        partition = self._get_partition("UserInfo", user_name)
+        with partition.lock:
+            partition.upsert(records, vectors, [None] * len(records))
+        return [record["_id"] for record in records]
+
+    def store_tool(self, name: str, description: str):
+        partition = self._get_partition("Tool")
+        with partition.lock:
+            partition.refresh()
+            row = partition.get_row(name)
+            if row is not None:
+                return partition.records[row]["_id"]
+        return self.store_tools([(name, description)]).get(name)
+
+    def store_tools(self, tools: List[Tuple[str, str]]) -> Dict[str, str]:
+        partition = self._get_partition("Tool")
+        with partition.lock:
+            partition.refresh()
+            pending = []
+            for name, description in tools:
+                row = partition.get_row(name)
+                if row is None or partition.records[row]["description"] != description:
+                    pending.append((name, description, row))
+        if not pending:
+            return {}
+
+        vectors = np.asarray(
+            self.get_embeddings([description for _, description, _ in pending]),
+            dtype=np.float32,
+        )
+        with partition.lock:
+            records = []
+            for name, description, row in pending:
+                tool_id = (
+                    partition.records[row]["_id"]
+                    if row is not None
+                    else str(uuid.uuid5(uuid.NAMESPACE_URL, f"Tool:{name}"))
+                )
+                records.append(
+                    {
+                        "_id": tool_id,
+                        "_key": name,
+                        "name": name,
+                        "description": description,
+                    }
+                )
+            partition.upsert(records, vectors, [row for _, _, row in pending])
+        return {record["name"]: record["_id"] for record in records}
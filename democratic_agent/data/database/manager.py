@@ -1,3 +1,5 @@
+from typing import List, Tuple
+
 from democratic_agent.architecture.helpers.topics import (
     DEF_SEARCH_DATABASE,
     DEF_STORE_DATABASE,
@@ -6,24 +8,45 @@ from democratic_agent.architecture.helpers.tmp_ips import (
     DEF_ASSISTANT_IP,
     DEF_SERVER_PORT,
 )
-from democratic_agent.data.database.weaviate import WeaviateDB
+from democratic_agent.config.config import Config
+from democratic_agent.data.database.local import LocalVectorDB
+from democratic_agent.data.database.vector_store import VectorStore
+from democratic_agent.models.embedding_model import EmbeddingModel
+from democratic_agent.models.models_manager import ModelsManager
 from democratic_agent.utils.communication_protocols import Server
 
 
+def create_vector_store(embedding_model: EmbeddingModel) -> VectorStore:
+    """Create the vector store selected at config"""
+
+    vector_store = Config().vector_store
+    if vector_store == "weaviate":
+        # Imported here so the local backend can run without weaviate-client.
+        from democratic_agent.data.database.weaviate import WeaviateDB
+
+        return WeaviateDB(embedding_model)
+    elif vector_store == "local":
+        return LocalVectorDB(embedding_model)
+    raise ValueError(f"Vector store {vector_store} not recognized.")
+
+
 class DatabaseManager:
-    def __init__(self, name: str, register: bool = True):
-        self.database = WeaviateDB()
+    def __init__(self, name: str, module_name: str, register: bool = True):
+        embedding_model = ModelsManager().create_embedding_model(module_name)
+        self.database = create_vector_store(embedding_model)
         self.name = name
         if register:
             self.search_user_info_server = Server(
                 address=f"tcp://{DEF_ASSISTANT_IP}:{DEF_SERVER_PORT}",
                 topics=[f"{name}_{DEF_SEARCH_DATABASE}"],
                 callback=self.search,
+                workers=Config().database_server_workers,
             )
             self.store_user_info_server = Server(
                 address=f"tcp://{DEF_ASSISTANT_IP}:{DEF_SERVER_PORT}",
                 topics=[f"{name}_{DEF_STORE_DATABASE}"],
                 callback=self.store,
+                workers=Config().database_server_workers,
             )
 
     def search_tool(self, query: str):
@@ -32,6 +55,13 @@ class DatabaseManager:
             return None
         return search_result[0]
 
+    def search_tools(self, queries: List[str]):
+        search_results = self.database.search_tools(queries=queries)
+        return [
+            search_result[0] if search_result else None
+            for search_result in search_results
+        ]
+
     def search(self, query: str):
         search_result = self.database.search(user_name=self.name, query=query)
         if search_result is None:
@@ -49,3 +79,11 @@ class DatabaseManager:
     def store_tool(self, name: str, description: str):
         self.database.store_tool(name=name, description=description)
         return "OK"
+
+    def store_many(self, infos: List[str]):
+        self.database.store_many(user_name=self.name, infos=infos)
+        return "OK"
+
+    def store_tools(self, tools: List[Tuple[str, str]]):
+        self.database.store_tools(tools=tools)
+        return "OK"
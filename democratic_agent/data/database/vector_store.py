@@ -0,0 +1,96 @@
+import abc
+from typing import Dict, List, Optional, Tuple
+
+from democratic_agent.config.config import Config
+from democratic_agent.data.database.embedding_cache import (
+    DEF_CACHE_PATH,
+    EmbeddingCache,
+)
+from democratic_agent.models.embedding_model import EmbeddingModel
+
+
+class VectorStore(abc.ABC):
+    """Common interface for the vector databases used by the DatabaseManager."""
+
+    def __init__(self, embedding_model: EmbeddingModel):
+        self.embedding_model = embedding_model
+        if embedding_model.remote:
+            self.embedding_cache = EmbeddingCache(
+                model=embedding_model.name,
+                max_size=Config().embedding_cache_size,
+                disk_path=DEF_CACHE_PATH if Config().embedding_cache_disk else None,
+            )
+        else:
+            self.embedding_cache = None
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self.get_embeddings([text])[0]
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embed several texts, requesting all the cache misses in a single call."""
+
+        texts = [text.replace("\n", " ") for text in texts]
+        if self.embedding_cache is None:
+            return self.embedding_model.get_embeddings(texts)
+
+        embeddings = [self.embedding_cache.get(text) for text in texts]
+        missing = list(
+            dict.fromkeys(
+                text for text, embedding in zip(texts, embeddings) if embedding is None
+            )
+        )
+        if missing:
+            new_embeddings = dict(
+                zip(missing, self.embedding_model.get_embeddings(missing))
+            )
+            for text, embedding in new_embeddings.items():
+                self.embedding_cache.put(text, embedding)
+            embeddings = [
+                embedding if embedding is not None else new_embeddings[text]
+                for text, embedding in zip(texts, embeddings)
+            ]
+        return embeddings
+
+    # The search methods return a list of matches formatted as Weaviate does:
+    # the stored properties plus "_additional" with the "certainty" and the "id", or None.
+
+    @abc.abstractmethod
+    def search(
+        self, user_name: str, query: str, num_relevant=2, certainty=0.7
+    ) -> Optional[List[Dict]]:
+        """Search the most similar info stored for the user."""
+        pass
+
+    @abc.abstractmethod
+    def search_tool(
+        self, query: str, num_relevant=2, certainty=0.7
+    ) -> Optional[List[Dict]]:
+        """Search the tools with the most similar description."""
+        pass
+
+    @abc.abstractmethod
+    def search_tools(
+        self, queries: List[str], num_relevant=2
+    ) -> List[Optional[List[Dict]]]:
+        """Search several tool queries at once, returns the matches for each query."""
+        pass
+
+    @abc.abstractmethod
+    def store(self, user_name: str, info: str):
+        """Store info for the user."""
+        pass
+
+    @abc.abstractmethod
+    def store_many(self, user_name: str, infos: List[str]) -> List[str]:
+        """Store several infos for the user at once."""
+        pass
+
+    @abc.abstractmethod
+    def store_tool(self, name: str, description: str):
+        """Store a tool in case it doesn't exist yet."""
+        pass
+
+    @abc.abstractmethod
+    def store_tools(self, tools: List[Tuple[str, str]]) -> Dict[str, str]:
+        """Upsert several tools at once."""
+        pass
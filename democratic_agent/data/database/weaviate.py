@@ -1,7 +1,17 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
 import weaviate
-from openai import OpenAI
+from weaviate.util import generate_uuid5
 
 from democratic_agent.config.config import Config
+from democratic_agent.data.database.vector_store import VectorStore
+from democratic_agent.models.embedding_model import EmbeddingModel
+
+DEF_BATCH_SIZE = 100
+DEF_MANIFEST_PATH = Path(__file__).parent / "manifests" / "tools.json"
 
 
 # TODO: Define more schemas -> User info, tool, episode (previous tasks)...
@@ -43,16 +53,17 @@ DEF_SCHEMA = {
 }
 
 
-class WeaviateDB(object):
-    def __init__(self):
+class WeaviateDB(VectorStore):
+    def __init__(self, embedding_model: EmbeddingModel):
+        super().__init__(embedding_model)
         weaviate_key = Config().weaviate_key
-        self.openai_client = OpenAI()
 
         if weaviate_key:
             # Run on weaviate cloud service
             auth = weaviate.auth.AuthApiKey(api_key=weaviate_key)
+            self.url = Config().weaviate_url
             self.client = weaviate.Client(
-                url=Config().weaviate_url,
+                url=self.url,
                 auth_client_secret=auth,
                 additional_headers={
                     "X-OpenAI-Api-Key": Config().openai_api_key,
@@ -60,13 +71,18 @@ class WeaviateDB(object):
             )
         else:
             # Run locally"
-            self.client = weaviate.Client(
-                url=f"{Config().local_weaviate_url}:{Config().weaviate_port}"
-            )
+            self.url = f"{Config().local_weaviate_url}:{Config().weaviate_port}"
+            self.client = weaviate.Client(url=self.url)
         # self.client.schema.delete_all()
-        self._create_schema()
+        created_classes = self._create_schema()
+        if "Tool" in created_classes:
+            # Fresh data (e.g. new container or volume): the manifest tools are not stored here.
+            self._save_manifest({})
+
+    def _create_schema(self) -> List[str]:
+        """Create the missing classes, returns their names."""
 
-    def _create_schema(self):
+        created_classes = []
         # Check if classes in the schema already exist in Weaviate
         for class_definition in DEF_SCHEMA["classes"]:
             class_name = class_definition["class"]
@@ -75,18 +91,10 @@ class WeaviateDB(object):
                 if not self.client.schema.contains(class_definition):
                     # Class doesn't exist, so we attempt to create it
                     self.client.schema.create_class(class_definition)
+                    created_classes.append(class_name)
             except Exception as err:
                 print(f"Unexpected error {err=}, {type(err)=}")
-
-    def get_ada_embedding(self, text):
-        text = text.replace("\n", " ")
-        return (
-            self.openai_client.embeddings.create(
-                input=[text], model="text-embedding-ada-002"
-            )
-            .data[0]
-            .embedding
-        )
+        return created_classes
 
     def _get_relevant(
         self,
@@ -117,7 +125,7 @@ class WeaviateDB(object):
             return None
 
     def search(self, user_name: str, query: str, num_relevant=2, certainty=0.7):
-        query_vector = self.get_ada_embedding(query)
+        query_vector = self.get_embedding(query)
         # Get the most similar content
         user_filter = {
             "path": ["user_name"],
@@ -134,7 +142,7 @@ class WeaviateDB(object):
         return most_similar_contents
 
     def search_tool(self, query: str, num_relevant=2, certainty=0.7):
-        query_vector = self.get_ada_embedding(query)
+        query_vector = self.get_embedding(query)
         # Get the most similar content
         most_similar_contents = self._get_relevant(
             vector=({"vector": query_vector}),  # TODO: add "certainty": certainty
@@ -144,6 +152,31 @@ class WeaviateDB(object):
         )
         return most_similar_contents
 
+    def search_tools(
+        self, queries: List[str], num_relevant=2
+    ) -> List[Optional[List[dict]]]:
+        """Search several tool queries with one embeddings request and one GraphQL request."""
+
+        if not queries:
+            return []
+        query_vectors = self.get_embeddings(queries)
+        aliases = [f"query_{index}" for index in range(len(queries))]
+        try:
+            get_queries = [
+                self.client.query.get("Tool", ["name", "description"])
+                .with_near_vector({"vector": query_vector})
+                .with_limit(num_relevant)
+                .with_additional(["certainty", "id"])
+                .with_alias(alias)
+                for alias, query_vector in zip(aliases, query_vectors)
+            ]
+            results = self.client.query.multi_get(get_queries).do()
+            found = results["data"]["Get"]
+            return [found.get(alias) or None for alias in aliases]
+        except Exception as err:
+            print(f"Unexpected error {err=}, {type(err)=}")
+            return [None for _ in queries]
+
     def store_tool(self, name: str, description: str):
         """Store a tool in the database in case it doesn't exist yet"""
 
@@ -164,7 +197,7 @@ class WeaviateDB(object):
             if len(results["data"]["Get"]["Tool"]) > 0:
                 return results["data"]["Get"]["Tool"][0]["_additional"]["id"]
             else:
-                info_vector = self.get_ada_embedding(description)
+                info_vector = self.get_embedding(description)
                 tool_uuid = self.client.data_object.create(
                     data_object={
                         "name": name,
@@ -184,7 +217,7 @@ class WeaviateDB(object):
         info: str,
     ):
         # TODO: If the object doesn't exist, proceed with creating a new one
-        info_vector = self.get_ada_embedding(info)
+        info_vector = self.get_embedding(info)
         user_info_uuid = self.client.data_object.create(
             data_object={
                 "user_name": user_name,
@@ -194,3 +227,138 @@ class WeaviateDB(object):
             vector=info_vector,
         )
         return user_info_uuid
+
+    def store_many(self, user_name: str, infos: List[str]) -> List[str]:
+        """Store several user infos using one embeddings request and the batch API."""
+
+        if not infos:
+            return []
+        info_vectors = self.get_embeddings(infos)
+        uuids = [generate_uuid5(f"{user_name}:{info}", "UserInfo") for info in infos]
+        self._batch_create(
+            class_name="UserInfo",
+            objects=[{"user_name": user_name, "info": info} for info in infos],
+            uuids=uuids,
+            vectors=info_vectors,
+        )
+        return uuids
+
+    def store_tools(self, tools: List[Tuple[str, str]]) -> Dict[str, str]:
+        """Upsert several tools, skipping the ones unchanged since the last run according to the local manifest"""
+
+        manifest = self._load_manifest()
+        pending = [
+            (name, description)
+            for name, description in tools
+            if manifest.get(name) != self._get_tool_hash(name, description)
+        ]
+        if not pending:
+            return {}
+
+        try:
+            existing_ids = self._get_tool_ids()
+            uuids = [
+                existing_ids.get(name, generate_uuid5(name, "Tool"))
+                for name, _ in pending
+            ]
+            vectors = self.get_embeddings([description for _, description in pending])
+            failed = self._batch_create(
+                class_name="Tool",
+                objects=[
+                    {"name": name, "description": description}
+                    for name, description in pending
+                ],
+                uuids=uuids,
+                vectors=vectors,
+            )
+        except Exception as err:
+            print(f"Unexpected error {err=}, {type(err)=}")
+            return {}
+
+        stored = {}
+        for (name, description), tool_uuid in zip(pending, uuids):
+            if tool_uuid not in failed:
+                manifest[name] = self._get_tool_hash(name, description)
+                stored[name] = tool_uuid
+        self._save_manifest(manifest)
+        return stored
+
+    def _get_tool_ids(self) -> Dict[str, str]:
+        """Get the ids of the stored tools by name, so tools stored before the manifest existed are updated in place."""
+
+        tool_ids = {}
+        after = None
+        while True:
+            query = (
+                self.client.query.get("Tool", ["name"])
+                .with_additional(["id"])
+                .with_limit(DEF_BATCH_SIZE)
+            )
+            if after is not None:
+                query = query.with_after(after)
+            tools = query.do()["data"]["Get"]["Tool"]
+            for tool in tools:
+                tool_ids[tool["name"]] = tool["_additional"]["id"]
+            if len(tools) < DEF_BATCH_SIZE:
+                return tool_ids
+            after = tools[-1]["_additional"]["id"]
+
+    def _batch_create(
+        self,
+        class_name: str,
+        objects: List[Dict[str, str]],
+        uuids: List[str],
+        vectors: List[List[float]],
+    ) -> List[str]:
+        """Create or replace the objects with the batch API, returns the uuids that failed."""
+
+        failed = []
+
+        def check_batch_result(results):
+            for result in results or []:
+                errors = result.get("result", {}).get("errors")
+                if errors:
+                    print(
+                        f"Error storing {class_name} object {result.get('id')}: {errors}"
+                    )
+                    failed.append(result.get("id"))
+
+        self.client.batch.configure(
+            batch_size=DEF_BATCH_SIZE, callback=check_batch_result
+        )
+        with self.client.batch as batch:
+            for data_object, object_uuid, vector in zip(objects, uuids, vectors):
+                batch.add_data_object(
+                    data_object=data_object,
+                    class_name=class_name,
+                    uuid=object_uuid,
+                    vector=vector,
+                )
+        return failed
+
+    def _get_tool_hash(self, name: str, description: str) -> str:
+        return hashlib.sha256(f"{name}:{description}".encode("utf-8")).hexdigest()
+
+    def _load_manifest(self) -> Dict[str, str]:
+        """Get the hashes of the tools stored on this Weaviate instance."""
+
+        if not DEF_MANIFEST_PATH.exists():
+            return {}
+        try:
+            with open(DEF_MANIFEST_PATH, "r") as file:
+                return json.load(file).get(self.url, {})
+        except json.JSONDecodeError:
+            return {}
+
+    def _save_manifest(self, manifest: Dict[str, str]):
+        manifests = {}
+        if DEF_MANIFEST_PATH.exists():
+            try:
+                with open(DEF_MANIFEST_PATH, "r") as file:
+                    manifests = json.load(file)
+            except json.JSONDecodeError:
+                pass
+        manifests[self.url] = manifest
+        DEF_MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(DEF_MANIFEST_PATH, "w") as file:
+            json.dump(manifests, file, indent=2)
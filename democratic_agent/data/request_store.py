@@ -0,0 +1,271 @@
+from collections import OrderedDict
+import atexit
+from pathlib import Path
+import sqlite3
+import threading
+from time import time
+from typing import Dict, List, Optional, Tuple
+
+from democratic_agent.architecture.helpers.request import Request, RequestStatus
+from democratic_agent.config.config import Config
+
+DEF_STORE_PATH = Path(__file__).parent / "requests"
+# Pending writes are flushed on a single transaction every interval or when the batch is full.
+DEF_FLUSH_INTERVAL = 0.5
+DEF_MAX_BATCH = 256
+# Finished requests kept in memory (and loaded on start) to show the recent ones.
+DEF_MAX_RECENT = 20
+FINISHED_STATUSES = (RequestStatus.SUCCESS, RequestStatus.FAILURE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    id TEXT PRIMARY KEY,
+    user_name TEXT,
+    request TEXT NOT NULL,
+    status TEXT NOT NULL,
+    feedback TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS requests_user_status ON requests (user_name, status);
+CREATE INDEX IF NOT EXISTS requests_status_updated ON requests (status, updated_at);
+"""
+
+UPSERT = """
+INSERT INTO requests (id, user_name, request, status, feedback, created_at, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    user_name = excluded.user_name,
+    request = excluded.request,
+    status = excluded.status,
+    feedback = excluded.feedback,
+    updated_at = excluded.updated_at
+"""
+
+
+class StoredRequest:
+    def __init__(
+        self,
+        request: Request,
+        user_name: Optional[str],
+        created_at: float,
+        updated_at: float,
+    ):
+        self.request = request
+        self.user_name = user_name
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    def is_active(self) -> bool:
+        return self.request.get_status() not in FINISHED_STATUSES
+
+    def to_row(self) -> Tuple:
+        return (
+            str(self.request.get_id()),
+            self.user_name,
+            self.request.request,
+            self.request.get_status().name,
+            self.request.get_feedback(),
+            self.created_at,
+            self.updated_at,
+        )
+
+    @staticmethod
+    def from_row(row: Tuple) -> "StoredRequest":
+        id, user_name, request, status, feedback, created_at, updated_at = row
+        return StoredRequest(
+            Request(
+                request=request,
+                status=RequestStatus[status],
+                feedback=feedback,
+                id=int(id),
+            ),
+            user_name,
+            created_at,
+            updated_at,
+        )
+
+
+class RequestStore:
+    """Persistent requests of a module on SQLite (WAL), indexed by id, user and status.
+
+    Reads are served from memory (active and recent requests), writes are batched on a background thread.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        path: Optional[Path] = None,
+        flush_interval: float = DEF_FLUSH_INTERVAL,
+        max_recent: int = DEF_MAX_RECENT,
+    ):
+        if path is None:
+            path = Config().requests_store_path or DEF_STORE_PATH
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        self.db_file = path / f"{name}.db"
+        self.flush_interval = flush_interval
+        self.max_recent = max_recent
+
+        self.connection = sqlite3.connect(self.db_file, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # WAL keeps the database consistent, a crash only loses the last unflushed batch.
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+        self.active: Dict[int, StoredRequest] = {}
+        # Finished requests ordered by last update, the newest at the end.
+        self.recent: OrderedDict[int, StoredRequest] = OrderedDict()
+        # id -> row, only the last version of each request is written.
+        self.pending: Dict[str, Tuple] = {}
+        self.lock = threading.Lock()
+        self.db_lock = threading.Lock()
+        self._load()
+
+        self.flush_event = threading.Event()
+        self.stop_event = threading.Event()
+        self.flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self.flush_thread.start()
+        atexit.register(self.close)
+
+    def _load(self):
+        finished = tuple(status.name for status in FINISHED_STATUSES)
+        with self.db_lock:
+            active_rows = self.connection.execute(
+                "SELECT * FROM requests WHERE status NOT IN (?, ?) ORDER BY created_at",
+                finished,
+            ).fetchall()
+            recent_rows = self.connection.execute(
+                "SELECT * FROM requests WHERE status IN (?, ?) ORDER BY updated_at DESC LIMIT ?",
+                (*finished, self.max_recent),
+            ).fetchall()
+        for row in active_rows:
+            stored = StoredRequest.from_row(row)
+            self.active[stored.request.get_id()] = stored
+        for row in reversed(recent_rows):
+            stored = StoredRequest.from_row(row)
+            self.recent[stored.request.get_id()] = stored
+
+    def put(self, request: Request, user_name: Optional[str] = None):
+        """Add or update a request, keeping the user of the previous version if not given."""
+
+        id = request.get_id()
+        now = time()
+        with self.lock:
+            stored = self.active.pop(id, None) or self.recent.pop(id, None)
+            if stored is None:
+                stored = StoredRequest(request, user_name, now, now)
+            else:
+                stored.request = request
+                stored.user_name = user_name or stored.user_name
+                stored.updated_at = now
+            if stored.is_active():
+                self.active[id] = stored
+            else:
+                self.recent[id] = stored
+                while len(self.recent) > self.max_recent:
+                    self.recent.popitem(last=False)
+            self.pending[str(id)] = stored.to_row()
+            batch_full = len(self.pending) >= DEF_MAX_BATCH
+        if batch_full:
+            self.flush_event.set()
+
+    def get(self, id: int) -> Optional[Request]:
+        stored = self.get_stored(id)
+        return stored.request if stored is not None else None
+
+    def get_stored(self, id: int) -> Optional[StoredRequest]:
+        with self.lock:
+            stored = self.active.get(id) or self.recent.get(id)
+        if stored is not None:
+            return stored
+        # Older finished requests are only on disk.
+        self.flush()
+        with self.db_lock:
+            row = self.connection.execute(
+                "SELECT * FROM requests WHERE id = ?", (str(id),)
+            ).fetchone()
+        return StoredRequest.from_row(row) if row is not None else None
+
+    def get_user_name(self, id: int) -> Optional[str]:
+        stored = self.get_stored(id)
+        return stored.user_name if stored is not None else None
+
+    def get_active(
+        self, user_name: Optional[str] = None, limit: Optional[int] = None
+    ) -> List[Request]:
+        """Get the unfinished requests, oldest first (only the newest limit ones if given)."""
+
+        with self.lock:
+            active = [
+                stored.request
+                for stored in self.active.values()
+                if user_name is None or stored.user_name == user_name
+            ]
+        return active[-limit:] if limit else active
+
+    def count_active(self) -> int:
+        with self.lock:
+            return len(self.active)
+
+    def get_recent(self, limit: Optional[int] = None) -> List[Request]:
+        """Get the last finished requests, newest first."""
+
+        with self.lock:
+            recent = [stored.request for stored in reversed(self.recent.values())]
+        return recent[:limit] if limit is not None else recent
+
+    def query(
+        self,
+        user_name: Optional[str] = None,
+        statuses: Optional[List[RequestStatus]] = None,
+        limit: int = 100,
+    ) -> List[Request]:
+        """Search all the stored requests by user and status, newest first."""
+
+        self.flush()
+        conditions, params = [], []
+        if user_name is not None:
+            conditions.append("user_name = ?")
+            params.append(user_name)
+        if statuses:
+            conditions.append(f"status IN ({', '.join('?' * len(statuses))})")
+            params.extend(status.name for status in statuses)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.db_lock:
+            rows = self.connection.execute(
+                f"SELECT * FROM requests {where} ORDER BY updated_at DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [StoredRequest.from_row(row).request for row in rows]
+
+    def flush(self):
+        """Write the pending changes on a single transaction."""
+
+        with self.db_lock:
+            with self.lock:
+                rows = list(self.pending.values())
+                self.pending = {}
+            if not rows:
+                return
+            try:
+                with self.connection:
+                    self.connection.executemany(UPSERT, rows)
+            except sqlite3.Error as e:
+                print(f"Error saving {len(rows)} requests on {self.db_file}: {e}")
+
+    def _flush_loop(self):
+        while not self.stop_event.is_set():
+            self.flush_event.wait(self.flush_interval)
+            self.flush_event.clear()
+            self.flush()
+
+    def close(self):
+        if self.stop_event.is_set():
+            return
+        self.stop_event.set()
+        self.flush_event.set()
+        self.flush_thread.join()
+        self.flush()
+        with self.db_lock:
+            self.connection.close()
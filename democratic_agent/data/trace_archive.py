@@ -0,0 +1,379 @@
+import argparse
+from collections import OrderedDict
+import json
+import mmap
+import os
+from pathlib import Path
+import struct
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+import zstandard
+
+from democratic_agent.config.config import Config
+from democratic_agent.data.data_saver import (
+    DEF_INDEX_SUFFIX,
+    DEF_TRACES_PATH,
+    END_RECORD,
+    MESSAGE_RECORD,
+    START_RECORD,
+    Conversations,
+    apply_record,
+    get_segment_index,
+    get_segments,
+    get_traces_path,
+    is_segment_locked,
+)
+
+DEF_ARCHIVE_PREFIX = "archive"
+DEF_ARCHIVE_SUFFIX = ".zst"
+MAGIC = b"DATRACE1"
+# index offset, index length, magic
+TRAILER = struct.Struct("<QQ8s")
+# Uncompressed bytes per block, the unit of random access.
+DEF_BLOCK_SIZE = 64 * 1024
+DEF_COMPRESSION_LEVEL = 3
+DEF_CACHED_BLOCKS = 8
+# Tool used by the executor to finish a task, its "success" argument is the outcome.
+DEF_OUTCOME_TOOL = "set_task_completed"
+
+
+def get_tool_names(message: Dict[str, Any]) -> Iterator[Tuple[str, str]]:
+    """Yield (name, arguments) of the tool calls of a message."""
+
+    for tool_call in message.get("tool_calls") or []:
+        function = tool_call.get("function", {})
+        yield function.get("name"), function.get("arguments")
+
+
+def get_outcome(records: Iterable[Dict[str, Any]]) -> Optional[str]:
+    """Get the outcome set on the end record or, if missing, by the last call to the outcome tool."""
+
+    outcome = None
+    for record in records:
+        if record["type"] == END_RECORD and record.get("outcome"):
+            return record["outcome"]
+        if record["type"] != MESSAGE_RECORD:
+            continue
+        for name, arguments in get_tool_names(record["message"]):
+            if name == DEF_OUTCOME_TOOL:
+                try:
+                    success = json.loads(arguments).get("success", True)
+                except (json.JSONDecodeError, AttributeError):
+                    continue
+                outcome = "success" if success else "failure"
+    return outcome
+
+
+def get_tools(records: Iterable[Dict[str, Any]]) -> Set[str]:
+    return {
+        name
+        for record in records
+        if record["type"] == MESSAGE_RECORD
+        for name, _ in get_tool_names(record["message"])
+    }
+
+
+def write_archive(
+    segment: Path,
+    archive_path: Path,
+    block_size: int = DEF_BLOCK_SIZE,
+    level: int = DEF_COMPRESSION_LEVEL,
+):
+    """Compress the records of a segment into zstd blocks, grouping the records of each conversation."""
+
+    # Conversation -> encoded records, in order of first appearance.
+    conversations: OrderedDict[str, List[bytes]] = OrderedDict()
+    records: Dict[str, List[Dict[str, Any]]] = {}
+    with open(segment, "rb") as file:
+        for line in file:
+            if not line.endswith(b"\n"):
+                break
+            record = json.loads(line)
+            id = record["conversation"]
+            conversations.setdefault(id, []).append(line)
+            records.setdefault(id, []).append(record)
+
+    compressor = zstandard.ZstdCompressor(level=level)
+    blocks: List[Tuple[int, int]] = []
+    index: Dict[str, Dict[str, Any]] = {}
+    tmp_path = archive_path.with_suffix(".tmp")
+    with open(tmp_path, "wb") as file:
+        file.write(MAGIC)
+        block: List[bytes] = []
+        block_bytes = 0
+
+        def write_block():
+            data = compressor.compress(b"".join(block))
+            blocks.append((file.tell(), len(data)))
+            file.write(data)
+
+        for id, lines in conversations.items():
+            conversation_blocks = []
+            for line in lines:
+                if block_bytes > 0 and block_bytes + len(line) > block_size:
+                    write_block()
+                    block, block_bytes = [], 0
+                if not conversation_blocks or conversation_blocks[-1] != len(blocks):
+                    conversation_blocks.append(len(blocks))
+                block.append(line)
+                block_bytes += len(line)
+            conversation_records = records[id]
+            index[id] = {
+                "blocks": conversation_blocks,
+                "start": conversation_records[0]["type"] == START_RECORD,
+                "end": conversation_records[-1]["type"] == END_RECORD,
+                "time": conversation_records[0].get("time"),
+                "tools": sorted(get_tools(conversation_records)),
+                "outcome": get_outcome(conversation_records),
+            }
+        if block:
+            write_block()
+
+        index_data = compressor.compress(
+            json.dumps(
+                {
+                    "segment": get_segment_index(segment),
+                    "blocks": blocks,
+                    "conversations": index,
+                }
+            ).encode("utf-8")
+        )
+        index_offset = file.tell()
+        file.write(index_data)
+        file.write(TRAILER.pack(index_offset, len(index_data), MAGIC))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, archive_path)
+
+
+class ArchiveFile:
+    """Memory-mapped reader of an archive, decompressing only the blocks that are read."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.decompressor = zstandard.ZstdDecompressor()
+        index_offset, index_length, magic = TRAILER.unpack(self.map[-TRAILER.size :])
+        if magic != MAGIC or self.map[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a trace archive")
+        index = json.loads(
+            self.decompressor.decompress(
+                self.map[index_offset : index_offset + index_length]
+            )
+        )
+        self.segment: int = index["segment"]
+        self.blocks: List[Tuple[int, int]] = index["blocks"]
+        self.conversations: Dict[str, Dict[str, Any]] = index["conversations"]
+        self.cached_blocks: OrderedDict[int, List[bytes]] = OrderedDict()
+
+    def read_block(self, block: int) -> List[bytes]:
+        lines = self.cached_blocks.get(block)
+        if lines is not None:
+            self.cached_blocks.move_to_end(block)
+            return lines
+        offset, length = self.blocks[block]
+        lines = self.decompressor.decompress(
+            self.map[offset : offset + length]
+        ).splitlines()
+        self.cached_blocks[block] = lines
+        while len(self.cached_blocks) > DEF_CACHED_BLOCKS:
+            self.cached_blocks.popitem(last=False)
+        return lines
+
+    def get_records(self, conversation_id: str) -> List[Dict[str, Any]]:
+        info = self.conversations.get(conversation_id)
+        if info is None:
+            return []
+        # Only decode the lines of the conversation, the blocks can have others.
+        key = json.dumps(conversation_id).encode("utf-8")
+        records = []
+        for block in info["blocks"]:
+            for line in self.read_block(block):
+                if key in line:
+                    record = json.loads(line)
+                    if record["conversation"] == conversation_id:
+                        records.append(record)
+        return records
+
+    def close(self):
+        self.cached_blocks.clear()
+        self.map.close()
+        self.file.close()
+
+
+class TraceArchive:
+    """Compacted traces of a module: zstd archives of the rotated segments plus the live segments."""
+
+    def __init__(self, module_name: str, path: Optional[Path] = None):
+        self.module_name = module_name
+        self.traces_path = get_traces_path(module_name, path)
+        self.live = Conversations(module_name, path)
+        self.archives: Dict[Path, ArchiveFile] = {}
+        self.sorted_archives: List[ArchiveFile] = []
+        # Modification time of the traces directory when the archives were listed.
+        self.listed_mtime: Optional[int] = None
+
+    def get_archive_paths(self) -> List[Path]:
+        return sorted(
+            self.traces_path.glob(f"{DEF_ARCHIVE_PREFIX}_*{DEF_ARCHIVE_SUFFIX}"),
+            key=lambda path: int(path.stem.split("_")[-1]),
+        )
+
+    def get_archives(self) -> List[ArchiveFile]:
+        if not self.traces_path.exists():
+            return []
+        mtime = self.traces_path.stat().st_mtime_ns
+        if mtime == self.listed_mtime:
+            return self.sorted_archives
+        archives = []
+        for path in self.get_archive_paths():
+            archive = self.archives.get(path)
+            if archive is None:
+                archive = ArchiveFile(path)
+                self.archives[path] = archive
+            archives.append(archive)
+        self.sorted_archives = archives
+        self.listed_mtime = mtime
+        return archives
+
+    def compact(self) -> List[Path]:
+        """Archive the rotated segments (all but the last one and the ones being written) and remove them."""
+
+        archived = []
+        for segment in get_segments(self.traces_path)[:-1]:
+            if is_segment_locked(segment):
+                continue
+            archive_path = (
+                self.traces_path
+                / f"{DEF_ARCHIVE_PREFIX}_{get_segment_index(segment):06d}{DEF_ARCHIVE_SUFFIX}"
+            )
+            write_archive(segment, archive_path)
+            segment.with_suffix(DEF_INDEX_SUFFIX).unlink(missing_ok=True)
+            segment.unlink()
+            archived.append(archive_path)
+        return archived
+
+    def get_records(self, conversation_id: str) -> Iterator[Dict[str, Any]]:
+        for archive in self.get_archives():
+            yield from archive.get_records(conversation_id)
+        yield from self.live.get_records(conversation_id)
+
+    def get(self, conversation_id: str) -> Optional[List[Dict[str, Any]]]:
+        conversations: Dict[str, List[Dict[str, Any]]] = {}
+        for record in self.get_records(conversation_id):
+            apply_record(conversations, record)
+        return conversations.get(conversation_id)
+
+    def iter_conversations(
+        self,
+        tools: Optional[List[str]] = None,
+        outcomes: Optional[List[str]] = None,
+        include_unfinished: bool = False,
+    ) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """Stream the conversations matching the filters, skipping the blocks of the ones that don't."""
+
+        def matches(conversation_tools, outcome) -> bool:
+            if tools and not set(tools) & set(conversation_tools):
+                return False
+            return not outcomes or outcome in outcomes
+
+        # Conversations spanning several archives or segments: id -> records.
+        open_records: Dict[str, List[Dict[str, Any]]] = {}
+
+        def finish(id: str) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+            records = open_records.pop(id)
+            if not matches(get_tools(records), get_outcome(records)):
+                return None
+            conversations: Dict[str, List[Dict[str, Any]]] = {}
+            for record in records:
+                apply_record(conversations, record)
+            return (id, conversations[id]) if id in conversations else None
+
+        for archive in self.get_archives():
+            for id, info in archive.conversations.items():
+                if info["start"] and info["end"] and id not in open_records:
+                    # Whole conversation on the archive, filter it by its index entry.
+                    if matches(info["tools"], info["outcome"]):
+                        conversations: Dict[str, List[Dict[str, Any]]] = {}
+                        for record in archive.get_records(id):
+                            apply_record(conversations, record)
+                        yield id, conversations[id]
+                    continue
+                open_records.setdefault(id, []).extend(archive.get_records(id))
+                if info["end"]:
+                    result = finish(id)
+                    if result is not None:
+                        yield result
+        for record in self.live.iter_records():
+            id = record["conversation"]
+            open_records.setdefault(id, []).append(record)
+            if record["type"] == END_RECORD:
+                result = finish(id)
+                if result is not None:
+                    yield result
+        if include_unfinished:
+            for id in list(open_records):
+                result = finish(id)
+                if result is not None:
+                    yield result
+
+    def close(self):
+        for archive in self.archives.values():
+            archive.close()
+        self.archives = {}
+
+
+def get_traced_modules(path: Optional[Path] = None) -> List[str]:
+    root = Path(path or Config().traces_path or DEF_TRACES_PATH)
+    if not root.exists():
+        return []
+    return sorted(entry.name for entry in root.iterdir() if entry.is_dir())
+
+
+def export_conversations(
+    output: TextIO,
+    modules: Optional[List[str]] = None,
+    tools: Optional[List[str]] = None,
+    outcomes: Optional[List[str]] = None,
+    path: Optional[Path] = None,
+) -> int:
+    """Write the matching conversations as chat-format JSONL ({"messages": [...]}), returns the number written."""
+
+    count = 0
+    for module_name in modules or get_traced_modules(path):
+        archive = TraceArchive(module_name, path)
+        try:
+            for _, messages in archive.iter_conversations(tools, outcomes):
+                output.write(json.dumps({"messages": messages}, ensure_ascii=False))
+                output.write("\n")
+                count += 1
+        finally:
+            archive.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact and export the traces.")
+    parser.add_argument("command", choices=["compact", "export"])
+    parser.add_argument("-p", "--path", default=None, help="Traces path")
+    parser.add_argument("-m", "--modules", nargs="*", help="Modules, all if not set")
+    parser.add_argument("-t", "--tools", nargs="*", help="Only calling these tools")
+    parser.add_argument("--outcomes", nargs="*", help="e.g. success failure")
+    parser.add_argument("-o", "--output", default="traces.jsonl", help="Export file")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        for module_name in args.modules or get_traced_modules(args.path):
+            archived = TraceArchive(module_name, args.path).compact()
+            print(f"{module_name}: archived {len(archived)} segments")
+    else:
+        with open(args.output, "w", encoding="utf-8") as output:
+            count = export_conversations(
+                output, args.modules, args.tools, args.outcomes, args.path
+            )
+        print(f"Exported {count} conversations to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Run the Google tools against a local fake and check the pool of the shared services.
+
+The services are built from the discovery documents bundled with googleapiclient and answer with
+HttpMockSequence, so no credentials or network are needed. Each service must be reused between
+the calls and only used by one thread at a time (httplib2 is not thread-safe).
+
+Run with: python -m democratic_agent.experimental.google_services_fake
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from typing import Any, Dict, List
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.http import HttpMockSequence
+
+from democratic_agent.tools.google_services import (
+    GoogleServices,
+    set_google_services,
+)
+from democratic_agent.tools.tools.add_calendar_entry import add_calendar_entry
+from democratic_agent.tools.tools.send_email import send_email
+
+NUM_THREADS = 8
+CALLS_PER_THREAD = 25
+# Keeps each request in flight a bit, so the threads overlap.
+REQUEST_DELAY = 0.002
+RESPONSE = ({"status": "200"}, b'{"id": "fake_id"}')
+
+
+class FakeHttp(HttpMockSequence):
+    """Answers every request with RESPONSE, failing if two threads use it at the same time."""
+
+    def __init__(self, stats: "FakeStats"):
+        super().__init__([RESPONSE] * NUM_THREADS * CALLS_PER_THREAD * 2)
+        self.stats = stats
+        self.in_use = threading.Lock()
+        self.threads = set()
+
+    def request(self, *args, **kwargs):
+        if not self.in_use.acquire(blocking=False):
+            self.stats.add_error("Service used by two threads at the same time")
+            return super().request(*args, **kwargs)
+        try:
+            self.threads.add(threading.get_ident())
+            time.sleep(REQUEST_DELAY)
+            with self.stats.lock:
+                self.stats.requests += 1
+                return super().request(*args, **kwargs)
+        finally:
+            self.in_use.release()
+
+
+class FakeStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.https: List[FakeHttp] = []
+        self.requests = 0
+        self.errors: List[str] = []
+
+    def create_http(self, credentials: Any) -> FakeHttp:
+        http = FakeHttp(self)
+        with self.lock:
+            self.https.append(http)
+        return http
+
+    def add_error(self, error: str):
+        with self.lock:
+            self.errors.append(error)
+
+
+def load_fake_credentials(scopes: List[str], token_file: str) -> Credentials:
+    # Without refresh token the background refresh skips it.
+    return Credentials(token="fake_token", scopes=scopes)
+
+
+def run_tools(thread_index: int) -> Dict[str, int]:
+    results = {"ok": 0, "failed": 0}
+    for i in range(CALLS_PER_THREAD):
+        if (thread_index + i) % 2:
+            result = send_email("fake@example.com", f"Subject {i}", "Body")
+            ok = result == "Message sent successfully!"
+        else:
+            result = add_calendar_entry(
+                "Meeting",
+                "Office",
+                f"Meeting {i}",
+                "2024-01-01T10:00:00+00:00",
+                "2024-01-01T11:00:00+00:00",
+            )
+            ok = result.startswith("Event created successfully")
+        results["ok" if ok else "failed"] += 1
+        if not ok:
+            print(f"Unexpected result: {result}")
+    return results
+
+
+def main():
+    stats = FakeStats()
+    google_services = GoogleServices(
+        http_factory=stats.create_http, credentials_loader=load_fake_credentials
+    )
+    set_google_services(google_services)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=NUM_THREADS) as executor:
+        results = list(executor.map(run_tools, range(NUM_THREADS)))
+    elapsed = time.perf_counter() - start
+    google_services.close()
+
+    calls = NUM_THREADS * CALLS_PER_THREAD
+    ok = sum(result["ok"] for result in results)
+    shared = sum(1 for http in stats.https if len(http.threads) > 1)
+    print(f"Tool calls: {calls} in {elapsed:.2f}s, succeeded: {ok}")
+    print(f"Requests: {stats.requests}, services built: {len(stats.https)}")
+    print(f"Services reused by several threads: {shared}")
+
+    assert ok == calls, "Some tool calls failed"
+    assert not stats.errors, stats.errors[0]
+    # Services over DEF_MAX_IDLE_SERVICES per api are dropped when returned, so a few are rebuilt.
+    assert len(stats.https) < calls // 4 and shared, "The services are not reused"
+    print("OK: the services are reused and never shared by two threads at once.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Compare the dispatch overhead of a tool call: previous inline parsing vs the cached ToolInvoker.
+
+Run with: python -m democratic_agent.experimental.tool_dispatch_benchmark
+"""
+
+import inspect
+import json
+import timeit
+from typing import List, Optional
+
+from democratic_agent.tools.tool_invoker import ToolInvoker
+
+NUM_CALLS = 20000
+
+
+def add_calendar_entry(
+    summary: str,
+    start_time: str,
+    end_time: str,
+    description: Optional[str] = None,
+    attendees: Optional[List[str]] = None,
+):
+    return "Event created"
+
+
+ARGUMENTS = json.dumps(
+    {
+        "summary": "Meeting",
+        "start_time": "2024-01-01T10:00:00",
+        "end_time": "2024-01-01T11:00:00",
+        "attendees": ["a@example.com", "b@example.com"],
+    }
+)
+
+
+def legacy_dispatch(functions, function_name: str, arguments: str):
+    """Previous ToolsManager.execute_tools parsing, done for every tool call."""
+
+    functions_dict = {}
+    for function in functions:
+        functions_dict[function.__name__] = function
+    function = functions_dict[function_name]
+    signature = inspect.signature(function)
+    args = [param.name for param in signature.parameters.values()]
+    arguments = json.loads(arguments)
+    call_arguments_dict = {}
+    for arg in args:
+        default_value = signature.parameters[arg].default
+        arg_value = arguments.get(arg, None)
+        if arg_value is None and default_value is inspect.Parameter.empty:
+            raise Exception(f"Function {function_name} requires argument {arg}")
+        call_arguments_dict[arg] = arg_value if arg_value is not None else default_value
+    return call_arguments_dict
+
+
+def invoker_dispatch(functions, function_name: str, arguments: str):
+    functions_dict = {function.__name__: function for function in functions}
+    function = functions_dict[function_name]
+    return ToolInvoker.get(function).parse_arguments(arguments)
+
+
+def main():
+    functions = [add_calendar_entry]
+    # Build the invoker as ToolsManager does at registration.
+    ToolInvoker.get(add_calendar_entry)
+    assert legacy_dispatch(
+        functions, "add_calendar_entry", ARGUMENTS
+    ) == invoker_dispatch(functions, "add_calendar_entry", ARGUMENTS)
+
+    for name, dispatch in [("legacy", legacy_dispatch), ("invoker", invoker_dispatch)]:
+        seconds = timeit.timeit(
+            lambda: dispatch(functions, "add_calendar_entry", ARGUMENTS),
+            number=NUM_CALLS,
+        )
+        print(f"{name}: {seconds / NUM_CALLS * 1e6:.2f} us per call")
+
+
+if __name__ == "__main__":
+    main()
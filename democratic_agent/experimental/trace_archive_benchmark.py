@@ -0,0 +1,167 @@
+"""Compare reading the traces from the raw segments vs the compacted archives.
+
+Run with: python -m democratic_agent.experimental.trace_archive_benchmark
+"""
+
+import io
+import json
+from pathlib import Path
+import random
+import tempfile
+import time
+
+from democratic_agent.data import data_saver
+from democratic_agent.data.data_saver import (
+    DataSaver,
+    SegmentWriter,
+    apply_record,
+    get_segments,
+)
+from democratic_agent.data.trace_archive import TraceArchive, export_conversations
+
+MODULE_NAME = "executor"
+NUM_CONVERSATIONS = 2000
+MESSAGES_PER_CONVERSATION = 20
+NUM_LOOKUPS = 200
+SEGMENT_BYTES = 8 * 1024 * 1024
+TOOLS = ["send_email", "read_emails", "add_calendar_entry", "search_user_info"]
+
+
+def tool_call_message(name: str, arguments: dict):
+    return {
+        "role": "assistant",
+        "tool_calls": [
+            {
+                "id": f"call_{random.randint(0, 1 << 30)}",
+                "type": "function",
+                "function": {"name": name, "arguments": json.dumps(arguments)},
+            }
+        ],
+    }
+
+
+def generate_traces(path: Path):
+    traces_path = path / MODULE_NAME
+    # Smaller segments than the default so there are several to compact.
+    data_saver._writers[traces_path] = SegmentWriter(
+        traces_path, max_segment_bytes=SEGMENT_BYTES
+    )
+    savers = [DataSaver(MODULE_NAME, path) for _ in range(4)]
+    ids = []
+    for i in range(NUM_CONVERSATIONS):
+        # Interleave the conversations as several executors would.
+        saver = savers[i % len(savers)]
+        saver.start_new_conversation("You are the executor. " * 50)
+        ids.append(saver.conversation_id)
+        for j in range(MESSAGES_PER_CONVERSATION):
+            if j % 2:
+                saver.add_message(
+                    tool_call_message(TOOLS[i % len(TOOLS)], {"query": "x" * 100})
+                )
+            else:
+                saver.add_message({"role": "user", "content": "lorem ipsum " * 40})
+        saver.add_message(
+            tool_call_message(
+                "set_task_completed", {"summary": "done", "success": i % 3 != 0}
+            )
+        )
+        saver.end_conversation()
+    data_saver.close_writers()
+    return ids
+
+
+def raw_get(path: Path, conversation_id: str):
+    """Scan the raw segments for the records of a conversation."""
+
+    messages = []
+    for segment in get_segments(path / MODULE_NAME):
+        with open(segment, "r") as file:
+            for line in file:
+                record = json.loads(line)
+                if record["conversation"] == conversation_id:
+                    messages.append(record)
+    return messages
+
+
+def raw_export(path: Path, tool: str) -> int:
+    """Scan the raw segments rebuilding all the conversations to export the ones calling the tool."""
+
+    output = io.StringIO()
+    open_conversations, count = {}, 0
+    for segment in get_segments(path / MODULE_NAME):
+        with open(segment, "r") as file:
+            for line in file:
+                record = json.loads(line)
+                records = open_conversations.setdefault(record["conversation"], [])
+                records.append(record)
+                if record["type"] == "end":
+                    records = open_conversations.pop(record["conversation"])
+                    if any(
+                        tool_call["function"]["name"] == tool
+                        for r in records
+                        if r["type"] == "message"
+                        for tool_call in r["message"].get("tool_calls") or []
+                    ):
+                        conversations = {}
+                        for r in records:
+                            apply_record(conversations, r)
+                        messages = conversations[record["conversation"]]
+                        output.write(json.dumps({"messages": messages}) + "\n")
+                        count += 1
+    return count
+
+
+def get_size(path: Path, pattern: str) -> int:
+    return sum(file.stat().st_size for file in (path / MODULE_NAME).glob(pattern))
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp)
+        ids = generate_traces(path)
+        lookups = random.sample(ids, NUM_LOOKUPS)
+        print(f"Raw segments: {get_size(path, '*.jsonl') / 1e6:.1f} MB")
+
+        start = time.perf_counter()
+        for id in lookups[:10]:
+            raw_get(path, id)
+        print(f"raw get: {(time.perf_counter() - start) / 10 * 1e3:.1f} ms per lookup")
+
+        start = time.perf_counter()
+        raw_count = raw_export(path, "send_email")
+        print(f"raw export filtered by tool: {time.perf_counter() - start:.2f} s")
+
+        # Keep the data on archives: add an empty live segment so all are rotated.
+        archive = TraceArchive(MODULE_NAME, path)
+        (path / MODULE_NAME / "segment_999999.jsonl").touch()
+        start = time.perf_counter()
+        archive.compact()
+        print(f"compact: {time.perf_counter() - start:.2f} s")
+        print(f"Archives: {get_size(path, '*.zst') / 1e6:.1f} MB")
+
+        start = time.perf_counter()
+        for id in lookups:
+            archive.get(id)
+        print(
+            f"archive get: {(time.perf_counter() - start) / NUM_LOOKUPS * 1e3:.2f} ms per lookup"
+        )
+
+        start = time.perf_counter()
+        count = export_conversations(
+            io.StringIO(), [MODULE_NAME], tools=["send_email"], path=path
+        )
+        print(f"archive export filtered by tool: {time.perf_counter() - start:.2f} s")
+        assert count == raw_count, (count, raw_count)
+
+        start = time.perf_counter()
+        count = export_conversations(
+            io.StringIO(), [MODULE_NAME], outcomes=["failure"], path=path
+        )
+        print(
+            f"archive export filtered by outcome ({count} conversations): {time.perf_counter() - start:.2f} s"
+        )
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import abc
+from typing import List
+
+
+class EmbeddingModel(abc.ABC):
+    """Simple interface for embedding models."""
+
+    def __init__(self, name: str, remote: bool):
+        # Name of the embedding space, vectors from different names are not comparable.
+        self.name = name
+        # Remote models are cached to avoid the round trips.
+        self.remote = remote
+
+    @abc.abstractmethod
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts, returns one vector per text in the same order."""
+        pass
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self.get_embeddings([text])[0]
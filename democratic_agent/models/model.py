@@ -1,11 +1,67 @@
 import abc
+import asyncio
+from typing import Any, Dict, Generator, Iterator, Optional, Tuple
 from openai.types.chat import ChatCompletionMessage
 
 
+class ResponseDelta:
+    """Incremental update of a streamed response: new text or the tool call being generated."""
+
+    def __init__(
+        self,
+        content: Optional[str] = None,
+        tool_call_index: Optional[int] = None,
+        tool_call: Optional[Dict[str, Any]] = None,
+    ):
+        self.content = content
+        # The tool call accumulated so far: {"id", "type", "function": {"name", "arguments"}}.
+        self.tool_call_index = tool_call_index
+        self.tool_call = tool_call
+
+
+class ResponseStream:
+    """Iterate over the deltas of a response, the full message is available once consumed."""
+
+    def __init__(
+        self, generator: Generator[ResponseDelta, None, ChatCompletionMessage]
+    ):
+        self.generator = generator
+        self.message: Optional[ChatCompletionMessage] = None
+
+    def __iter__(self) -> Iterator[ResponseDelta]:
+        self.message = yield from self.generator
+
+    def get_message(self) -> ChatCompletionMessage:
+        if self.message is None:
+            for _ in self:
+                pass
+        return self.message
+
+
 class Model(abc.ABC):
     """Simple interface for models."""
 
+    def __init__(self):
+        # (prompt_tokens, completion_tokens) of the last response, None if unknown.
+        self.last_usage: Optional[Tuple[int, int]] = None
+
     @abc.abstractmethod
     def get_response(self, *args, **kwargs) -> ChatCompletionMessage:
         """Get a response from the model with variable arguments."""
         pass
+
+    async def get_response_async(self, *args, **kwargs) -> ChatCompletionMessage:
+        """Get a response without blocking the event loop, by default running get_response on a thread."""
+
+        return await asyncio.to_thread(self.get_response, *args, **kwargs)
+
+    def stream_response(self, *args, **kwargs) -> ResponseStream:
+        """Stream the response, by default as a single delta for models without streaming."""
+
+        def generate():
+            message = self.get_response(*args, **kwargs)
+            if message.content:
+                yield ResponseDelta(content=message.content)
+            return message
+
+        return ResponseStream(generate())
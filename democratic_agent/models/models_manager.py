@@ -7,12 +7,17 @@ import torch
 
 from democratic_agent.config import get_modules
 from democratic_agent.models.model import Model
+from democratic_agent.models.embedding_model import EmbeddingModel
 
+from democratic_agent.models.open.hashing_embedding import HashingEmbeddingModel
 from democratic_agent.models.open.os_model import OSModel
 from democratic_agent.models.private.openai import OpenAIModel
+from democratic_agent.models.private.openai_embedding import OpenAIEmbeddingModel
 
 LOG = logging.getLogger(__name__)
 
+DEF_EMBEDDING_CONFIG = {"type": "openai", "name": "text-embedding-ada-002"}
+
 
 class ModelsManager:
     """Manager to ensure that the models are able to run properly on GPU"""
@@ -61,6 +66,26 @@ class ModelsManager:
         self.models[module_name] = model
         return model
 
+    def create_embedding_model(self, module_name: str) -> "EmbeddingModel":
+        """Create the embedding model for a given module depending on the type"""
+
+        modules_config = get_modules()
+        embedding_config = modules_config.get(module_name, {}).get(
+            "embedding", DEF_EMBEDDING_CONFIG
+        )
+        embedding_type = embedding_config["type"]
+
+        if embedding_type == "openai":
+            return OpenAIEmbeddingModel(
+                model_name=embedding_config.get("name", DEF_EMBEDDING_CONFIG["name"])
+            )
+        elif embedding_type == "hashing":
+            return HashingEmbeddingModel(
+                dimension=embedding_config.get("dimension", 512),
+                char_ngram=embedding_config.get("char_ngram", 3),
+            )
+        raise ValueError(f"Embedding type {embedding_type} not recognized.")
+
     # TODO: Call this function before running the system and save the specific config for the user.
     def get_model_config(self):
         """Fetch user GPU and get the best config for them"""  # Initially from specific config files, in the future hopefully we can fetch them automatically from HuggingFace.
@@ -0,0 +1,49 @@
+import re
+from typing import List
+import zlib
+
+import numpy as np
+
+from democratic_agent.models.embedding_model import EmbeddingModel
+
+
+class HashingEmbeddingModel(EmbeddingModel):
+    """Deterministic local embeddings: signed hashing of words, word bigrams and character n-grams.
+
+    Runs on CPU without any download, useful for offline boxes and to benchmark memory recall in CI.
+    """
+
+    def __init__(self, dimension: int = 512, char_ngram: int = 3):
+        super().__init__(name=f"hashing-{dimension}-{char_ngram}", remote=False)
+        self.dimension = dimension
+        self.char_ngram = char_ngram
+
+    def get_features(self, text: str) -> List[str]:
+        words = re.findall(r"\w+", text.lower())
+        features = list(words)
+        features.extend(f"{first} {second}" for first, second in zip(words, words[1:]))
+        for word in words:
+            padded = f"<{word}>"
+            features.extend(
+                f"#{padded[i : i + self.char_ngram]}"
+                for i in range(len(padded) - self.char_ngram + 1)
+            )
+        return features
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        rows, columns, signs = [], [], []
+        for row, text in enumerate(texts):
+            for feature in self.get_features(text):
+                # crc32 is stable across processes, unlike the builtin hash.
+                feature_hash = zlib.crc32(feature.encode("utf-8"))
+                rows.append(row)
+                columns.append(feature_hash % self.dimension)
+                signs.append(1.0 if (feature_hash >> 31) & 1 else -1.0)
+
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        np.add.at(embeddings, (rows, columns), signs)
+        # Dampen repeated features and normalize to compare with cosine similarity.
+        embeddings = np.sign(embeddings) * np.log1p(np.abs(embeddings))
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings /= np.where(norms == 0, 1.0, norms)
+        return embeddings.tolist()
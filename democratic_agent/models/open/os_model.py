@@ -12,6 +12,7 @@ from transformers import (
 )
 
 from democratic_agent.chat.conversation import Conversation
+from democratic_agent.models.token_counter import TokenCounter
 
 # Huggingface considerations:
 # AutoModelForCausalLM already fetches from source code to check for the base class or in "Architectures" at config.json from model card if no trust_remote_code is set. So we can make it general to run all models based on common transformer interface.
@@ -28,6 +29,9 @@ class OSModel:
             model_name, model_revision
         )
         self.name = model_name
+        self.last_usage = None
+        # Count the conversation tokens with the same tokenizer the model uses.
+        TokenCounter().register_tokenizer(model_name, self.tokenizer)
         # TODO: get debug from cfg
         debug = False
         if debug:
@@ -81,7 +85,9 @@ class OSModel:
         # TODO: If not chat_template we can create it manually?
         if self.tokenizer.chat_template:
             input_ids = self.tokenizer.apply_chat_template(
-                conversation, return_tensors="pt", add_generation_prompt=True
+                conversation.get_messages(),
+                return_tensors="pt",
+                add_generation_prompt=True,
             ).to(self.model.device)
             tokens = self.model.generate(
                 input_ids=input_ids,
@@ -107,4 +113,5 @@ class OSModel:
         response = self.tokenizer.batch_decode(
             tokens[:, input_ids.shape[1] :], skip_special_tokens=True
         )[0]
+        self.last_usage = (input_ids.shape[1], tokens.shape[1] - input_ids.shape[1])
         return response
@@ -1,12 +1,12 @@
 from typing import Any, Dict, List, Optional
 import base64
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from openai._types import NOT_GIVEN
 from openai.types.chat import ChatCompletionMessageToolCall, ChatCompletionToolParam, ChatCompletionMessage
 from dotenv import load_dotenv
 
 from democratic_agent.chat.conversation import Conversation
-from democratic_agent.models.model import Model
+from democratic_agent.models.model import Model, ResponseDelta, ResponseStream
 
 load_dotenv()
 
@@ -15,32 +15,132 @@ class OpenAIModel(Model):
     def __init__(self, model_name: str):
         self.model_name = model_name
         self.client = OpenAI()
+        self.async_client = AsyncOpenAI()
         super().__init__()
 
-    # TODO: get temperature from cfg
-    def get_response(
+    def _get_request_kwargs(
         self,
         conversation: Conversation,
-        functions: List[Dict[str, Any]] = [],
-        response_format: str = "text",  # or json_object.
-        temperature: float = 0.7,
-    ) -> ChatCompletionMessage:
+        functions: List[Dict[str, Any]],
+        response_format: str,
+        temperature: float,
+    ) -> Dict[str, Any]:
         if functions:
             tools_openai: List[ChatCompletionToolParam] = functions
         else:
             tools_openai = NOT_GIVEN
 
         # TODO :Check if it is multimodal and use vision.
+        return {
+            "messages": conversation.get_messages(),
+            "model": self.model_name,
+            "response_format": {"type": response_format},
+            "temperature": temperature,
+            "tools": tools_openai,
+        }
+
+    def _save_usage(self, usage):
+        if usage is not None:
+            self.last_usage = (usage.prompt_tokens, usage.completion_tokens)
+        else:
+            self.last_usage = None
+
+    # TODO: get temperature from cfg
+    def get_response(
+        self,
+        conversation: Conversation,
+        functions: List[Dict[str, Any]] = [],
+        response_format: str = "text",  # or json_object.
+        temperature: float = 0.7,
+    ) -> ChatCompletionMessage:
         response = self.client.chat.completions.create(
-            messages=conversation.messages,
-            model=self.model_name,
-            response_format={"type": response_format},
-            temperature=temperature,
-            tools=tools_openai,
-            # stream=False,  # TODO: Address SET TO TRUE for specific cases - USER.
+            **self._get_request_kwargs(
+                conversation, functions, response_format, temperature
+            ),
+        )
+        self._save_usage(response.usage)
+        return response.choices[0].message
+
+    async def get_response_async(
+        self,
+        conversation: Conversation,
+        functions: List[Dict[str, Any]] = [],
+        response_format: str = "text",  # or json_object.
+        temperature: float = 0.7,
+    ) -> ChatCompletionMessage:
+        response = await self.async_client.chat.completions.create(
+            **self._get_request_kwargs(
+                conversation, functions, response_format, temperature
+            ),
         )
+        self._save_usage(response.usage)
         return response.choices[0].message
 
+    def stream_response(
+        self,
+        conversation: Conversation,
+        functions: List[Dict[str, Any]] = [],
+        response_format: str = "text",  # or json_object.
+        temperature: float = 0.7,
+    ) -> ResponseStream:
+        """Stream the text deltas as they are generated, assembling the tool calls from their deltas."""
+
+        # Create the request before iterating so connection errors are raised here.
+        response = self.client.chat.completions.create(
+            **self._get_request_kwargs(
+                conversation, functions, response_format, temperature
+            ),
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+
+        def generate():
+            self.last_usage = None
+            content = []
+            tool_calls: Dict[int, Dict[str, Any]] = {}
+            for chunk in response:
+                if chunk.usage is not None:
+                    self._save_usage(chunk.usage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    content.append(delta.content)
+                    yield ResponseDelta(content=delta.content)
+                for tool_call_delta in delta.tool_calls or []:
+                    tool_call = tool_calls.setdefault(
+                        tool_call_delta.index,
+                        {
+                            "id": "",
+                            "type": "function",
+                            "function": {"name": "", "arguments": ""},
+                        },
+                    )
+                    if tool_call_delta.id:
+                        tool_call["id"] = tool_call_delta.id
+                    function_delta = tool_call_delta.function
+                    if function_delta is not None:
+                        function = tool_call["function"]
+                        if function_delta.name:
+                            function["name"] += function_delta.name
+                        if function_delta.arguments:
+                            function["arguments"] += function_delta.arguments
+                    yield ResponseDelta(
+                        tool_call_index=tool_call_delta.index, tool_call=tool_call
+                    )
+
+            return ChatCompletionMessage(
+                role="assistant",
+                content="".join(content) if content else None,
+                tool_calls=[
+                    ChatCompletionMessageToolCall(**tool_calls[index])
+                    for index in sorted(tool_calls)
+                ]
+                or None,
+            )
+
+        return ResponseStream(generate())
+
     def get_multi_modal_message(
         prompt: str,
         urls: Optional[List[str]] = [],
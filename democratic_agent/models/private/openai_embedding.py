@@ -0,0 +1,19 @@
+from typing import List
+from openai import OpenAI
+from dotenv import load_dotenv
+
+from democratic_agent.models.embedding_model import EmbeddingModel
+
+load_dotenv()
+
+
+class OpenAIEmbeddingModel(EmbeddingModel):
+    def __init__(self, model_name: str = "text-embedding-ada-002"):
+        super().__init__(name=model_name, remote=True)
+        self.client = OpenAI()
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        response = self.client.embeddings.create(input=texts, model=self.name)
+        # The API returns the embeddings with the index of the input they belong to.
+        embeddings = sorted(response.data, key=lambda data: data.index)
+        return [data.embedding for data in embeddings]
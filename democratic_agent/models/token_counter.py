@@ -0,0 +1,142 @@
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import tiktoken
+
+DEF_ENCODING = "cl100k_base"
+# Tokens added by the chat format on each message (role, separators...).
+DEF_TOKENS_PER_MESSAGE = 4
+DEF_MAX_CACHED_MESSAGES = 10000
+
+
+class ModuleTokenStats:
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.turns = 0
+        self.last_turn_tokens = 0
+
+    def to_dict(self) -> Dict[str, float]:
+        total_tokens = self.prompt_tokens + self.completion_tokens
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "turns": self.turns,
+            "tokens_per_turn": total_tokens / self.turns if self.turns else 0,
+            "last_turn_tokens": self.last_turn_tokens,
+        }
+
+
+class TokenCounter:
+    """Shared service to count tokens per model, caching the count of each message and tracking the usage per module."""
+
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(TokenCounter, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not hasattr(self, "_initialized"):  # Avoid re-initialization
+            self.encoders: Dict[str, Callable[[str], int]] = {}
+            # id(message) -> (content hash, tokens)
+            self.messages_cache: OrderedDict[int, Tuple[str, int]] = OrderedDict()
+            self.modules_stats: Dict[str, ModuleTokenStats] = {}
+            self.lock = threading.Lock()
+            self._initialized = True
+
+    def register_tokenizer(self, model_name: str, tokenizer: Any):
+        """Count the tokens of model_name with a huggingface tokenizer."""
+
+        with self.lock:
+            self.encoders[model_name] = lambda text: len(
+                tokenizer.encode(text, add_special_tokens=False)
+            )
+
+    def get_encoder(self, model_name: Optional[str]) -> Callable[[str], int]:
+        with self.lock:
+            encoder = self.encoders.get(model_name)
+        if encoder is not None:
+            return encoder
+
+        encoding_name = DEF_ENCODING
+        try:
+            if model_name is not None:
+                encoding_name = tiktoken.encoding_name_for_model(model_name)
+        except KeyError:
+            # Not an OpenAI model and no tokenizer registered yet.
+            pass
+        try:
+            encoding = tiktoken.get_encoding(encoding_name)
+            encoder = lambda text: len(encoding.encode(text, disallowed_special=()))
+        except Exception as e:
+            # Encodings are downloaded on first use, fallback to an estimation when offline.
+            print(f"Couldn't load tokenizer, estimating tokens by length: {e}")
+            encoder = lambda text: len(text) // 4 + 1
+        with self.lock:
+            return self.encoders.setdefault(model_name, encoder)
+
+    def count_text(self, model_name: Optional[str], text: str) -> int:
+        return self.get_encoder(model_name)(text)
+
+    def _get_message_texts(self, message: Dict[str, Any]):
+        for key in ("content", "name"):
+            if message.get(key):
+                yield message[key]
+        for tool_call in message.get("tool_calls") or []:
+            function = (
+                tool_call["function"]
+                if isinstance(tool_call, dict)
+                else tool_call.function
+            )
+            if isinstance(function, dict):
+                yield function["name"]
+                yield function["arguments"]
+            else:
+                yield function.name
+                yield function.arguments
+
+    def count_message(self, model_name: Optional[str], message: Dict[str, Any]) -> int:
+        """Count the tokens of a message, only tokenizing it again if its content changed."""
+
+        texts = list(self._get_message_texts(message))
+        content_hash = hashlib.sha1(
+            json.dumps([model_name, texts]).encode("utf-8")
+        ).hexdigest()
+        key = id(message)
+        with self.lock:
+            cached = self.messages_cache.get(key)
+            if cached is not None and cached[0] == content_hash:
+                self.messages_cache.move_to_end(key)
+                return cached[1]
+
+        encoder = self.get_encoder(model_name)
+        tokens = DEF_TOKENS_PER_MESSAGE + sum(encoder(text) for text in texts)
+        with self.lock:
+            self.messages_cache[key] = (content_hash, tokens)
+            self.messages_cache.move_to_end(key)
+            while len(self.messages_cache) > DEF_MAX_CACHED_MESSAGES:
+                self.messages_cache.popitem(last=False)
+        return tokens
+
+    def record_usage(
+        self, module_name: str, prompt_tokens: int, completion_tokens: int
+    ):
+        """Record the tokens of one model call (turn) of a module."""
+
+        with self.lock:
+            stats = self.modules_stats.setdefault(module_name, ModuleTokenStats())
+            stats.prompt_tokens += prompt_tokens
+            stats.completion_tokens += completion_tokens
+            stats.turns += 1
+            stats.last_turn_tokens = prompt_tokens + completion_tokens
+
+    def get_stats(self, module_name: Optional[str] = None) -> Dict[str, Any]:
+        with self.lock:
+            if module_name is not None:
+                return self.modules_stats.get(module_name, ModuleTokenStats()).to_dict()
+            return {name: stats.to_dict() for name, stats in self.modules_stats.items()}
@@ -1,6 +1,61 @@
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
 from pathlib import Path
-from typing import Optional
+import threading
+from typing import Dict, Optional, Tuple
+
+from democratic_agent.config.config import Config
+
+# Prompt directory -> environment, shared by all the modules.
+_environments: Dict[Path, Environment] = {}
+# (prompt directory, template name) -> compiled template, only used without auto reload.
+_templates: Dict[Tuple[Path, str], Template] = {}
+_lock = threading.Lock()
+
+
+def get_environment(prompts_path: Path) -> Environment:
+    """Get the environment of a prompt directory, creating it on first use."""
+
+    with _lock:
+        environment = _environments.get(prompts_path)
+        if environment is None:
+            bytecode_cache = None
+            if Config().prompts_bytecode_cache_path:
+                cache_path = Path(Config().prompts_bytecode_cache_path)
+                cache_path.mkdir(parents=True, exist_ok=True)
+                bytecode_cache = FileSystemBytecodeCache(str(cache_path))
+            environment = Environment(
+                loader=FileSystemLoader(prompts_path),
+                auto_reload=Config().prompts_auto_reload,
+                bytecode_cache=bytecode_cache,
+            )
+            _environments[prompts_path] = environment
+        return environment
+
+
+def get_template(template: str, path: Optional[str] = None) -> Template:
+    prompts_path = Path(__file__).parent
+    if path is not None:
+        prompts_path = prompts_path / path
+    environment = get_environment(prompts_path)
+    if environment.auto_reload:
+        # Jinja checks if the file changed and recompiles it.
+        return environment.get_template(f"{template}.j2")
+
+    key = (prompts_path, template)
+    compiled_template = _templates.get(key)
+    if compiled_template is None:
+        compiled_template = environment.get_template(f"{template}.j2")
+        with _lock:
+            _templates[key] = compiled_template
+    return compiled_template
+
+
+def clear_cache():
+    """Drop the environments and compiled templates, next loads read the files again."""
+
+    with _lock:
+        _environments.clear()
+        _templates.clear()
 
 
 def load_prompt(template: str, path: Optional[str] = None, **kwargs) -> str:
@@ -15,11 +70,6 @@ def load_prompt(template: str, path: Optional[str] = None, **kwargs) -> str:
         str: The populated template.
     """
     try:
-        prompts_path = Path(__file__).parent
-        if path is not None:
-            prompts_path = prompts_path / path
-        prompts_env = Environment(loader=FileSystemLoader(prompts_path))
-        template = prompts_env.get_template(f"{template}.j2")
-        return template.render(**kwargs)
+        return get_template(template, path).render(**kwargs)
     except Exception as e:
         raise Exception(f"Error loading or rendering template: {e}")
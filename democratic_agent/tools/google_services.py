@@ -0,0 +1,210 @@
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import json
+import os
+import pickle
+import threading
+from typing import Any, Callable, Deque, Dict, FrozenSet, List, Optional, Tuple
+
+from google.auth.transport.requests import Request
+import google_auth_httplib2
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import V2_DISCOVERY_URI, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+import httplib2
+
+from democratic_agent.tools.helpers import get_private_data
+
+# Seconds between the checks of the credentials expiry.
+DEF_REFRESH_INTERVAL = 60
+# Credentials expiring in less than these seconds are refreshed in the background.
+DEF_REFRESH_MARGIN = 300
+DEF_HTTP_TIMEOUT = 30
+# Idle services kept for each api, the ones in use are not shared between threads (httplib2 is not thread-safe).
+DEF_MAX_IDLE_SERVICES = 4
+
+
+class GoogleCredentials:
+    def __init__(self, scopes: List[str], token_file: str, credentials: Any):
+        self.scopes = scopes
+        self.token_file = token_file
+        self.credentials = credentials
+        self.lock = threading.Lock()
+
+
+class GoogleServices:
+    """Shared cache of Google credentials (keyed by scope set) and pool of ready API clients.
+
+    The http, discovery and credentials loaders can be replaced to run against a local fake.
+    """
+
+    def __init__(
+        self,
+        http_factory: Optional[Callable[[Any], Any]] = None,
+        discovery_loader: Optional[Callable[[str, str], Dict[str, Any]]] = None,
+        credentials_loader: Optional[Callable[[List[str], str], Any]] = None,
+        refresh_interval: float = DEF_REFRESH_INTERVAL,
+    ):
+        self.http_factory = http_factory or self._create_http
+        self.discovery_loader = discovery_loader or self._load_discovery
+        self.credentials_loader = credentials_loader or self._load_credentials
+        self.refresh_interval = refresh_interval
+
+        self.credentials: Dict[FrozenSet[str], GoogleCredentials] = {}
+        self.credentials_locks: Dict[FrozenSet[str], threading.Lock] = {}
+        self.discovery_documents: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.idle_services: Dict[Tuple[str, str, FrozenSet[str]], Deque[Any]] = {}
+        self.lock = threading.Lock()
+
+        self.stop_event = threading.Event()
+        self.refresh_thread: Optional[threading.Thread] = None
+
+    @contextmanager
+    def use_service(self, api: str, version: str, scopes: List[str], token_file: str):
+        """Get a ready client for the api, it returns to the pool after the block."""
+
+        credentials = self.get_credentials(scopes, token_file)
+        key = (api, version, frozenset(scopes))
+        with self.lock:
+            idle_services = self.idle_services.setdefault(key, deque())
+            service = idle_services.pop() if idle_services else None
+        if service is None:
+            service = build_from_document(
+                self.get_discovery_document(api, version),
+                http=self.http_factory(credentials),
+            )
+        try:
+            yield service
+        finally:
+            with self.lock:
+                if len(idle_services) < DEF_MAX_IDLE_SERVICES:
+                    idle_services.append(service)
+
+    def get_credentials(self, scopes: List[str], token_file: str) -> Any:
+        key = frozenset(scopes)
+        entry = self.credentials.get(key)
+        if entry is not None:
+            return entry.credentials
+
+        with self.lock:
+            credentials_lock = self.credentials_locks.setdefault(key, threading.Lock())
+        # The login could take long, only block the tools with the same scopes.
+        with credentials_lock:
+            entry = self.credentials.get(key)
+            if entry is None:
+                entry = GoogleCredentials(
+                    scopes, token_file, self.credentials_loader(scopes, token_file)
+                )
+                self.credentials[key] = entry
+        self._start_refresh_thread()
+        return entry.credentials
+
+    def get_discovery_document(self, api: str, version: str) -> Dict[str, Any]:
+        key = (api, version)
+        document = self.discovery_documents.get(key)
+        if document is None:
+            document = self.discovery_loader(api, version)
+            with self.lock:
+                self.discovery_documents[key] = document
+        return document
+
+    def close(self):
+        self.stop_event.set()
+        with self.lock:
+            self.idle_services.clear()
+
+    def _start_refresh_thread(self):
+        with self.lock:
+            if self.refresh_thread is None:
+                self.refresh_thread = threading.Thread(
+                    target=self._refresh_loop, daemon=True
+                )
+                self.refresh_thread.start()
+
+    def _refresh_loop(self):
+        while not self.stop_event.wait(self.refresh_interval):
+            for entry in list(self.credentials.values()):
+                self.refresh_if_needed(entry)
+
+    def refresh_if_needed(self, entry: GoogleCredentials, margin=DEF_REFRESH_MARGIN):
+        """Refresh the token before it expires, so the tools never wait for it."""
+
+        credentials = entry.credentials
+        if getattr(credentials, "refresh_token", None) is None:
+            return
+        # google-auth uses naive UTC datetimes.
+        expiry = credentials.expiry
+        if expiry is not None and expiry - datetime.utcnow() > timedelta(
+            seconds=margin
+        ):
+            return
+        with entry.lock:
+            try:
+                credentials.refresh(Request())
+                self._save_credentials(entry.token_file, credentials)
+            except Exception as e:
+                print(f"Error refreshing Google credentials for {entry.scopes}: {e}")
+
+    def _create_http(self, credentials: Any):
+        # The connection is kept alive and reused by the calls of the same service.
+        return google_auth_httplib2.AuthorizedHttp(
+            credentials, http=httplib2.Http(timeout=DEF_HTTP_TIMEOUT)
+        )
+
+    def _load_discovery(self, api: str, version: str) -> Dict[str, Any]:
+        # Use the document bundled with googleapiclient, otherwise fetch it once.
+        document = get_static_doc(api, version)
+        if document is None:
+            _, document = httplib2.Http(timeout=DEF_HTTP_TIMEOUT).request(
+                V2_DISCOVERY_URI.format(api=api, apiVersion=version)
+            )
+        return json.loads(document)
+
+    def _load_credentials(self, scopes: List[str], token_file: str) -> Any:
+        credentials = None
+        token_path = get_private_data(token_file)
+
+        # Check if token file exists with saved user credentials
+        if os.path.exists(token_path):
+            with open(token_path, "rb") as token:
+                credentials = pickle.load(token)
+
+        # If no valid credentials available, ask the user to log in
+        if not credentials or not credentials.valid:
+            if credentials and credentials.expired and credentials.refresh_token:
+                credentials.refresh(Request())
+            else:
+                flow = InstalledAppFlow.from_client_secrets_file(
+                    get_private_data("credentials.json"), scopes
+                )
+                credentials = flow.run_local_server(port=0)
+            # Save the credentials for the next run
+            self._save_credentials(token_file, credentials)
+        return credentials
+
+    def _save_credentials(self, token_file: str, credentials: Any):
+        with open(get_private_data(token_file), "wb") as token:
+            pickle.dump(credentials, token)
+
+
+_google_services: Optional[GoogleServices] = None
+_google_services_lock = threading.Lock()
+
+
+def get_google_services() -> GoogleServices:
+    """Get the services cache shared by all the tools."""
+
+    global _google_services
+    with _google_services_lock:
+        if _google_services is None:
+            _google_services = GoogleServices()
+        return _google_services
+
+
+def set_google_services(google_services: GoogleServices):
+    """Replace the shared services cache, e.g. with one using a fake http."""
+
+    global _google_services
+    with _google_services_lock:
+        _google_services = google_services
@@ -0,0 +1,63 @@
+import inspect
+import threading
+from typing import Any, Callable, Dict
+
+from pydantic import ValidationError
+
+from democratic_agent.chat.parser.pydantic_parser import PydanticParser
+
+
+class ToolArgumentsError(Exception):
+    """The arguments of a tool call don't match the tool signature."""
+
+    pass
+
+
+class ToolInvoker:
+    """Validate and coerce the JSON arguments of a tool call in one pass, using the pydantic model of its signature."""
+
+    # Underlying function -> invoker, built once when the tool is registered.
+    _invokers: Dict[Callable, "ToolInvoker"] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, function: Callable):
+        self.name = function.__name__
+        self.model = PydanticParser.get_function_model(function)
+        self.arguments_names = list(self.model.model_fields)
+        self.is_coroutine = inspect.iscoroutinefunction(function)
+
+    @classmethod
+    def get(cls, function: Callable) -> "ToolInvoker":
+        key = getattr(function, "__func__", function)
+        invoker = cls._invokers.get(key)
+        if invoker is None:
+            invoker = ToolInvoker(function)
+            with cls._lock:
+                cls._invokers[key] = invoker
+        return invoker
+
+    @classmethod
+    def invalidate_module(cls, module_name: str):
+        with cls._lock:
+            for key in list(cls._invokers):
+                if getattr(key, "__module__", None) == module_name:
+                    del cls._invokers[key]
+
+    def parse_arguments(self, arguments: str) -> Dict[str, Any]:
+        """Get the keyword arguments for the tool, missing ones take their default value."""
+
+        try:
+            validated = self.model.model_validate_json(arguments or "{}")
+        except ValidationError as e:
+            raise ToolArgumentsError(self.format_errors(e))
+        return {name: getattr(validated, name) for name in self.arguments_names}
+
+    def format_errors(self, error: ValidationError) -> str:
+        errors = []
+        for detail in error.errors():
+            location = ".".join(str(part) for part in detail["loc"]) or "arguments"
+            message = f"{location}: {detail['msg']}"
+            if detail["type"] != "missing":
+                message += f" (got {detail['input']!r})"
+            errors.append(message)
+        return f"Invalid arguments for {self.name}: " + "; ".join(errors)
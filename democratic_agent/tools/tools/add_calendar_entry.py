@@ -1,14 +1,7 @@
-import os.path
-import pickle
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
 import tzlocal
 from typing import List
 
-
-# Assuming get_private_data_path is a function that returns the path to a secure storage location
-from democratic_agent.tools.helpers import get_private_data_path
+from democratic_agent.tools.google_services import get_google_services
 
 
 def get_local_timezone():
@@ -36,26 +29,6 @@ def add_calendar_entry(
     """
 
     SCOPES = ["https://www.googleapis.com/auth/calendar"]
-    creds = None
-    credentials_file = os.path.join(get_private_data_path(), "credentials.json")
-    token_file = os.path.join(get_private_data_path(), "edit_calendar_token.pickle")
-
-    # Check if token.pickle file exists with saved user credentials
-    if os.path.exists(token_file):
-        with open(token_file, "rb") as token:
-            creds = pickle.load(token)
-
-    # If no valid credentials available, log in
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(credentials_file, SCOPES)
-            creds = flow.run_local_server(port=0)
-        with open(token_file, "wb") as token:
-            pickle.dump(creds, token)
-
-    service = build("calendar", "v3", credentials=creds)
 
     # Create a new calendar event
     event = {
@@ -76,7 +49,10 @@ def add_calendar_entry(
         event["attendees"] = [{"email": attendee} for attendee in attendees]
 
     try:
-        event = service.events().insert(calendarId="primary", body=event).execute()
+        with get_google_services().use_service(
+            "calendar", "v3", SCOPES, "edit_calendar_token.pickle"
+        ) as service:
+            event = service.events().insert(calendarId="primary", body=event).execute()
         return "Event created successfully. Event ID: {}".format(event.get("id"))
     except Exception as e:
         return f"Error creating event: {e}"
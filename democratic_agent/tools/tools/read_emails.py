@@ -1,13 +1,17 @@
 import base64
-from googleapiclient.discovery import build
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
 from googleapiclient.errors import HttpError
-import os
-import pickle
-from typing import Optional
+from typing import Any, Dict, Iterator, List, Optional
 
-from democratic_agent.tools.helpers import get_private_data
+from democratic_agent.tools.google_services import get_google_services
+
+# Max ids per list page and requests per batch allowed by Gmail.
+DEF_PAGE_SIZE = 500
+DEF_BATCH_SIZE = 50
+# Only request the fields that are decoded: sender, subject and text parts.
+DEF_LIST_FIELDS = "messages/id,nextPageToken"
+DEF_MESSAGE_FIELDS = (
+    "id,payload(mimeType,headers(name,value),body/data,parts(mimeType,body/data))"
+)
 
 
 def get_header(headers, name):
@@ -19,11 +23,93 @@ def get_header(headers, name):
 
 def decode_message_part(part):
     if part["mimeType"] == "text/plain" or part["mimeType"] == "text/html":
-        data = part["body"]["data"]
-        return base64.urlsafe_b64decode(data).decode("utf-8")
+        data = part.get("body", {}).get("data")
+        if data:
+            return base64.urlsafe_b64decode(data).decode("utf-8")
     return None
 
 
+def format_message(msg: Dict[str, Any]) -> str:
+    # Extracting message headers for sender and subject information
+    headers = msg["payload"].get("headers", [])
+    sender = get_header(headers, "From")
+    subject = get_header(headers, "Subject")
+
+    # Decoding the message body
+    body = None
+    if "parts" in msg["payload"]:
+        for part in msg["payload"]["parts"]:
+            body = decode_message_part(part)
+            if body:
+                break
+    else:
+        body = decode_message_part(msg["payload"])
+
+    return f"---Message---\nSender: {sender}\nSubject: {subject}\nBody: {body}\n\n"
+
+
+def list_message_ids(service, num_messages: int) -> Iterator[List[str]]:
+    """Yield the ids of the INBOX messages page by page, until num_messages."""
+
+    page_token = None
+    remaining = num_messages
+    while remaining > 0:
+        results = (
+            service.users()
+            .messages()
+            .list(
+                userId="me",
+                labelIds=["INBOX"],
+                maxResults=min(remaining, DEF_PAGE_SIZE),
+                pageToken=page_token,
+                fields=DEF_LIST_FIELDS,
+            )
+            .execute()
+        )
+        ids = [message["id"] for message in results.get("messages", [])][:remaining]
+        if not ids:
+            return
+        yield ids
+        remaining -= len(ids)
+        page_token = results.get("nextPageToken")
+        if page_token is None:
+            return
+
+
+def iter_emails(service, num_messages: int) -> Iterator[str]:
+    """Yield the decoded INBOX messages in order, fetching them with batch requests."""
+
+    for ids in list_message_ids(service, num_messages):
+        for start in range(0, len(ids), DEF_BATCH_SIZE):
+            batch_ids = ids[start : start + DEF_BATCH_SIZE]
+            responses: Dict[str, str] = {}
+
+            def callback(request_id, response, exception):
+                if exception is not None:
+                    responses[request_id] = (
+                        f"---Message---\nError reading message: {exception}\n\n"
+                    )
+                else:
+                    responses[request_id] = format_message(response)
+
+            batch = service.new_batch_http_request(callback=callback)
+            for message_id in batch_ids:
+                batch.add(
+                    service.users()
+                    .messages()
+                    .get(
+                        userId="me",
+                        id=message_id,
+                        format="full",
+                        fields=DEF_MESSAGE_FIELDS,
+                    ),
+                    request_id=message_id,
+                )
+            batch.execute()
+            for message_id in batch_ids:
+                yield responses[message_id]
+
+
 def read_emails(num_messages: Optional[int] = 1):
     """Reads the first emails from the INBOX folder of the user's Gmail account.
 
@@ -35,65 +121,15 @@ def read_emails(num_messages: Optional[int] = 1):
     """
 
     SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
-    creds = None
-    credentials_file = get_private_data("credentials.json")
-    token_file = get_private_data("read_email_token.pickle")
-
-    # Check if token.pickle file exists with saved user credentials
-    if os.path.exists(token_file):
-        with open(token_file, "rb") as token:
-            creds = pickle.load(token)
-
-    # If no valid credentials available, ask the user to log in
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(credentials_file, SCOPES)
-            creds = flow.run_local_server(port=0)
-        # Save the credentials for the next run
-        with open(token_file, "wb") as token:
-            pickle.dump(creds, token)
-
-    service = build("gmail", "v1", credentials=creds)
 
     try:
-        # Call the Gmail API to fetch INBOX
-        results = (
-            service.users().messages().list(userId="me", labelIds=["INBOX"]).execute()
-        )
-        messages = results.get("messages", [])
-
-        if not messages:
+        with get_google_services().use_service(
+            "gmail", "v1", SCOPES, "read_email_token.pickle"
+        ) as service:
+            result = "".join(iter_emails(service, num_messages or 1))
+        if not result:
             return "No messages found."
-        else:
-            result = ""
-            for message in messages[:num_messages]:
-                msg = (
-                    service.users()
-                    .messages()
-                    .get(userId="me", id=message["id"], format="full")
-                    .execute()
-                )
-
-                # Extracting message headers for sender and subject information
-                headers = msg["payload"]["headers"]
-                sender = get_header(headers, "From")
-                subject = get_header(headers, "Subject")
-
-                # Decoding the message body
-                body = None
-                if "parts" in msg["payload"]:
-                    for part in msg["payload"]["parts"]:
-                        body = decode_message_part(part)
-                        if body:
-                            break
-                else:
-                    body = decode_message_part(msg["payload"])
-
-                result += f"---Message---\nSender: {sender}\nSubject: {subject}\nBody: {body}\n\n"
-
-            return result
+        return result
     except HttpError as error:
         return f"An error occurred: {error}"
 
@@ -1,41 +1,96 @@
+import ast
+import asyncio
 import glob
-import json
 import importlib
 import inspect
 from logging import getLogger
 from pathlib import Path
 import os
+import sys
+import threading
+import time
+from types import ModuleType
 import warnings
-from typing import Callable, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from openai.types.chat import ChatCompletionMessageToolCall
 
 from democratic_agent.architecture.helpers.tool import Tool
 from democratic_agent.chat.chat import Chat
+from democratic_agent.chat.parser.pydantic_parser import PydanticParser
+from democratic_agent.config import get_tools_config
+from democratic_agent.tools.tool_invoker import ToolArgumentsError, ToolInvoker
+from democratic_agent.utils.daemon_pool import DaemonThreadPoolExecutor
 
 # TODO: Create our own logger.
 LOG = getLogger(__name__)
 
+DEF_SEMAPHORE_POLL_INTERVAL = 0.05
+# Tool name -> semaphore limiting its concurrent calls, shared by all the ToolsManagers.
+_tools_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+_tools_semaphores_lock = threading.Lock()
+# Tool name -> seconds spent on its first import.
+_tools_import_times: Dict[str, float] = {}
+# Event loop of each thread executing tools, reused between calls.
+_loops = threading.local()
+
 
 class ToolsManager:
     def __init__(self):
         self.module_path = "democratic_agent.tools.tools"
         self.tools_folder = Path(__file__).parent / "tools"
         self.default_tools = []
+        tools_config = get_tools_config()
+        self.timeout: Optional[float] = tools_config.get("timeout")
+        self.tools_config: Dict[str, Dict[str, Any]] = tools_config.get("tools") or {}
+        # Daemon workers, a tool that timed out doesn't keep the process alive.
+        self.executor = DaemonThreadPoolExecutor(
+            max_workers=tools_config.get("max_workers"), thread_name_prefix="tool"
+        )
+        # Tool name -> (module modification time, manifest entry)
+        self.manifest_cache: Dict[str, Tuple[float, Optional[Dict[str, str]]]] = {}
         # Ideally the data retrieved after executing tool should be send online to our database (after filtering), for future fine-tuning, so we can improve the models and provide them back to the community.
 
     def save_tool(self, function, name):
         path = os.path.join(self.tools_folder / f"{name}.py")
         with open(path, "w") as f:
             f.write(function)
+        # An existing tool was overwritten, load the new version.
+        if f"{self.module_path}.{name}" in sys.modules:
+            self.reload_tool(name)
 
     def get_tool(self, name: str) -> Callable:
+        """Get the tool function, importing its module on first use."""
+
+        module_name = f"{self.module_path}.{name}"
+        first_import = module_name not in sys.modules
+        start = time.perf_counter()
         with warnings.catch_warnings():
             # Filter ResourceWarnings to ignore unclosed file objects
             warnings.filterwarnings("ignore", category=ResourceWarning)
 
             # Dynamically import the module
-            module = importlib.import_module(f"{self.module_path}.{name}")
+            module = importlib.import_module(module_name)
+        if first_import:
+            _tools_import_times[name] = time.perf_counter() - start
+            LOG.info(f"Imported tool {name} in {_tools_import_times[name]:.3f}s")
+
+        tool_function = self._get_tool_function(module, name)
+        # Build the invoker when the tool is registered, not on the first call.
+        ToolInvoker.get(tool_function)
+        return tool_function
+
+    def reload_tool(self, name: str) -> Callable:
+        """Import the tool module again, dropping the cached schemas of the previous version."""
+
+        module_name = f"{self.module_path}.{name}"
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", category=ResourceWarning)
+            module = importlib.reload(importlib.import_module(module_name))
+        PydanticParser.invalidate_module(module_name)
+        ToolInvoker.invalidate_module(module_name)
+        return self._get_tool_function(module, name)
 
+    def _get_tool_function(self, module: ModuleType, name: str) -> Callable:
         # Retrieve the function with the same name as the module
         tool_function = getattr(module, name, None)
 
@@ -44,6 +99,59 @@ class ToolsManager:
 
         return tool_function
 
+    def get_tools_manifest(self) -> List[Dict[str, str]]:
+        """Get the name, description and signature of each tool parsing its module, without importing it."""
+
+        manifest = []
+        for name in self.get_all_tools():
+            path = self.tools_folder / f"{name}.py"
+            mtime = path.stat().st_mtime
+            cached = self.manifest_cache.get(name)
+            if cached is None or cached[0] != mtime:
+                cached = (mtime, self._parse_tool(path, name))
+                self.manifest_cache[name] = cached
+            if cached[1] is not None:
+                manifest.append(cached[1])
+        return manifest
+
+    def _parse_tool(self, path: Path, name: str) -> Optional[Dict[str, str]]:
+        with open(path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=str(path))
+        for node in tree.body:
+            if (
+                isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))
+                and node.name == name
+            ):
+                return {
+                    "name": name,
+                    # Same cleaning as inspect.getdoc, used for the function schema.
+                    "description": ast.get_docstring(node) or "No docstring provided",
+                    "signature": f"{name}({ast.unparse(node.args)})",
+                }
+        LOG.warning(f"No function named '{name}' found in module '{name}'")
+        return None
+
+    def import_all_tools(self):
+        """Import every tool, used to profile the import time."""
+
+        for name in self.get_all_tools():
+            try:
+                self.get_tool(name)
+            except Exception as e:
+                print(f"Error importing tool {name}: {e}")
+
+    def get_import_report(self) -> str:
+        if not _tools_import_times:
+            return "No tools imported yet."
+        lines = [
+            f"{name}: {seconds:.3f}s"
+            for name, seconds in sorted(
+                _tools_import_times.items(), key=lambda item: item[1], reverse=True
+            )
+        ]
+        total = sum(_tools_import_times.values())
+        return "Tools import time:\n" + "\n".join(lines) + f"\nTotal: {total:.3f}s"
+
     def get_all_tools(self) -> List[str]:
         module_names = []
 
@@ -63,51 +171,160 @@ class ToolsManager:
         tools_call: List[ChatCompletionMessageToolCall],
         functions: List[Callable],
         chat: Optional[Chat] = None,
+        timeout: Optional[float] = None,
+    ) -> List[Tool]:
+        """Execute the tool calls, blocking until all of them finish."""
+
+        # Not using asyncio.run as it waits for the threads of the tools that timed out.
+        loop = getattr(_loops, "loop", None)
+        if loop is None or loop.is_closed():
+            loop = _loops.loop = asyncio.new_event_loop()
+        return loop.run_until_complete(
+            self.execute_tools_async(
+                tools_call=tools_call,
+                functions=functions,
+                chat=chat,
+                timeout=timeout,
+            )
+        )
+
+    async def execute_tools_async(
+        self,
+        tools_call: List[ChatCompletionMessageToolCall],
+        functions: List[Callable],
+        chat: Optional[Chat] = None,
+        timeout: Optional[float] = None,
     ) -> List[Tool]:
+        """Execute the tool calls, each one limited by timeout seconds (by default from tools.yaml).
+
+        The registered tools run concurrently, the other functions (e.g. planner and chat methods
+        that modify their state or ask the user) run in order on the caller thread. The feedback is
+        added to the chat in the same order as the tool calls.
+        """
+
         functions_dict = {}
         for function in functions:
             functions_dict[function.__name__] = function
 
-        tools_result: List[Tool] = []
-        for tool_call in tools_call:
-            try:
-                function_name = tool_call.function.name
-                function = functions_dict[function_name]
-            except KeyError:
-                if chat:
-                    chat.add_tool_feedback(
-                        id=tool_call.id,
-                        message="Function name doesn't exist, if you want to use a new tool first select it please.",
-                    )
-                    print(f"Function name: {function_name} doesn't exist...")
-                    continue
-
-            signature = inspect.signature(function)
-            args = [param.name for param in signature.parameters.values()]
-
-            arguments = json.loads(tool_call.function.arguments)
-            call_arguments_dict = {}
-            for arg in args:
-                # Check if the argument has a default value
-                default_value = signature.parameters[arg].default
-                arg_value = arguments.get(arg, None)
-                if arg_value is None and default_value is inspect.Parameter.empty:
-                    raise Exception(
-                        f"Function {function_name} requires argument {arg} but it is not provided."
-                    )
-                # Use the provided value or the default value
-                call_arguments_dict[arg] = (
-                    arg_value if arg_value is not None else default_value
+        tasks = {}
+        for index, tool_call in enumerate(tools_call):
+            if self.is_registered_tool(functions_dict.get(tool_call.function.name)):
+                tasks[index] = asyncio.ensure_future(
+                    self._execute_tool(tool_call, functions_dict, timeout)
                 )
-            try:
-                response = function(**call_arguments_dict)
-                args_string = ", ".join(
-                    [f"{key}={value!r}" for key, value in call_arguments_dict.items()]
+        responses = []
+        for index, tool_call in enumerate(tools_call):
+            if index in tasks:
+                responses.append(await tasks[index])
+            else:
+                responses.append(
+                    await self._execute_tool(
+                        tool_call, functions_dict, timeout, in_order=True
+                    )
                 )
-                print(f"{function.__name__}({args_string}): {response}")
-            except Exception as e:
-                response = f"Error while executing function {function_name} with arguments {call_arguments_dict}. Error: {e}"
+
+        tools_result: List[Tool] = []
+        for tool_call, response in zip(tools_call, responses):
             if chat:
                 chat.add_tool_feedback(id=tool_call.id, message=response)
-            tools_result.append(Tool(name=function_name, feedback=response))
+            tools_result.append(Tool(name=tool_call.function.name, feedback=response))
         return tools_result
+
+    async def _execute_tool(
+        self,
+        tool_call: ChatCompletionMessageToolCall,
+        functions_dict: Dict[str, Callable],
+        timeout: Optional[float],
+        in_order: bool = False,
+    ) -> str:
+        function_name = tool_call.function.name
+        function = functions_dict.get(function_name)
+        if function is None:
+            print(f"Function name: {function_name} doesn't exist...")
+            return "Function name doesn't exist, if you want to use a new tool first select it please."
+
+        invoker = ToolInvoker.get(function)
+        try:
+            call_arguments_dict = invoker.parse_arguments(tool_call.function.arguments)
+        except ToolArgumentsError as e:
+            return str(e)
+        if timeout is None:
+            timeout = self.get_tool_timeout(function_name)
+        semaphore = self.get_tool_semaphore(function_name)
+        try:
+            if invoker.is_coroutine:
+                coroutine = self._run_coroutine(
+                    function, call_arguments_dict, semaphore
+                )
+            elif in_order:
+                # Not a registered tool (e.g. ask_user): on the caller thread, without timeout.
+                coroutine = None
+                response = self._run_blocking(function, call_arguments_dict, semaphore)
+            else:
+                # On timeout the thread is not interrupted but its result is discarded.
+                coroutine = asyncio.get_running_loop().run_in_executor(
+                    self.executor,
+                    self._run_blocking,
+                    function,
+                    call_arguments_dict,
+                    semaphore,
+                )
+            if coroutine is not None:
+                response = await asyncio.wait_for(coroutine, timeout=timeout)
+            args_string = ", ".join(
+                [f"{key}={value!r}" for key, value in call_arguments_dict.items()]
+            )
+            print(f"{function.__name__}({args_string}): {response}")
+        except asyncio.TimeoutError:
+            response = f"Timeout while executing function {function_name} with arguments {call_arguments_dict}, it didn't finish after {timeout} seconds."
+        except Exception as e:
+            response = f"Error while executing function {function_name} with arguments {call_arguments_dict}. Error: {e}"
+        return response
+
+    def is_registered_tool(self, function: Optional[Callable]) -> bool:
+        """Whether the function is a tool of the tools folder, the only ones run concurrently."""
+
+        return (
+            function is not None
+            and not inspect.ismethod(function)
+            and getattr(function, "__module__", "").startswith(f"{self.module_path}.")
+        )
+
+    def get_tool_timeout(self, name: str) -> Optional[float]:
+        return self.tools_config.get(name, {}).get("timeout", self.timeout)
+
+    def get_tool_semaphore(self, name: str) -> Optional[threading.BoundedSemaphore]:
+        max_concurrency = self.tools_config.get(name, {}).get("max_concurrency")
+        if max_concurrency is None:
+            return None
+        with _tools_semaphores_lock:
+            if name not in _tools_semaphores:
+                _tools_semaphores[name] = threading.BoundedSemaphore(max_concurrency)
+            return _tools_semaphores[name]
+
+    def _run_blocking(
+        self,
+        function: Callable,
+        arguments: Dict[str, Any],
+        semaphore: Optional[threading.BoundedSemaphore],
+    ):
+        if semaphore is None:
+            return function(**arguments)
+        with semaphore:
+            return function(**arguments)
+
+    async def _run_coroutine(
+        self,
+        function: Callable,
+        arguments: Dict[str, Any],
+        semaphore: Optional[threading.BoundedSemaphore],
+    ):
+        if semaphore is None:
+            return await function(**arguments)
+        # The semaphore is shared with other threads, poll it without blocking the loop.
+        while not semaphore.acquire(blocking=False):
+            await asyncio.sleep(DEF_SEMAPHORE_POLL_INTERVAL)
+        try:
+            return await function(**arguments)
+        finally:
+            semaphore.release()
@@ -8,3 +8,4 @@ from .actions.action_broker import ActionBroker
 from .actions.action_client import ActionClient
 from .actions.action_server import ActionServer, ServerGoalHandle
 from .actions.goal_handle import GoalHandle
+from .runtime import CommunicationRuntime, get_runtime
@@ -1,63 +1,52 @@
-import zmq
-import threading
-
-
-class ActionBroker:
-    def __init__(self, ip, client_port, server_port):
-        self.context = zmq.Context()
-        self.client_socket = self.context.socket(zmq.ROUTER)
-        self.client_socket.bind(f"tcp://{ip}:{client_port}")
-
-        self.server_socket = self.context.socket(zmq.ROUTER)
-        self.server_socket.bind(f"tcp://{ip}:{server_port}")
-
-        # Mapping of topics to server identities
-        self.topic_to_server = {}
-
-        self.thread = threading.Thread(target=self.start)
-        self.thread.start()
-
-    def start(self):
-        poller = zmq.Poller()
-        poller.register(self.client_socket, zmq.POLLIN)
-        poller.register(self.server_socket, zmq.POLLIN)
-
-        while True:
-            socks = dict(poller.poll())
-
-            if self.client_socket in socks:
-                client_id, message = self.client_socket.recv_multipart()
-                topic, actual_message = self.parse_message(message)
-
-                server_id = self.topic_to_server.get(topic)
-                if server_id:
-                    self.server_socket.send_multipart(
-                        [server_id, client_id, actual_message]
-                    )
-                else:
-                    self.client_socket.send_multipart(
-                        [client_id, b"Error: No server available for topic"]
-                    )
-
-            if self.server_socket in socks:
-                multipart_message = self.server_socket.recv_multipart()
-                if len(multipart_message) == 3:
-                    server_id, client_id, response = multipart_message
-                    self.client_socket.send_multipart([client_id, response])
-                elif len(multipart_message) == 2:
-                    server_id, message = multipart_message
-                    if message.startswith(b"register "):
-                        topic = message.split(b" ", 1)[1].decode()
-                        self.topic_to_server[topic] = server_id
-
-    def parse_message(self, message):
-        parts = message.decode().split(" ", 1)
-        return (parts[0], parts[1].encode()) if len(parts) > 1 else (None, message)
-
-    def close(self):
-        self.client_socket.close()
-        self.server_socket.close()
-        self.context.term()
-
-    def __del__(self):
-        self.close()
+import json
+from typing import List
+
+from democratic_agent.utils.communication_protocols.actions.goal_handle import (
+    GoalHandleStatus,
+)
+from democratic_agent.utils.communication_protocols.client_server.broker import Broker
+
+FINISHED_STATUSES = [GoalHandleStatus.COMPLETED.name, GoalHandleStatus.ABORTED.name]
+
+
+class ActionBroker(Broker):
+    """Routes each goal to a server of its topic, the goal updates go to the server running it.
+
+    The goals of a dead server are sent again to another server, or aborted if there is none.
+    Delivery is at least once: a goal replayed after its server died could have been partially
+    run by it (e.g. a store done before the server stopped), servers should check the goal id
+    when their callbacks are not idempotent.
+    """
+
+    def handle_client(self, multipart_message):
+        client_id, message = multipart_message
+        topic, actual_message = self.parse_message(message)
+        if actual_message.startswith(b"update "):
+            goal_id = json.loads(actual_message.split(b" ", 1)[1])["goal_id"]
+            # Unknown goals (e.g. sent before the broker restarted) go to any server of the topic.
+            server_id = self.router.get_server(goal_id) or self.router.select(topic)
+            if server_id is not None:
+                self.runtime.send(
+                    self.server_socket, [server_id, client_id, actual_message]
+                )
+        else:
+            goal_id = json.loads(actual_message)["goal_id"]
+            self.route(topic, goal_id, [client_id, actual_message])
+
+    def reject(self, frames: List[bytes]):
+        client_id, goal_message = frames
+        goal = json.loads(goal_message)
+        goal["status"] = GoalHandleStatus.ABORTED.name
+        self.runtime.send(self.client_socket, [client_id, json.dumps(goal).encode()])
+
+    def handle_server(self, multipart_message):
+        if len(multipart_message) == 3:
+            server_id, client_id, response = multipart_message
+            self.router.seen(server_id)
+            goal = json.loads(response)
+            if goal["status"] in FINISHED_STATUSES:
+                self.router.complete(goal["goal_id"])
+            self.runtime.send(self.client_socket, [client_id, response])
+        elif len(multipart_message) == 2:
+            server_id, message = multipart_message
+            self.handle_control(server_id, message)
@@ -1,34 +1,39 @@
 import uuid
 import zmq
-import threading
-from typing import Callable, Dict
+from typing import Callable, Dict, Optional
 
 from democratic_agent.utils.communication_protocols.actions.goal_handle import (
     GoalHandle,
     GoalHandleStatus,
 )
 from democratic_agent.utils.communication_protocols.actions.action import Action
+from democratic_agent.utils.communication_protocols.runtime import get_runtime
 
 
 class ActionClient:
     def __init__(
-        self, broker_address: str, topic: str, callback: Callable, action_class: Action
+        self,
+        broker_address: str,
+        topic: str,
+        callback: Callable,
+        action_class: Action,
+        aborted_callback: Optional[Callable] = None,
     ):
-        self.context = zmq.Context()
-        self.socket = self.context.socket(zmq.DEALER)
+        self.runtime = get_runtime()
+        self.socket = self.runtime.socket(zmq.DEALER)
         self.socket.connect(broker_address)
         self.topic = topic
 
-        self.poller = zmq.Poller()
-        self.poller.register(self.socket, zmq.POLLIN)
-
         self.active_goals: Dict[str, GoalHandle] = {}
         self.action_class = action_class
         self.callback = callback
+        # Called instead of callback with the action of the aborted goals (e.g. no server for the
+        # topic), whose action doesn't tell it finished.
+        self.aborted_callback = aborted_callback
 
-        # Start feedback thread
-        thread = threading.Thread(target=self.listen_for_feedback)
-        thread.start()
+        # Feedback is received on the shared runtime, in order. On its own thread, the callback
+        # can block, e.g. waiting for the user feedback.
+        self.runtime.register(self.socket, self.listen_for_feedback, dedicated=True)
 
     def send_goal(self, action):
         goal_id = str(uuid.uuid4())
@@ -37,24 +42,23 @@ class ActionClient:
 
         # Format the message with topic and send the goal
         message = f"{self.topic} {goal_handle.to_json()}"
-        self.socket.send_string(message)
+        self.runtime.send(self.socket, [message.encode("utf-8")])
 
         return goal_handle
 
-    def listen_for_feedback(self):
-        while True:
-            socks = dict(self.poller.poll(timeout=1000))  # Timeout in milliseconds
-            if socks.get(self.socket) == zmq.POLLIN:
-                multipart_response = self.socket.recv_multipart()
-                message = multipart_response[-1].decode("utf-8")
-                update = GoalHandle.from_json(message, self.action_class)
-                if update.goal_id in self.active_goals:
-                    self.callback(update.action)
-                    if update.status in [
-                        GoalHandleStatus.COMPLETED,
-                        GoalHandleStatus.ABORTED,
-                    ]:
-                        del self.active_goals[update.goal_id]
+    def listen_for_feedback(self, multipart_response):
+        message = multipart_response[-1].decode("utf-8")
+        update = GoalHandle.from_json(message, self.action_class)
+        if update.goal_id in self.active_goals:
+            if update.status == GoalHandleStatus.ABORTED and self.aborted_callback:
+                self.aborted_callback(update.action)
+            else:
+                self.callback(update.action)
+            if update.status in [
+                GoalHandleStatus.COMPLETED,
+                GoalHandleStatus.ABORTED,
+            ]:
+                del self.active_goals[update.goal_id]
 
     def update_goal(self, goal_handler: GoalHandle):
         if goal_handler.goal_id not in self.active_goals:
@@ -64,12 +68,11 @@ class ActionClient:
         update_message = f"{self.topic} update {GoalHandle.to_json(goal_handler)}"
 
         # Send the update message
-        self.socket.send_string(update_message)
+        self.runtime.send(self.socket, [update_message.encode("utf-8")])
 
     def close(self):
-        # Close sockets and context
-        self.socket.close()
-        self.context.term()
+        # The context is shared by the process, only close the socket.
+        self.runtime.unregister(self.socket)
 
     def __del__(self):
         self.close()
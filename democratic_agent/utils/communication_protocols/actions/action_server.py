@@ -1,14 +1,14 @@
 import json
 import zmq
-import threading
 from typing import Callable, Dict
-from queue import Queue
 
 from democratic_agent.utils.communication_protocols.actions.goal_handle import (
     GoalHandle,
     GoalHandleStatus,
 )
 from democratic_agent.utils.communication_protocols.actions.action import Action
+from democratic_agent.utils.communication_protocols.routing import Heartbeat
+from democratic_agent.utils.communication_protocols.runtime import get_runtime
 
 
 class ServerGoalHandle(GoalHandle):
@@ -51,72 +51,57 @@ class ActionServer:
         update_callback: Callable,
         action_class: Action,
     ):
-        self.context = zmq.Context()
-        self.socket = self.context.socket(zmq.DEALER)
+        self.runtime = get_runtime()
+        self.socket = self.runtime.socket(zmq.DEALER)
         self.socket.connect(broker_address)
 
         # Register with the broker for a specific topic
-        self.socket.send_string(f"register {topic}")
-
-        self.poller = zmq.Poller()
-        self.poller.register(self.socket, zmq.POLLIN)
+        self.runtime.send(self.socket, [f"register {topic}".encode("utf-8")])
+        self.heartbeat = Heartbeat(self.runtime, self.socket, [topic])
 
         self.active_goals: Dict[str, GoalHandle] = {}
         self.action_class = action_class
         self.callback = callback
         self.update_callback = update_callback
 
-        # Use a queue to store incoming goals
-        self.goal_queue: Queue[ServerGoalHandle] = Queue()
-
-        # Start a thread to listen for goals
-        self.goal_listener_thread = threading.Thread(
-            target=self.listen_for_goals, daemon=True
-        )
-        self.goal_listener_thread.start()
-
-        # Start a worker thread to process goals
-        self.worker_thread = threading.Thread(target=self.process_goals, daemon=True)
-        self.worker_thread.start()
-
-    def listen_for_goals(self):
-        while True:
-            socks = dict(self.poller.poll())
-            if socks.get(self.socket) == zmq.POLLIN:
-                client_id, message = self.socket.recv_multipart()
-                if message.startswith(b"update "):
-                    # Extract the goal ID and update data
-                    goal_handle_message = message.split(b" ", 1)[1].decode()
-                    goal_handle = ServerGoalHandle.from_json(
-                        goal_handle_message,
-                        self.action_class,
-                        client_id,
-                        self.publish_feedback,
-                    )
-                    # Check if this goal ID exists in active goals
-                    if goal_handle.goal_id in self.active_goals:
-                        self.update_goal(goal_handle)
-                else:
-                    # Handle new goal
-                    goal_handle = ServerGoalHandle.from_json(
-                        message, self.action_class, client_id, self.publish_feedback
-                    )
-                    self.goal_queue.put(goal_handle)
-                    self.active_goals[goal_handle.goal_id] = goal_handle
-
-    def process_goals(self):
-        while True:
-            goal_handle = self.goal_queue.get()
-            self.callback(goal_handle)
-            self.goal_queue.task_done()
-
-            # Ensure that the goal is marked as completed
-            if goal_handle.status not in [
-                GoalHandleStatus.COMPLETED,
-                GoalHandleStatus.ABORTED,
-            ]:
-                goal_handle.status = GoalHandleStatus.COMPLETED
-            self.publish_feedback(goal_handle._client_id, goal_handle)
+        # Goals are processed one at a time on their own thread (they block until finished), so
+        # the updates (received on the socket strand) are handled while a goal is running, e.g.
+        # the user feedback.
+        self.goal_strand = self.runtime.create_strand(dedicated=True)
+        self.runtime.register(self.socket, self.listen_for_goals)
+
+    def listen_for_goals(self, multipart_message):
+        client_id, message = multipart_message
+        if message.startswith(b"update "):
+            # Extract the goal ID and update data
+            goal_handle_message = message.split(b" ", 1)[1].decode()
+            goal_handle = ServerGoalHandle.from_json(
+                goal_handle_message,
+                self.action_class,
+                client_id,
+                self.publish_feedback,
+            )
+            # Check if this goal ID exists in active goals
+            if goal_handle.goal_id in self.active_goals:
+                self.update_goal(goal_handle)
+        else:
+            # Handle new goal
+            goal_handle = ServerGoalHandle.from_json(
+                message, self.action_class, client_id, self.publish_feedback
+            )
+            self.active_goals[goal_handle.goal_id] = goal_handle
+            self.goal_strand.post(self.process_goal, goal_handle)
+
+    def process_goal(self, goal_handle: ServerGoalHandle):
+        self.callback(goal_handle)
+
+        # Ensure that the goal is marked as completed
+        if goal_handle.status not in [
+            GoalHandleStatus.COMPLETED,
+            GoalHandleStatus.ABORTED,
+        ]:
+            goal_handle.status = GoalHandleStatus.COMPLETED
+        self.publish_feedback(goal_handle._client_id, goal_handle)
 
     def update_goal(self, updated_goal_handle: ServerGoalHandle):
         self.active_goals[updated_goal_handle.goal_id] = updated_goal_handle
@@ -127,11 +112,16 @@ class ActionServer:
     def publish_feedback(self, client_id, update: ServerGoalHandle):
         # Format the message for the broker to route to the correct client
         update_message = update.to_json()
-        self.socket.send_multipart([client_id, update_message.encode()])
+        self.runtime.send(self.socket, [client_id, update_message.encode()])
 
     def close(self):
-        self.socket.close()
-        self.context.term()
+        if self.socket.closed:
+            return
+        self.heartbeat.stop()
+        # The broker sends the unfinished goals to the other servers of the topic.
+        self.runtime.send(self.socket, [b"unregister"])
+        self.runtime.unregister(self.socket)
+        self.runtime.close_strand(self.goal_strand)
 
     def __del__(self):
         self.close()
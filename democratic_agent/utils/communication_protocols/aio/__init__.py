@@ -0,0 +1,13 @@
+"""Asyncio implementation of the communication protocols, wire-compatible with the sync classes."""
+
+from .context import get_context
+from .pub_sub import Publisher, Subscriber
+from .client_server import Client, Server, Broker
+from .proxy import Proxy
+from .actions import (
+    ActionBroker,
+    ActionClient,
+    ActionServer,
+    ClientGoalHandle,
+    ServerGoalHandle,
+)
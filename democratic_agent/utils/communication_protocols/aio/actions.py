@@ -0,0 +1,254 @@
+import asyncio
+import json
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Type
+import uuid
+
+import zmq
+
+from democratic_agent.utils.communication_protocols.actions.action import Action
+from democratic_agent.utils.communication_protocols.actions.goal_handle import (
+    GoalHandle,
+    GoalHandleStatus,
+)
+from democratic_agent.utils.communication_protocols.aio.client_server import (
+    Broker,
+    send_heartbeats,
+    send_unregister,
+)
+from democratic_agent.utils.communication_protocols.aio.context import get_context
+
+FINISHED_STATUSES = [GoalHandleStatus.COMPLETED, GoalHandleStatus.ABORTED]
+
+
+class ActionBroker(Broker):
+    """Route each goal to a server of its topic and the goal updates to the server running it.
+
+    Delivery is at least once, the goals of a dead server are replayed on another one.
+    """
+
+    async def handle_client(self, multipart_message: List[bytes]):
+        client_id, message = multipart_message
+        topic, actual_message = self.parse_message(message)
+        if actual_message.startswith(b"update "):
+            goal_id = json.loads(actual_message.split(b" ", 1)[1])["goal_id"]
+            # Unknown goals (e.g. sent before the broker restarted) go to any server of the topic.
+            server_id = self.router.get_server(goal_id) or self.router.select(topic)
+            if server_id is not None:
+                await self.server_socket.send_multipart(
+                    [server_id, client_id, actual_message]
+                )
+        else:
+            goal_id = json.loads(actual_message)["goal_id"]
+            await self.route(topic, goal_id, [client_id, actual_message])
+
+    async def reject(self, frames: List[bytes]):
+        client_id, goal_message = frames
+        goal = json.loads(goal_message)
+        goal["status"] = GoalHandleStatus.ABORTED.name
+        await self.client_socket.send_multipart([client_id, json.dumps(goal).encode()])
+
+    async def handle_server(self, multipart_message: List[bytes]):
+        if len(multipart_message) == 3:
+            server_id, client_id, response = multipart_message
+            self.router.seen(server_id)
+            goal = json.loads(response)
+            if GoalHandleStatus[goal["status"]] in FINISHED_STATUSES:
+                self.router.complete(goal["goal_id"])
+            await self.client_socket.send_multipart([client_id, response])
+        elif len(multipart_message) == 2:
+            server_id, message = multipart_message
+            await self.handle_control(server_id, message)
+
+
+class ClientGoalHandle(GoalHandle):
+    def __init__(self, goal_id: str, action: Action):
+        super().__init__(goal_id, action)
+        self.updates: asyncio.Queue[GoalHandle] = asyncio.Queue()
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def set_update(self, update: GoalHandle):
+        self.action = update.action
+        self.status = update.status
+        self.updates.put_nowait(update)
+        if update.status in FINISHED_STATUSES and not self.done.done():
+            self.done.set_result(update.action)
+
+    async def feedback(self) -> AsyncIterator[Action]:
+        """Yield the action on each feedback, until the goal finishes."""
+
+        while True:
+            update = await self.updates.get()
+            yield update.action
+            if update.status in FINISHED_STATUSES:
+                return
+
+    async def result(self, timeout: Optional[float] = None) -> Action:
+        return await asyncio.wait_for(asyncio.shield(self.done), timeout)
+
+
+class ActionClient:
+    def __init__(
+        self,
+        broker_address: str,
+        topic: str,
+        action_class: Type[Action],
+        callback: Optional[Callable[[Action], Optional[Awaitable]]] = None,
+    ):
+        self.socket = get_context().socket(zmq.DEALER)
+        self.socket.connect(broker_address)
+        self.topic = topic
+        self.action_class = action_class
+        # Optional, called on every feedback as the sync ActionClient.
+        self.callback = callback
+        self.active_goals: Dict[str, ClientGoalHandle] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self) -> asyncio.Task:
+        self.task = asyncio.ensure_future(self.run())
+        return self.task
+
+    async def send_goal(self, action: Action) -> ClientGoalHandle:
+        goal_handle = ClientGoalHandle(str(uuid.uuid4()), action)
+        self.active_goals[goal_handle.goal_id] = goal_handle
+        await self.socket.send_string(f"{self.topic} {goal_handle.to_json()}")
+        return goal_handle
+
+    async def update_goal(self, goal_handle: GoalHandle):
+        if goal_handle.goal_id not in self.active_goals:
+            raise ValueError("Goal ID does not exist")
+        await self.socket.send_string(
+            f"{self.topic} update {GoalHandle.to_json(goal_handle)}"
+        )
+
+    async def run(self):
+        while True:
+            multipart_response = await self.socket.recv_multipart()
+            update = GoalHandle.from_json(
+                multipart_response[-1].decode("utf-8"), self.action_class
+            )
+            goal_handle = self.active_goals.get(update.goal_id)
+            if goal_handle is None:
+                continue
+            goal_handle.set_update(update)
+            if self.callback is not None:
+                result = self.callback(update.action)
+                if result is not None:
+                    await result
+            if update.status in FINISHED_STATUSES:
+                del self.active_goals[update.goal_id]
+
+    def close(self):
+        if self.task is not None:
+            self.task.cancel()
+        self.socket.close()
+
+
+class ServerGoalHandle(GoalHandle):
+    def __init__(
+        self,
+        goal_id: str,
+        action: Action,
+        status: GoalHandleStatus,
+        client_id: bytes,
+        server: "ActionServer",
+    ):
+        super().__init__(goal_id, action, status)
+        self._client_id = client_id
+        self._server = server
+
+    async def send_feedback(self):
+        await self._server.publish_feedback(self._client_id, self)
+
+
+class ActionServer:
+    """Run the goals as tasks, at most max_concurrent_goals at a time (one like the sync server)."""
+
+    def __init__(
+        self,
+        broker_address: str,
+        topic: str,
+        callback: Callable[[ServerGoalHandle], Awaitable],
+        action_class: Type[Action],
+        update_callback: Optional[
+            Callable[[ServerGoalHandle], Optional[Awaitable]]
+        ] = None,
+        max_concurrent_goals: int = 1,
+    ):
+        self.socket = get_context().socket(zmq.DEALER)
+        self.socket.connect(broker_address)
+        self.topic = topic
+        self.callback = callback
+        self.update_callback = update_callback
+        self.action_class = action_class
+        self.active_goals: Dict[str, ServerGoalHandle] = {}
+        self.max_concurrent_goals = max_concurrent_goals
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self) -> asyncio.Task:
+        self.task = asyncio.ensure_future(self.run())
+        return self.task
+
+    def parse_goal_handle(self, message: str, client_id: bytes) -> ServerGoalHandle:
+        data = json.loads(message)
+        return ServerGoalHandle(
+            data["goal_id"],
+            self.action_class.from_json(data["action"]),
+            GoalHandleStatus[data["status"]],
+            client_id,
+            self,
+        )
+
+    async def run(self):
+        # Register with the broker for a specific topic
+        await self.socket.send_string(f"register {self.topic}")
+        heartbeat = asyncio.ensure_future(send_heartbeats(self.socket, [self.topic]))
+        try:
+            await self.listen_for_goals()
+        finally:
+            heartbeat.cancel()
+
+    async def listen_for_goals(self):
+        semaphore = asyncio.Semaphore(self.max_concurrent_goals)
+        tasks = set()
+        while True:
+            client_id, message = await self.socket.recv_multipart()
+            if message.startswith(b"update "):
+                goal_handle = self.parse_goal_handle(
+                    message.split(b" ", 1)[1].decode(), client_id
+                )
+                if goal_handle.goal_id in self.active_goals:
+                    self.active_goals[goal_handle.goal_id] = goal_handle
+                    if self.update_callback is not None:
+                        result = self.update_callback(goal_handle)
+                        if result is not None:
+                            await result
+            else:
+                goal_handle = self.parse_goal_handle(message.decode(), client_id)
+                self.active_goals[goal_handle.goal_id] = goal_handle
+                task = asyncio.ensure_future(self.process_goal(goal_handle, semaphore))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+    async def process_goal(
+        self, goal_handle: ServerGoalHandle, semaphore: asyncio.Semaphore
+    ):
+        async with semaphore:
+            try:
+                await self.callback(goal_handle)
+            except Exception as e:
+                print(f"Error processing goal {goal_handle.goal_id}: {e}")
+                goal_handle.set_aborted()
+        # Ensure that the goal is marked as completed
+        if goal_handle.status not in FINISHED_STATUSES:
+            goal_handle.status = GoalHandleStatus.COMPLETED
+        self.active_goals.pop(goal_handle.goal_id, None)
+        await self.publish_feedback(goal_handle._client_id, goal_handle)
+
+    async def publish_feedback(self, client_id: bytes, update: GoalHandle):
+        await self.socket.send_multipart([client_id, update.to_json().encode()])
+
+    def close(self):
+        if self.task is not None:
+            self.task.cancel()
+        send_unregister(self.socket)
+        self.socket.close()
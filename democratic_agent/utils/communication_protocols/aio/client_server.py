@@ -0,0 +1,237 @@
+import asyncio
+import inspect
+import itertools
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Union
+
+import zmq
+
+from democratic_agent.utils.communication_protocols.aio.context import get_context
+from democratic_agent.utils.communication_protocols.client_server.client import (
+    DEF_REQUEST_TIMEOUT,
+)
+from democratic_agent.utils.communication_protocols.routing import (
+    DEF_HEARTBEAT_INTERVAL,
+    RoutedRequest,
+    TopicRouter,
+    heartbeat_message,
+)
+
+
+async def send_heartbeats(socket: zmq.Socket, topics: List[str]):
+    """Keep a server alive on the broker, which replays the requests of dead servers."""
+
+    message = heartbeat_message(topics)
+    while True:
+        await asyncio.sleep(DEF_HEARTBEAT_INTERVAL)
+        await socket.send(message)
+
+
+def send_unregister(socket: zmq.Socket):
+    """Ask the broker to send the unanswered requests to the other servers, before closing."""
+
+    try:
+        socket.send(b"unregister", zmq.NOBLOCK)
+    except zmq.ZMQError:
+        pass
+
+
+class Client:
+    """Pipelines the requests over one socket, matching the responses by their request id."""
+
+    def __init__(self, address: str, timeout: Optional[float] = DEF_REQUEST_TIMEOUT):
+        self.socket = get_context().socket(zmq.DEALER)
+        self.socket.connect(address)
+        self.timeout = timeout
+        self.request_ids = itertools.count()
+        self.pending: Dict[bytes, asyncio.Future] = {}
+        self.task: Optional[asyncio.Task] = None
+
+    async def send(
+        self, topic: str, message: str, timeout: Optional[float] = None
+    ) -> str:
+        """Send a request and wait for its response, raises TimeoutError if it doesn't arrive."""
+
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.receive())
+        request_id = str(next(self.request_ids)).encode()
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        try:
+            await self.socket.send_multipart(
+                [request_id, f"{topic} {message}".encode("utf-8")]
+            )
+            return await asyncio.wait_for(
+                future, timeout if timeout is not None else self.timeout
+            )
+        finally:
+            self.pending.pop(request_id, None)
+
+    async def receive(self):
+        while True:
+            multipart_response = await self.socket.recv_multipart()
+            if len(multipart_response) < 2:
+                continue
+            future = self.pending.get(multipart_response[0])
+            if future is not None and not future.done():
+                future.set_result(multipart_response[-1].decode("utf-8"))
+
+    def close(self):
+        if self.task is not None:
+            self.task.cancel()
+        self.socket.close()
+
+
+class Server:
+    """Serve the requests of the topics, handling the requests of different clients concurrently."""
+
+    def __init__(
+        self,
+        address: str,
+        topics: List[str],
+        callback: Callable[[str], Union[str, Awaitable[str]]],
+    ):
+        self.socket = get_context().socket(zmq.DEALER)
+        self.socket.connect(address)  # Connect to broker's backend
+        self.topics = topics
+        self.callback = callback
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self) -> asyncio.Task:
+        self.task = asyncio.ensure_future(self.run())
+        return self.task
+
+    async def run(self):
+        # Register the server for the given topics
+        for topic in self.topics:
+            await self.socket.send_string(f"register {topic}")
+        heartbeat = asyncio.ensure_future(send_heartbeats(self.socket, self.topics))
+        tasks = set()
+        try:
+            while True:
+                # [client_id, request_id, message], the request id is missing for legacy clients.
+                client_id, *request_id, message = await self.socket.recv_multipart()
+                task = asyncio.ensure_future(
+                    self.handle(client_id, request_id, message)
+                )
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            heartbeat.cancel()
+
+    async def handle(self, client_id: bytes, request_id: List[bytes], message: bytes):
+        try:
+            response = self.callback(message.decode("utf-8"))
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as e:
+            response = f"Error: {e}"
+        await self.socket.send_multipart(
+            [client_id, *request_id, response.encode("utf-8")]
+        )
+
+    def close(self):
+        if self.task is not None:
+            self.task.cancel()
+        send_unregister(self.socket)
+        self.socket.close()
+
+
+class Broker:
+    """Route the client requests to the servers of their topic, as the sync Broker."""
+
+    def __init__(
+        self,
+        ip: str,
+        client_port: int,
+        server_port: int,
+        policy: str = "least_outstanding",
+    ):
+        context = get_context()
+        self.client_socket = context.socket(zmq.ROUTER)
+        self.client_socket.bind(f"tcp://{ip}:{client_port}")
+        self.server_socket = context.socket(zmq.ROUTER)
+        self.server_socket.bind(f"tcp://{ip}:{server_port}")
+
+        # Servers of each topic, their outstanding requests and liveness.
+        self.router = TopicRouter(policy)
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self) -> asyncio.Task:
+        self.task = asyncio.ensure_future(self.run())
+        return self.task
+
+    async def run(self):
+        await asyncio.gather(
+            self.route_clients(), self.route_servers(), self.check_servers()
+        )
+
+    async def route_clients(self):
+        while True:
+            await self.handle_client(await self.client_socket.recv_multipart())
+
+    async def route_servers(self):
+        while True:
+            await self.handle_server(await self.server_socket.recv_multipart())
+
+    async def handle_client(self, multipart_message: List[bytes]):
+        # [client_id, request_id, message], or [client_id, message] from legacy clients.
+        client_id, *request_id, message = multipart_message
+        topic, actual_message = self.parse_message(message)
+        await self.route(
+            topic, (client_id, *request_id), [client_id, *request_id, actual_message]
+        )
+
+    async def route(self, topic: Optional[str], key: Hashable, frames: List[bytes]):
+        server_id = self.router.route(topic, key, frames)
+        if server_id is not None:
+            await self.server_socket.send_multipart([server_id, *frames])
+        else:
+            await self.reject(frames)
+
+    async def reject(self, frames: List[bytes]):
+        client_id, *request_id, _ = frames
+        await self.client_socket.send_multipart(
+            [client_id, *request_id, b"Error: No server available for topic"]
+        )
+
+    async def handle_server(self, multipart_message: List[bytes]):
+        if len(multipart_message) == 2:
+            server_id, message = multipart_message
+            await self.handle_control(server_id, message)
+        elif len(multipart_message) >= 3:
+            # [server_id, client_id, (request_id), response]
+            server_id, client_id, *request_id, _ = multipart_message
+            self.router.seen(server_id)
+            self.router.complete((client_id, *request_id))
+            await self.client_socket.send_multipart(multipart_message[1:])
+
+    async def handle_control(self, server_id: bytes, message: bytes):
+        command, _, arguments = message.decode().partition(" ")
+        if command == "register":
+            self.router.register(server_id, [arguments])
+        elif command == "heartbeat":
+            self.router.register(server_id, arguments.split())
+        elif command == "unregister":
+            await self.replay(self.router.remove(server_id))
+
+    async def check_servers(self):
+        while True:
+            await asyncio.sleep(DEF_HEARTBEAT_INTERVAL)
+            await self.replay(self.router.expire())
+
+    async def replay(self, requests: List[RoutedRequest]):
+        for key, topic, frames in requests:
+            await self.route(topic, key, frames)
+
+    def get_stats(self):
+        return self.router.get_stats()
+
+    def parse_message(self, message: bytes):
+        parts = message.decode().split(" ", 1)
+        return (parts[0], parts[1].encode()) if len(parts) > 1 else (None, message)
+
+    def close(self):
+        if self.task is not None:
+            self.task.cancel()
+        self.client_socket.close()
+        self.server_socket.close()
@@ -0,0 +1,15 @@
+from typing import Optional
+
+import zmq
+import zmq.asyncio
+
+_context: Optional[zmq.asyncio.Context] = None
+
+
+def get_context() -> zmq.asyncio.Context:
+    """Asyncio context sharing the process-wide zmq context (and its I/O threads)."""
+
+    global _context
+    if _context is None:
+        _context = zmq.asyncio.Context.shadow(zmq.Context.instance())
+    return _context
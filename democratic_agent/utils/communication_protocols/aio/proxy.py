@@ -0,0 +1,39 @@
+import asyncio
+from typing import Optional
+
+import zmq
+
+from democratic_agent.utils.communication_protocols.aio.context import get_context
+
+
+class Proxy:
+    def __init__(self, ip: str, xsub_port: int, xpub_port: int):
+        context = get_context()
+        # XSUB socket for publishers to connect
+        self.xsub_socket = context.socket(zmq.XSUB)
+        self.xsub_socket.bind(f"tcp://{ip}:{xsub_port}")
+        # XPUB socket for subscribers to connect
+        self.xpub_socket = context.socket(zmq.XPUB)
+        self.xpub_socket.bind(f"tcp://{ip}:{xpub_port}")
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self) -> asyncio.Task:
+        self.task = asyncio.ensure_future(self.run())
+        return self.task
+
+    async def run(self):
+        await asyncio.gather(
+            self._forward(self.xsub_socket, self.xpub_socket),
+            self._forward(self.xpub_socket, self.xsub_socket),
+        )
+
+    async def _forward(self, source: zmq.Socket, destination: zmq.Socket):
+        # Messages to the subscribers, subscriptions to the publishers.
+        while True:
+            await destination.send_multipart(await source.recv_multipart())
+
+    def close(self):
+        if self.task is not None:
+            self.task.cancel()
+        self.xsub_socket.close()
+        self.xpub_socket.close()
@@ -0,0 +1,49 @@
+from typing import AsyncIterator, Awaitable, Callable, Optional, Tuple
+
+import zmq
+
+from democratic_agent.utils.communication_protocols.aio.context import get_context
+
+
+class Publisher:
+    def __init__(self, address: str, topic: str):
+        self.socket = get_context().socket(zmq.PUB)
+        self.socket.connect(address)
+        self.topic = topic
+
+    async def publish(self, message: str):
+        await self.socket.send_string(f"{self.topic} {message}")
+
+    def close(self):
+        self.socket.close()
+
+
+class Subscriber:
+    """Async iterator over the messages of a topic, wire-compatible with the sync Publisher."""
+
+    def __init__(self, address: str, topic: str):
+        self.socket = get_context().socket(zmq.SUB)
+        self.socket.connect(address)
+        self.socket.subscribe(topic)
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self
+
+    async def __anext__(self) -> str:
+        message = await self.socket.recv_string()
+        return self.parse_message(message)[1]
+
+    async def run(self, callback: Callable[[str], Optional[Awaitable]]):
+        async for message in self:
+            result = callback(message)
+            if result is not None:
+                await result
+
+    def parse_message(self, message: str) -> Tuple[Optional[str], str]:
+        parts = message.split(" ", 1)
+        if len(parts) > 1:
+            return parts[0], parts[1].lstrip()
+        return None, message
+
+    def close(self):
+        self.socket.close()
@@ -1,63 +1,111 @@
+from typing import List
+
 import zmq
-import threading
+
+from democratic_agent.utils.communication_protocols.routing import (
+    DEF_HEARTBEAT_INTERVAL,
+    RoutedRequest,
+    TopicRouter,
+)
+from democratic_agent.utils.communication_protocols.runtime import get_runtime
 
 
 class Broker:
-    def __init__(self, ip, client_port, server_port):
-        self.context = zmq.Context()
-        self.client_socket = self.context.socket(zmq.ROUTER)
+    """Routes the client requests to the servers of their topic.
+
+    A topic can have several servers, each request goes to the one with the least outstanding
+    requests (or round robin). Servers without heartbeats are removed and their unanswered requests
+    are replayed on another server of the topic.
+    """
+
+    def __init__(self, ip, client_port, server_port, policy="least_outstanding"):
+        self.runtime = get_runtime()
+        self.client_socket = self.runtime.socket(zmq.ROUTER)
         self.client_socket.bind(f"tcp://{ip}:{client_port}")
 
-        self.server_socket = self.context.socket(zmq.ROUTER)
+        self.server_socket = self.runtime.socket(zmq.ROUTER)
         self.server_socket.bind(f"tcp://{ip}:{server_port}")
 
-        # Mapping of topics to server identities
-        self.topic_to_server = {}
+        # Servers of each topic, their outstanding requests and liveness.
+        self.router = TopicRouter(policy)
+        self.check_timer = None
 
-        self.thread = threading.Thread(target=self.start)
-        self.thread.start()
+        self.start()
 
     def start(self):
-        poller = zmq.Poller()
-        poller.register(self.client_socket, zmq.POLLIN)
-        poller.register(self.server_socket, zmq.POLLIN)
-
-        while True:
-            socks = dict(poller.poll())
-
-            if self.client_socket in socks:
-                client_id, message = self.client_socket.recv_multipart()
-                topic, actual_message = self.parse_message(message)
-
-                server_id = self.topic_to_server.get(topic)
-                if server_id:
-                    self.server_socket.send_multipart(
-                        [server_id, client_id, actual_message]
-                    )
-                else:
-                    self.client_socket.send_multipart(
-                        [None, client_id, b"Error: No server available for topic"]
-                    )
-
-            if self.server_socket in socks:
-                multipart_message = self.server_socket.recv_multipart()
-                if len(multipart_message) == 3:
-                    server_id, client_id, response = multipart_message
-                    self.client_socket.send_multipart([client_id, response])
-                elif len(multipart_message) == 2:
-                    server_id, message = multipart_message
-                    if message.startswith(b"register "):
-                        topic = message.split(b" ", 1)[1].decode()
-                        self.topic_to_server[topic] = server_id
+        # Routing is cheap, run it on the reactor thread.
+        self.runtime.register(self.client_socket, self.handle_client, inline=True)
+        self.runtime.register(self.server_socket, self.handle_server, inline=True)
+        self.check_timer = self.runtime.call_later(
+            DEF_HEARTBEAT_INTERVAL, self.check_servers
+        )
+
+    def handle_client(self, multipart_message):
+        # [client_id, request_id, message], or [client_id, message] from legacy clients.
+        client_id, *request_id, message = multipart_message
+        topic, actual_message = self.parse_message(message)
+        self.route(
+            topic, (client_id, *request_id), [client_id, *request_id, actual_message]
+        )
+
+    def route(self, topic, key, frames: List[bytes]):
+        server_id = self.router.route(topic, key, frames)
+        if server_id is not None:
+            self.runtime.send(self.server_socket, [server_id, *frames])
+        else:
+            self.reject(frames)
+
+    def reject(self, frames: List[bytes]):
+        client_id, *request_id, _ = frames
+        self.runtime.send(
+            self.client_socket,
+            [client_id, *request_id, b"Error: No server available for topic"],
+        )
+
+    def handle_server(self, multipart_message):
+        if len(multipart_message) == 2:
+            server_id, message = multipart_message
+            self.handle_control(server_id, message)
+        elif len(multipart_message) >= 3:
+            # [server_id, client_id, (request_id), response]
+            server_id, client_id, *request_id, _ = multipart_message
+            self.router.seen(server_id)
+            self.router.complete((client_id, *request_id))
+            self.runtime.send(self.client_socket, multipart_message[1:])
+
+    def handle_control(self, server_id: bytes, message: bytes):
+        command, _, arguments = message.decode().partition(" ")
+        if command == "register":
+            self.router.register(server_id, [arguments])
+        elif command == "heartbeat":
+            self.router.register(server_id, arguments.split())
+        elif command == "unregister":
+            self.replay(self.router.remove(server_id))
+
+    def check_servers(self):
+        if self.server_socket.closed:
+            return
+        self.replay(self.router.expire())
+        self.check_timer = self.runtime.call_later(
+            DEF_HEARTBEAT_INTERVAL, self.check_servers
+        )
+
+    def replay(self, requests: List[RoutedRequest]):
+        for key, topic, frames in requests:
+            self.route(topic, key, frames)
+
+    def get_stats(self):
+        return self.router.get_stats()
 
     def parse_message(self, message):
         parts = message.decode().split(" ", 1)
         return (parts[0], parts[1].encode()) if len(parts) > 1 else (None, message)
 
     def close(self):
-        self.client_socket.close()
-        self.server_socket.close()
-        self.context.term()
+        if self.check_timer is not None:
+            self.check_timer.cancel()
+        self.runtime.unregister(self.client_socket)
+        self.runtime.unregister(self.server_socket)
 
     def __del__(self):
         self.close()
@@ -1,23 +1,92 @@
+from concurrent.futures import Future
+import itertools
+import threading
+from typing import Dict, Optional, Tuple
+
 import zmq
 
+from democratic_agent.utils.communication_protocols.runtime import Timer, get_runtime
+
+# Seconds to wait for a response, a lost reply fails the request instead of hanging forever.
+DEF_REQUEST_TIMEOUT = 60.0
+
 
 class Client:
-    def __init__(self, address):
-        self.context = zmq.Context()
-        self.socket = self.context.socket(zmq.DEALER)
+    """Sends requests to the servers through the broker, many can be in flight at the same time.
+
+    Each request carries a correlation id (frames: [request_id, "topic message"]) that the broker
+    and the server return with the response.
+    """
+
+    def __init__(self, address, timeout: Optional[float] = DEF_REQUEST_TIMEOUT):
+        self.runtime = get_runtime()
+        self.socket = self.runtime.socket(zmq.DEALER)
         self.socket.connect(address)
+        self.timeout = timeout
+        self.request_ids = itertools.count()
+        # request id -> response future and its timeout.
+        self.pending: Dict[bytes, Tuple[Future, Optional[Timer]]] = {}
+        self.lock = threading.Lock()
+        self.runtime.register(self.socket, self.receive, inline=True)
+
+    def send(self, topic, message, timeout: Optional[float] = None) -> str:
+        """Send a request and wait for its response, raises TimeoutError if it doesn't arrive."""
+
+        return self.send_request(topic, message, timeout).result()
+
+    def send_request(self, topic, message, timeout: Optional[float] = None) -> Future:
+        """Send a request without waiting, the future resolves to the response."""
+
+        if timeout is None:
+            timeout = self.timeout
+        request_id = str(next(self.request_ids)).encode()
+        future = Future()
+        with self.lock:
+            self.pending[request_id] = (future, None)
+        if timeout is not None:
+            timer = self.runtime.call_later(timeout, self.expire, request_id, timeout)
+            with self.lock:
+                if request_id in self.pending:
+                    self.pending[request_id] = (future, timer)
+        self.runtime.send(
+            self.socket, [request_id, f"{topic} {message}".encode("utf-8")]
+        )
+        return future
+
+    def receive(self, multipart_response):
+        if len(multipart_response) < 2:
+            print(f"Dropping response without request id: {multipart_response}")
+            return
+        request_id, response = multipart_response[0], multipart_response[-1]
+        with self.lock:
+            future, timer = self.pending.pop(request_id, (None, None))
+        if future is None:
+            # Arrived after its timeout.
+            return
+        if timer is not None:
+            timer.cancel()
+        future.set_result(response.decode("utf-8"))
 
-    def send(self, topic, message):
-        formatted_message = f"{topic} {message}"
-        self.socket.send_string(formatted_message)
+    def expire(self, request_id: bytes, timeout: float):
+        with self.lock:
+            future, _ = self.pending.pop(request_id, (None, None))
+        if future is not None:
+            future.set_exception(
+                TimeoutError(f"No response in {timeout}s for request {request_id}")
+            )
 
-        multipart_response = self.socket.recv_multipart()
-        response = multipart_response[-1].decode("utf-8")
-        return response
+    def get_pending_requests(self) -> int:
+        with self.lock:
+            return len(self.pending)
 
     def close(self):
-        self.socket.close()
-        self.context.term()
+        self.runtime.unregister(self.socket)
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for future, timer in pending.values():
+            if timer is not None:
+                timer.cancel()
+            future.set_exception(ConnectionError("Client closed"))
 
     def __del__(self):
         self.close()
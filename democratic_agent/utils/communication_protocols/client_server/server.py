@@ -1,33 +1,224 @@
-import zmq
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+import inspect
+import sys
 import threading
+from time import perf_counter
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import zmq
+
+from democratic_agent.utils.communication_protocols.routing import Heartbeat
+from democratic_agent.utils.communication_protocols.runtime import get_runtime
+
+# Requests accepted while all the workers are busy, after it the server stops reading and they
+# wait on the broker.
+DEF_MAX_QUEUE = 64
+# Latencies kept to compute the percentiles.
+DEF_METRICS_WINDOW = 1000
+
+
+def _timed_call(callback: Callable[[str], str], message: str) -> Tuple[str, float]:
+    """Run the callback measuring its duration, module level so it can run on a process pool."""
+
+    start = perf_counter()
+    response = callback(message)
+    return response, perf_counter() - start
+
+
+def _is_module_function(callback: Callable) -> bool:
+    """Whether the callback is a module level function, which can be pickled to a process."""
+
+    if not inspect.isfunction(callback) or callback.__qualname__ != callback.__name__:
+        # Methods, lambdas, nested functions and other callables.
+        return False
+    module = sys.modules.get(callback.__module__)
+    return getattr(module, callback.__name__, None) is callback
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percentile))]
+
+
+class ServerMetrics:
+    def __init__(self, window: int = DEF_METRICS_WINDOW):
+        self.lock = threading.Lock()
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.requests = 0
+        self.errors = 0
+        self.paused = 0
+        self.handler_latencies: Deque[float] = deque(maxlen=window)
+        # Since received, including the time waiting for a worker.
+        self.total_latencies: Deque[float] = deque(maxlen=window)
+
+    def get(self) -> Dict[str, float]:
+        with self.lock:
+            handler_latencies = list(self.handler_latencies)
+            total_latencies = list(self.total_latencies)
+            metrics = {
+                "queue_depth": self.queue_depth,
+                "max_queue_depth": self.max_queue_depth,
+                "requests": self.requests,
+                "errors": self.errors,
+                "paused": self.paused,
+            }
+        for name, latencies in (
+            ("handler", handler_latencies),
+            ("total", total_latencies),
+        ):
+            metrics[f"{name}_latency_avg"] = (
+                sum(latencies) / len(latencies) if latencies else 0.0
+            )
+            metrics[f"{name}_latency_p50"] = _percentile(latencies, 0.5)
+            metrics[f"{name}_latency_p95"] = _percentile(latencies, 0.95)
+        return metrics
 
 
 class Server:
-    def __init__(self, address, topics, callback):
-        self.context = zmq.Context()
-        self.socket = self.context.socket(zmq.DEALER)
+    """Answers the requests of its topics routed by the broker.
+
+    By default the callback runs on one request at a time. With workers the requests are
+    dispatched to a thread (or process) pool and each reply is sent as soon as it completes, the
+    callback must be thread-safe. The process pool only accepts module level functions, as the
+    callback is pickled by reference and runs without the state of the server process.
+    """
+
+    def __init__(
+        self,
+        address,
+        topics,
+        callback,
+        workers: Optional[int] = None,
+        pool: str = "thread",
+        max_queue: int = DEF_MAX_QUEUE,
+    ):
+        # First, so an invalid pool is rejected before connecting.
+        self.executor = self._create_executor(workers, pool, callback)
+        self.runtime = get_runtime()
+        self.socket = self.runtime.socket(zmq.DEALER)
         self.socket.connect(address)  # Connect to broker's backend
         self.callback = callback
+        self.max_queue = max(1, max_queue)
+        self.metrics = ServerMetrics()
+        self.receiving = True
 
         # Register the server for the given topics
         for topic in topics:
-            self.socket.send_string(f"register {topic}")
+            self.runtime.send(self.socket, [f"register {topic}".encode("utf-8")])
+        # Keeps the server alive on the broker, which replays the requests of dead servers.
+        self.heartbeat = Heartbeat(self.runtime, self.socket, topics)
+
+        if self.executor is None:
+            self.runtime.register(self.socket, self.listen)
+        else:
+            # Only dispatches, the callbacks run on the pool.
+            self.runtime.register(self.socket, self.dispatch, inline=True)
+
+    @staticmethod
+    def _create_executor(
+        workers: Optional[int], pool: str, callback: Callable[[str], str]
+    ) -> Optional[Executor]:
+        if not workers:
+            return None
+        if pool == "thread":
+            return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="server")
+        elif pool == "process":
+            if not _is_module_function(callback):
+                raise ValueError(
+                    f"The process pool needs a module level function as callback, got {callback!r}."
+                )
+            return ProcessPoolExecutor(max_workers=workers)
+        raise ValueError(f"Server pool {pool} not recognized.")
+
+    def listen(self, multipart_message):
+        # [client_id, request_id, message], the request id is missing for legacy clients.
+        client_id, *request_id, actual_message = multipart_message
+        message = actual_message.decode("utf-8")
+        received = perf_counter()
+        self._start_request()
+        try:
+            response, handler_latency = _timed_call(self.callback, message)
+        except Exception as e:
+            self._finish_request(received, None)
+            print(f"Error on server callback {self.callback}: {e}")
+            response = f"Error: {e}"
+        else:
+            self._finish_request(received, handler_latency)
+        self.runtime.send(
+            self.socket, [client_id, *request_id, response.encode("utf-8")]
+        )
+
+    def dispatch(self, multipart_message):
+        """Runs on the reactor thread: submit the request to the pool without waiting for it."""
+
+        client_id, *request_id, actual_message = multipart_message
+        message = actual_message.decode("utf-8")
+        received = perf_counter()
+        if self._start_request() >= self.max_queue:
+            # Backpressure: the next requests stay queued on zmq until a worker finishes.
+            self.receiving = False
+            self.runtime.pause(self.socket)
+            with self.metrics.lock:
+                self.metrics.paused += 1
+        future = self.executor.submit(_timed_call, self.callback, message)
+        future.add_done_callback(
+            lambda future: self._reply(future, client_id, request_id, received)
+        )
+
+    def _reply(
+        self, future: Future, client_id: bytes, request_id: List[bytes], received: float
+    ):
+        try:
+            response, handler_latency = future.result()
+        except Exception as e:
+            handler_latency = None
+            print(f"Error on server callback {self.callback}: {e}")
+            response = f"Error: {e}"
+        queue_depth = self._finish_request(received, handler_latency)
+        self.runtime.send(
+            self.socket, [client_id, *request_id, response.encode("utf-8")]
+        )
+        if not self.receiving and queue_depth < self.max_queue:
+            self.receiving = True
+            self.runtime.resume(self.socket)
+
+    def _start_request(self) -> int:
+        with self.metrics.lock:
+            self.metrics.queue_depth += 1
+            self.metrics.requests += 1
+            self.metrics.max_queue_depth = max(
+                self.metrics.max_queue_depth, self.metrics.queue_depth
+            )
+            return self.metrics.queue_depth
+
+    def _finish_request(self, received: float, handler_latency: Optional[float]) -> int:
+        with self.metrics.lock:
+            self.metrics.queue_depth -= 1
+            if handler_latency is None:
+                self.metrics.errors += 1
+            else:
+                self.metrics.handler_latencies.append(handler_latency)
+            self.metrics.total_latencies.append(perf_counter() - received)
+            return self.metrics.queue_depth
 
-        self.listener_thread = threading.Thread(target=self.listen, daemon=True)
-        self.listener_thread.start()
+    def get_metrics(self) -> Dict[str, float]:
+        """Queue depth (requests received and not answered yet), counters and latencies in seconds."""
 
-    def listen(self):
-        while True:
-            multipart_message = self.socket.recv_multipart()
-            # Unpack the multipart message
-            client_id, actual_message = multipart_message
-            message = multipart_message[-1].decode("utf-8")  # Decode the last part
-            response = self.callback(message)
-            self.socket.send_multipart([client_id, response.encode("utf-8")])
+        return self.metrics.get()
 
     def close(self):
-        self.socket.close()
-        self.context.term()
+        if not hasattr(self, "socket") or self.socket.closed:
+            return
+        self.heartbeat.stop()
+        # The broker sends the unanswered requests to the other servers of the topics.
+        self.runtime.send(self.socket, [b"unregister"])
+        self.runtime.unregister(self.socket)
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
 
     def __del__(self):
         self.close()
@@ -1,35 +1,41 @@
 import zmq
-import threading
+
+from democratic_agent.utils.communication_protocols.runtime import get_runtime
 
 
 class Proxy:
     def __init__(self, ip, xsub_port, xpub_port):
-        self.context = zmq.Context()
+        self.runtime = get_runtime()
 
         # XSUB socket for publishers to connect
-        self.xsub_socket = self.context.socket(zmq.XSUB)
+        self.xsub_socket = self.runtime.socket(zmq.XSUB)
         self.xsub_socket.bind(f"tcp://{ip}:{xsub_port}")
 
         # XPUB socket for subscribers to connect
-        self.xpub_socket = self.context.socket(zmq.XPUB)
+        self.xpub_socket = self.runtime.socket(zmq.XPUB)
         self.xpub_socket.bind(f"tcp://{ip}:{xpub_port}")
 
         self.xsub_port = xsub_port
         self.xpub_port = xpub_port
-
-        self.listener_thread = threading.Thread(target=self.start, daemon=True)
-        self.listener_thread.start()
+        self.start()
 
     def start(self):
         print(
             f"Starting ZeroMQ proxy with XSUB port {self.xsub_port} and XPUB port {self.xpub_port}"
         )
-        zmq.proxy(self.xsub_socket, self.xpub_socket)
+        # Forward on the reactor thread: messages to the subscribers, subscriptions to the publishers.
+        self.runtime.register(self.xsub_socket, self.forward_message, inline=True)
+        self.runtime.register(self.xpub_socket, self.forward_subscription, inline=True)
+
+    def forward_message(self, frames):
+        self.runtime.send(self.xpub_socket, frames)
+
+    def forward_subscription(self, frames):
+        self.runtime.send(self.xsub_socket, frames)
 
     def close(self):
-        self.xsub_socket.close()
-        self.xpub_socket.close()
-        self.context.term()
+        self.runtime.unregister(self.xsub_socket)
+        self.runtime.unregister(self.xpub_socket)
 
     def __del__(self):
         self.close()
@@ -1,19 +1,20 @@
 import zmq
 
+from democratic_agent.utils.communication_protocols.runtime import get_runtime
+
 
 class Publisher:
     def __init__(self, address, topic):
-        self.context = zmq.Context()
-        self.socket = self.context.socket(zmq.PUB)
+        self.runtime = get_runtime()
+        self.socket = self.runtime.socket(zmq.PUB)
         self.socket.connect(address)
         self.topic = topic
 
     def publish(self, message):
-        self.socket.send_string(f"{self.topic} {message}")
+        self.runtime.send(self.socket, [f"{self.topic} {message}".encode("utf-8")])
 
     def close(self):
-        self.socket.close()
-        self.context.term()
+        self.runtime.unregister(self.socket)
 
     def __del__(self):
         self.close()
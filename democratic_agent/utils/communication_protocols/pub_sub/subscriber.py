@@ -1,22 +1,21 @@
 import zmq
-import threading
+
+from democratic_agent.utils.communication_protocols.runtime import get_runtime
 
 
 class Subscriber:
     def __init__(self, address, topic, callback):
-        self.context = zmq.Context()
-        self.socket = self.context.socket(zmq.SUB)
+        self.runtime = get_runtime()
+        self.socket = self.runtime.socket(zmq.SUB)
         self.socket.connect(address)
         self.socket.subscribe(topic)
         self.callback = callback
-        self.listener_thread = threading.Thread(target=self.listen, daemon=True)
-        self.listener_thread.start()
+        self.runtime.register(self.socket, self.listen)
 
-    def listen(self):
-        while True:
-            message = self.socket.recv_string()
-            topic, message = self.parse_message(message)
-            self.callback(message)
+    def listen(self, frames):
+        message = frames[-1].decode("utf-8")
+        topic, message = self.parse_message(message)
+        self.callback(message)
 
     def parse_message(self, message):
         parts = message.split(" ", 1)
@@ -28,8 +27,7 @@ class Subscriber:
             return None, message
 
     def close(self):
-        self.socket.close()
-        self.context.term()
+        self.runtime.unregister(self.socket)
 
     def __del__(self):
         self.close()
@@ -0,0 +1,165 @@
+from itertools import count
+from time import monotonic
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+# Servers send a heartbeat with their topics every interval, after the missed ones the broker
+# considers them dead.
+DEF_HEARTBEAT_INTERVAL = 1.0
+DEF_HEARTBEAT_LIVENESS = 5
+ROUTING_POLICIES = ["least_outstanding", "round_robin"]
+
+# Request routed to a server: (key, topic, frames to resend it without the server id).
+RoutedRequest = Tuple[Hashable, str, List[bytes]]
+
+
+def heartbeat_message(topics: Iterable[str]) -> bytes:
+    return f"heartbeat {' '.join(topics)}".encode("utf-8")
+
+
+class ServerEntry:
+    def __init__(self, server_id: bytes):
+        self.server_id = server_id
+        self.topics: Set[str] = set()
+        self.last_seen = monotonic()
+        # Requests sent and not answered yet: key -> (topic, frames).
+        self.outstanding: Dict[Hashable, Tuple[str, List[bytes]]] = {}
+
+
+class TopicRouter:
+    """Routing table of the brokers: the servers of each topic, their load and liveness.
+
+    It only keeps the state, the brokers do the IO, so the sync and asyncio brokers share it. A
+    request is tracked by its key until it is completed, if its server dies it is returned to be
+    replayed on another server of the topic.
+    """
+
+    def __init__(
+        self,
+        policy: str = "least_outstanding",
+        timeout: float = DEF_HEARTBEAT_INTERVAL * DEF_HEARTBEAT_LIVENESS,
+    ):
+        if policy not in ROUTING_POLICIES:
+            raise ValueError(f"Routing policy {policy} not recognized.")
+        self.policy = policy
+        self.timeout = timeout
+        self.servers: Dict[bytes, ServerEntry] = {}
+        self.topic_servers: Dict[str, List[bytes]] = {}
+        self.key_to_server: Dict[Hashable, bytes] = {}
+        # Rotates the first candidate of each topic, also breaks the least outstanding ties.
+        self.turns = count()
+
+    def register(self, server_id: bytes, topics: Iterable[str]):
+        """Add the server to the topics and mark it alive, heartbeats register it again if it expired."""
+
+        entry = self.servers.get(server_id)
+        if entry is None:
+            entry = self.servers[server_id] = ServerEntry(server_id)
+        entry.last_seen = monotonic()
+        for topic in topics:
+            if topic not in entry.topics:
+                entry.topics.add(topic)
+                self.topic_servers.setdefault(topic, []).append(server_id)
+
+    def seen(self, server_id: bytes):
+        entry = self.servers.get(server_id)
+        if entry is not None:
+            entry.last_seen = monotonic()
+
+    def select(self, topic: Optional[str]) -> Optional[bytes]:
+        server_ids = self.topic_servers.get(topic)
+        if not server_ids:
+            return None
+        start = next(self.turns) % len(server_ids)
+        candidates = server_ids[start:] + server_ids[:start]
+        if self.policy == "round_robin":
+            return candidates[0]
+        return min(
+            candidates,
+            key=lambda server_id: len(self.servers[server_id].outstanding),
+        )
+
+    def track(self, server_id: bytes, key: Hashable, topic: str, frames: List[bytes]):
+        # A key is only on one server, e.g. legacy clients without request ids reuse it.
+        self.complete(key)
+        self.key_to_server[key] = server_id
+        self.servers[server_id].outstanding[key] = (topic, frames)
+
+    def route(
+        self, topic: Optional[str], key: Hashable, frames: List[bytes]
+    ) -> Optional[bytes]:
+        """Select the server for the request and track it, None if the topic has no servers."""
+
+        server_id = self.select(topic)
+        if server_id is not None:
+            self.track(server_id, key, topic, frames)
+        return server_id
+
+    def get_server(self, key: Hashable) -> Optional[bytes]:
+        """Server handling the request, to send it the follow up messages (e.g. goal updates)."""
+
+        return self.key_to_server.get(key)
+
+    def complete(self, key: Hashable):
+        server_id = self.key_to_server.pop(key, None)
+        if server_id is not None and server_id in self.servers:
+            self.servers[server_id].outstanding.pop(key, None)
+
+    def remove(self, server_id: bytes) -> List[RoutedRequest]:
+        """Remove the server returning its unanswered requests."""
+
+        entry = self.servers.pop(server_id, None)
+        if entry is None:
+            return []
+        for topic in entry.topics:
+            server_ids = self.topic_servers[topic]
+            server_ids.remove(server_id)
+            if not server_ids:
+                del self.topic_servers[topic]
+        requests = []
+        for key, (topic, frames) in entry.outstanding.items():
+            del self.key_to_server[key]
+            requests.append((key, topic, frames))
+        return requests
+
+    def expire(self) -> List[RoutedRequest]:
+        """Remove the servers without heartbeats in the timeout, returns their unanswered requests."""
+
+        deadline = monotonic() - self.timeout
+        requests = []
+        for server_id, entry in list(self.servers.items()):
+            if entry.last_seen < deadline:
+                print(f"Server {server_id} missed its heartbeats, removing it")
+                requests.extend(self.remove(server_id))
+        return requests
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Outstanding requests of each server of each topic."""
+
+        return {
+            topic: {
+                server_id.hex(): len(self.servers[server_id].outstanding)
+                for server_id in server_ids
+            }
+            for topic, server_ids in self.topic_servers.items()
+        }
+
+
+class Heartbeat:
+    """Sends the heartbeats of a sync server from the reactor thread until stopped."""
+
+    def __init__(self, runtime, socket, topics: List[str]):
+        self.runtime = runtime
+        self.socket = socket
+        self.message = heartbeat_message(topics)
+        self.stopped = False
+        self.timer = self.runtime.call_later(DEF_HEARTBEAT_INTERVAL, self.send)
+
+    def send(self):
+        if self.stopped or self.socket.closed:
+            return
+        self.runtime.send(self.socket, [self.message])
+        self.timer = self.runtime.call_later(DEF_HEARTBEAT_INTERVAL, self.send)
+
+    def stop(self):
+        self.stopped = True
+        self.timer.cancel()
@@ -0,0 +1,424 @@
+from collections import deque
+from functools import partial
+import heapq
+import itertools
+import threading
+from time import monotonic
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import zmq
+
+from democratic_agent.config.config import Config
+from democratic_agent.utils.daemon_pool import DaemonThreadPoolExecutor
+
+# Poll timeout, the reactor is woken up earlier by any command or send.
+DEF_POLL_TIMEOUT_MS = 1000
+DEF_CLOSE_TIMEOUT = 5.0
+
+_wake_ids = itertools.count()
+
+
+class Timer:
+    def __init__(self, deadline: float, callback: Callable, args: Tuple):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def __lt__(self, other: "Timer") -> bool:
+        return self.deadline < other.deadline
+
+
+class Strand:
+    """Runs the posted callbacks one at a time and in order on the shared worker pool.
+
+    A dedicated strand runs them on its own thread instead, for the callbacks that block.
+    """
+
+    def __init__(
+        self,
+        submit: Callable[[Callable], None],
+        executor: Optional[DaemonThreadPoolExecutor] = None,
+    ):
+        self.submit = submit
+        self.executor = executor
+        self.queue: Deque[Tuple[Callable, Tuple]] = deque()
+        self.running = False
+        self.lock = threading.Lock()
+
+    def post(self, callback: Callable, *args):
+        with self.lock:
+            self.queue.append((callback, args))
+            if self.running:
+                return
+            self.running = True
+        self.submit(self._run)
+
+    def _run(self):
+        while True:
+            with self.lock:
+                if not self.queue:
+                    self.running = False
+                    return
+                callback, args = self.queue.popleft()
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Error on communication callback {callback}: {e}")
+
+    def close(self):
+        """Stop the thread of a dedicated strand once the posted callbacks finish."""
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+
+class SocketHandler:
+    def __init__(
+        self,
+        socket: zmq.Socket,
+        callback: Callable[[List[bytes]], Any],
+        strand: Optional[Strand],
+    ):
+        self.socket = socket
+        self.callback = callback
+        # None to run the callback on the reactor thread (only for fast, non-blocking routing).
+        self.strand = strand
+        # Messages waiting for the socket to be writable.
+        self.blocked_sends: Deque[List[bytes]] = deque()
+        # Not reading, the messages wait on the zmq queues (backpressure to the peers).
+        self.paused = False
+
+
+class CommunicationRuntime:
+    """Process-wide zmq runtime: one shared context and one reactor thread polling all the sockets.
+
+    Sockets are only used from the reactor thread, other threads send through it and the
+    callbacks run on a bounded worker pool, serialized per socket (or per strand). When all the
+    workers are busy the callbacks wait for one. Callbacks that block for long (e.g. waiting for
+    the user) must use a dedicated strand, so they can't starve the pool. The workers are daemon
+    threads, a blocked callback doesn't keep the process alive.
+    """
+
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if cls._instance is None:
+            cls._instance = super(CommunicationRuntime, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if not hasattr(self, "_initialized"):  # Avoid re-initialization
+            self.context = zmq.Context.instance()
+            self.max_workers = Config().communication_max_workers
+            self.executor = DaemonThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="communication"
+            )
+            self.dedicated_strands: List[Strand] = []
+            self.handlers: Dict[zmq.Socket, SocketHandler] = {}
+            self.poller = zmq.Poller()
+            # Commands for the reactor thread: (function, args, done event).
+            self.commands: Deque[Tuple[Callable, Tuple, Optional[threading.Event]]] = (
+                deque()
+            )
+            self.lock = threading.Lock()
+            # Heap of the timers, only used by the reactor thread.
+            self.timers: List[Timer] = []
+
+            wake_address = f"inproc://communication_runtime_wake_{next(_wake_ids)}"
+            self.wake_receiver = self.context.socket(zmq.PAIR)
+            self.wake_receiver.bind(wake_address)
+            self.wake_sender = self.context.socket(zmq.PAIR)
+            self.wake_sender.connect(wake_address)
+            self.poller.register(self.wake_receiver, zmq.POLLIN)
+
+            self.running = True
+            self.reactor_thread = threading.Thread(
+                target=self._run, name="communication_reactor", daemon=True
+            )
+            self.reactor_thread.start()
+            self._initialized = True
+
+    def socket(self, socket_type: int) -> zmq.Socket:
+        return self.context.socket(socket_type)
+
+    def create_strand(self, dedicated: bool = False) -> Strand:
+        """Strand on the shared pool, or on its own thread if dedicated (for blocking callbacks)."""
+
+        if not dedicated:
+            return Strand(self._submit)
+        executor = DaemonThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="communication_dedicated"
+        )
+        strand = Strand(partial(self._submit, executor=executor), executor)
+        with self.lock:
+            self.dedicated_strands.append(strand)
+        return strand
+
+    def _submit(
+        self, function: Callable, executor: Optional[DaemonThreadPoolExecutor] = None
+    ):
+        try:
+            (executor or self.executor).submit(function)
+        except RuntimeError:
+            # Closed runtime or strand, e.g. a message received while closing.
+            pass
+
+    def register(
+        self,
+        socket: zmq.Socket,
+        callback: Callable[[List[bytes]], Any],
+        inline: bool = False,
+        strand: Optional[Strand] = None,
+        dedicated: bool = False,
+    ):
+        """Call callback with the frames of each message received on the socket.
+
+        The callbacks of a socket run in order on its own strand unless a shared strand is given,
+        dedicated to run them on their own thread (callbacks that block for long). Inline callbacks
+        run on the reactor thread and must not block.
+        """
+
+        if not inline and strand is None:
+            strand = self.create_strand(dedicated)
+        handler = SocketHandler(socket, callback, None if inline else strand)
+        self._command(self._register, handler)
+
+    def unregister(self, socket: zmq.Socket, close: bool = True):
+        """Stop polling the socket and close it, waiting for the pending sends to be written."""
+
+        if self.is_reactor_thread():
+            self._unregister(socket, close)
+        elif self.reactor_thread.is_alive():
+            done = threading.Event()
+            self._command(self._unregister, socket, close, done=done)
+            done.wait(DEF_CLOSE_TIMEOUT)
+        elif close:
+            socket.close(linger=0)
+
+    def pause(self, socket: zmq.Socket):
+        """Stop receiving from the socket until resume is called."""
+
+        self._call(self._set_paused, socket, True)
+
+    def resume(self, socket: zmq.Socket):
+        self._call(self._set_paused, socket, False)
+
+    def _call(self, function: Callable, *args):
+        if self.is_reactor_thread():
+            function(*args)
+        else:
+            self._command(function, *args)
+
+    def send(self, socket: zmq.Socket, frames: List[bytes]):
+        """Send a multipart message from any thread, it is written by the reactor thread."""
+
+        if self.is_reactor_thread():
+            self._send(socket, frames)
+        else:
+            self._command(self._send, socket, frames)
+
+    def call_later(self, delay: float, callback: Callable, *args) -> Timer:
+        """Run callback on the reactor thread after delay seconds (it must not block), e.g. timeouts."""
+
+        timer = Timer(monotonic() + delay, callback, args)
+        if self.is_reactor_thread():
+            heapq.heappush(self.timers, timer)
+        else:
+            self._command(heapq.heappush, self.timers, timer)
+        return timer
+
+    def close_strand(self, strand: Strand):
+        strand.close()
+        with self.lock:
+            if strand in self.dedicated_strands:
+                self.dedicated_strands.remove(strand)
+
+    def is_reactor_thread(self) -> bool:
+        return threading.current_thread() is self.reactor_thread
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "sockets": len(self.handlers),
+            "threads": threading.active_count(),
+            "pending_commands": len(self.commands),
+            "dedicated_strands": len(self.dedicated_strands),
+        }
+
+    def _command(
+        self, function: Callable, *args, done: Optional[threading.Event] = None
+    ):
+        with self.lock:
+            if self.wake_sender.closed:
+                # Closed runtime, e.g. a worker pool reply finishing after it.
+                return
+            self.commands.append((function, args, done))
+            try:
+                self.wake_sender.send(b"", zmq.NOBLOCK)
+            except zmq.Again:
+                # The reactor has pending wake ups, it will process this command too.
+                pass
+
+    def _register(self, handler: SocketHandler):
+        self.handlers[handler.socket] = handler
+        self.poller.register(handler.socket, zmq.POLLIN)
+
+    def _unregister(self, socket: zmq.Socket, close: bool):
+        handler = self.handlers.pop(socket, None)
+        if handler is not None:
+            try:
+                self.poller.unregister(socket)
+            except KeyError:
+                # Paused and without pending sends.
+                pass
+            if handler.strand is not None and handler.strand.executor is not None:
+                self.close_strand(handler.strand)
+        if close and not socket.closed:
+            socket.close()
+
+    def _send(self, socket: zmq.Socket, frames: List[bytes]):
+        if socket.closed:
+            return
+        handler = self.handlers.get(socket)
+        if handler is not None and handler.blocked_sends:
+            handler.blocked_sends.append(frames)
+            return
+        try:
+            socket.send_multipart(frames, zmq.NOBLOCK)
+        except zmq.Again:
+            # No peer ready (e.g. DEALER before connecting), write it when the socket is writable.
+            if handler is None:
+                print(f"Dropping message, socket {socket} is not writable")
+                return
+            handler.blocked_sends.append(frames)
+            self._update_poll_flags(handler)
+
+    def _flush_blocked(self, handler: SocketHandler):
+        while handler.blocked_sends:
+            try:
+                handler.socket.send_multipart(handler.blocked_sends[0], zmq.NOBLOCK)
+            except zmq.Again:
+                return
+            handler.blocked_sends.popleft()
+        self._update_poll_flags(handler)
+
+    def _set_paused(self, socket: zmq.Socket, paused: bool):
+        handler = self.handlers.get(socket)
+        if handler is not None and handler.paused != paused:
+            handler.paused = paused
+            self._update_poll_flags(handler)
+            if not paused:
+                # Messages could have arrived while paused without a new poll event.
+                self._receive(handler)
+
+    def _update_poll_flags(self, handler: SocketHandler):
+        flags = 0 if handler.paused else zmq.POLLIN
+        if handler.blocked_sends:
+            flags |= zmq.POLLOUT
+        if flags:
+            self.poller.register(handler.socket, flags)
+        else:
+            try:
+                self.poller.unregister(handler.socket)
+            except KeyError:
+                pass
+
+    def _process_commands(self):
+        while True:
+            with self.lock:
+                if not self.commands:
+                    return
+                function, args, done = self.commands.popleft()
+            try:
+                function(*args)
+            except Exception as e:
+                print(f"Error on communication runtime command {function}: {e}")
+            if done is not None:
+                done.set()
+
+    def _get_poll_timeout(self) -> int:
+        while self.timers and self.timers[0].cancelled:
+            heapq.heappop(self.timers)
+        if not self.timers:
+            return DEF_POLL_TIMEOUT_MS
+        remaining_ms = (self.timers[0].deadline - monotonic()) * 1000
+        return max(0, min(DEF_POLL_TIMEOUT_MS, int(remaining_ms) + 1))
+
+    def _run_timers(self):
+        now = monotonic()
+        while self.timers and self.timers[0].deadline <= now:
+            timer = heapq.heappop(self.timers)
+            if timer.cancelled:
+                continue
+            try:
+                timer.callback(*timer.args)
+            except Exception as e:
+                print(f"Error on communication timer {timer.callback}: {e}")
+
+    def _run(self):
+        while self.running:
+            events = dict(self.poller.poll(self._get_poll_timeout()))
+            if self.wake_receiver in events:
+                while True:
+                    try:
+                        self.wake_receiver.recv(zmq.NOBLOCK)
+                    except zmq.Again:
+                        break
+            self._process_commands()
+
+            for socket, event in events.items():
+                handler = self.handlers.get(socket)
+                if handler is None:
+                    continue
+                if event & zmq.POLLOUT:
+                    self._flush_blocked(handler)
+                if event & zmq.POLLIN:
+                    self._receive(handler)
+            self._run_timers()
+
+    def _receive(self, handler: SocketHandler):
+        # Drain the socket, the poller only reports it once per batch of messages.
+        while not handler.socket.closed and not handler.paused:
+            try:
+                frames = handler.socket.recv_multipart(zmq.NOBLOCK)
+            except zmq.Again:
+                return
+            if handler.strand is None:
+                try:
+                    handler.callback(frames)
+                except Exception as e:
+                    print(f"Error on communication callback {handler.callback}: {e}")
+            else:
+                handler.strand.post(handler.callback, frames)
+
+    def close(self):
+        """Stop the reactor and close the sockets, the shared context is left for the rest of the process."""
+
+        if not self.running:
+            return
+        done = threading.Event()
+        self._command(self._close, done=done)
+        done.wait(DEF_CLOSE_TIMEOUT)
+        self.reactor_thread.join(DEF_CLOSE_TIMEOUT)
+        self.wake_sender.close()
+        self.wake_receiver.close()
+        # Drop the callbacks waiting for a worker, the running ones are not waited for.
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        with self.lock:
+            dedicated_strands, self.dedicated_strands = self.dedicated_strands, []
+        for strand in dedicated_strands:
+            strand.close()
+        # The next get_runtime starts a new one.
+        CommunicationRuntime._instance = None
+
+    def _close(self):
+        for socket in list(self.handlers):
+            self._unregister(socket, close=True)
+        self.running = False
+
+
+def get_runtime() -> CommunicationRuntime:
+    return CommunicationRuntime()
@@ -0,0 +1,81 @@
+from concurrent.futures import Executor, Future
+import os
+import queue
+import threading
+from typing import Callable, List, Optional
+
+
+class DaemonThreadPoolExecutor(Executor):
+    """Bounded thread pool whose workers are daemon threads.
+
+    ThreadPoolExecutor joins its workers at interpreter exit, so a blocked call (e.g. a tool that
+    timed out or a callback waiting for the user) would keep the process alive. The extra work is
+    queued until a worker is free.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, thread_name_prefix: str = ""):
+        if max_workers is None:
+            max_workers = min(32, (os.cpu_count() or 1) + 4)
+        if max_workers <= 0:
+            raise ValueError("max_workers must be greater than 0")
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix or "daemon_pool"
+        self.work_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self.threads: List[threading.Thread] = []
+        self.idle_workers = 0
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        future = Future()
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            self.work_queue.put((future, fn, args, kwargs))
+            if self.idle_workers > 0:
+                self.idle_workers -= 1
+            elif len(self.threads) < self.max_workers:
+                thread = threading.Thread(
+                    target=self._work,
+                    name=f"{self.thread_name_prefix}_{len(self.threads)}",
+                    daemon=True,
+                )
+                self.threads.append(thread)
+                thread.start()
+        return future
+
+    def _work(self):
+        while True:
+            item = self.work_queue.get()
+            if item is None:
+                return
+            future, fn, args, kwargs = item
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+            with self.lock:
+                self.idle_workers += 1
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            if cancel_futures:
+                while True:
+                    try:
+                        item = self.work_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not None:
+                        item[0].cancel()
+            for _ in self.threads:
+                self.work_queue.put(None)
+        if wait:
+            for thread in self.threads:
+                if thread is not threading.current_thread():
+                    thread.join()
@@ -1,4 +1,6 @@
+import json
 from typing import Optional
+import re
 import socket
 
 
@@ -35,3 +37,29 @@ def get_free_port():
     except Exception as e:
         print(f"Error obtaining a free port: {e}")
         return None
+
+
+def get_partial_json_string(json_str: str, key: str) -> Optional[str]:
+    """Decode the value of a string key from an incomplete JSON object, as the model streams tool arguments."""
+
+    match = re.search(r'"' + re.escape(key) + r'"\s*:\s*"', json_str)
+    if match is None:
+        return None
+    raw = json_str[match.end() :]
+    end = 0
+    while end < len(raw):
+        char = raw[end]
+        if char == '"':
+            break
+        if char == "\\":
+            # Skip the escape sequence, stop before it if it's incomplete.
+            length = 6 if raw[end + 1 : end + 2] == "u" else 2
+            if end + length > len(raw):
+                break
+            end += length
+        else:
+            end += 1
+    try:
+        return json.loads(f'"{raw[:end]}"')
+    except json.JSONDecodeError:
+        return None